@@ -1,75 +1,261 @@
-from flask import Flask, render_template, request
+from flask import Flask, render_template, request, Response, redirect, url_for, jsonify
 from flask_socketio import SocketIO, emit, join_room, leave_room
+from werkzeug.exceptions import RequestEntityTooLarge
 import time
 import eventlet
-from questions import CARDS_QUESTIONS
-from answers import CARDS_ANSWERS
-from game import Game
+import eventlet.tpool
+from cards import CARD_DB, CARD_DB_PATH, CARDS_QUESTIONS, CARDS_ANSWERS, CARD_PACKS, CUSTOM_CARD_OFFSET
+from game import Game, HISTORY_PAGE_LIMIT
+from lobby import PublicGameIndex, public_game_entry, SORT_KEYS
+from catalog import CardCatalog
+from scheduler import DeadlineScheduler
+from eventlet.green.threading import Event
 import re
+import os
+import hmac
+import shutil
+import tempfile
 import traceback
+import uuid
+import payload
+import importer
+import cluster
+import store
+import snapshots
+import gamelog
+import metrics
+from collections.abc import MutableMapping
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'cards-against-everyone-secret-key'
-socketio = SocketIO(app, cors_allowed_origins="*")
 
-# Datenstrukturen
-users: dict[str, dict] = {}  # {username: {sid: str, last_seen: float, game_id: str}}
-users_by_sid: dict[str, str] = {}  # {sid: username}
-games: dict[str, Game] = {}  # {game_id: Game}
-disconnect_timers: dict[str, float] = {}  # {username: timestamp of disconnect}
+LOBBY_ROOM = 'lobby'  # SocketIO-Raum aller Clients auf dem Lobby-Bildschirm
+
+# Mehr-Worker-Betrieb (siehe cluster.py): Bus zu den anderen Workern, bei einem Worker ein LocalBus ohne Partner
+bus = cluster.create_bus(async_mode='eventlet')
+socketio = SocketIO(app, cors_allowed_origins="*", json=payload,
+                    client_manager=cluster.BusManager(bus, shared_rooms=[LOBBY_ROOM]) if bus.clustered else None)
+
+# Datenstrukturen, abgelegt im Backend von STATE_STORE (siehe store.py)
+state_store = store.create_store(bus, async_mode='eventlet')
+users: MutableMapping[str, dict] = state_store.mapping('users')  # {username: {sid: str, game_id: str, status: str}}
+users_by_sid: MutableMapping[str, str] = state_store.mapping('users_by_sid')  # {sid: username}
+games: MutableMapping[str, Game] = state_store.mapping('games', local=True)  # {game_id: Game}
+disconnect_timers: MutableMapping[str, float] = state_store.mapping('disconnect_timers')  # {username: timestamp of disconnect}
+# {username: timestamp of last ping}; nur im Prozess, damit ein Heartbeat nichts an den State-Store schickt
+last_seen: MutableMapping[str, float] = state_store.mapping('last_seen', local=True)
 global_timer_task: eventlet.greenthread = None  # Globaler Timer-Task
 timer_started: bool = False  # Flag ob Timer bereits gestartet wurde
 
+DISCONNECT_TIMEOUT = 30  # Sekunden bis ein getrennter Benutzer entfernt wird
+
+# Lobby-Änderungen innerhalb dieses Zeitfensters (Sekunden) werden zu einer Aktualisierung zusammengefasst
+LOBBY_BROADCAST_DELAY = float(os.environ.get('LOBBY_BROADCAST_DELAY', '0.25'))
+lobby_users: set[str] = set()  # Nutzer im LOBBY_ROOM
+player_games: dict[str, set[str]] = {}  # username: game_ids dieses Workers, in denen er Spieler oder Zuschauer ist
+public_games_index = PublicGameIndex(games)  # öffentlich gelistete Spiele, wird über Game.on_change aktuell gehalten
+
+# Deadlines aller Spiel- und Disconnect-Timer, der Timer-Task wacht nur bei fälligen Deadlines auf
+scheduler = DeadlineScheduler()
+scheduler_wakeup = Event()
+scheduler.on_earlier_deadline = scheduler_wakeup.set
+
+# Laufzeit-Metriken für GET /metrics (siehe metrics.py), die Handler werden nach ihrer Registrierung am Dateiende gemessen
+server_metrics = metrics.Metrics() if metrics.METRICS_ENABLED else None
+if server_metrics is not None:
+    payload.on_sent = server_metrics.observe_sent
+    payload.on_received = server_metrics.observe_received
+    scheduler.on_callback_done = server_metrics.observe_scheduled
+
+# Kartentexte für die Clients, Spielzustände enthalten nur Karten-IDs
+card_catalog = CardCatalog(CARDS_QUESTIONS, CARDS_ANSWERS, CARD_PACKS)
+
+# Snapshots der Spiele für einen Neustart (siehe snapshots.py), bei mehreren Workern eine Datei pro Worker
+# Mit Debug-Reloader (ein Worker) läuft der Server im Kindprozess (WERKZEUG_RUN_MAIN), der Elternprozess
+# überwacht nur die Dateien und darf keine Snapshots laden oder schreiben
+# DEBUG=0 schaltet Debug-Modus und Reloader auch mit einem Worker ab (z.B. für Lasttests)
+DEBUG = os.environ.get('DEBUG', '1' if cluster.WORKERS == 1 else '0') == '1'
+snapshot_store = None
+if snapshots.SNAPSHOT_PATH and (__name__ != '__main__' or not DEBUG or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'):
+    root, ext = os.path.splitext(snapshots.SNAPSHOT_PATH)
+    snapshot_store = snapshots.SnapshotStore(f"{root}-{bus.worker}{ext}" if bus.clustered else snapshots.SNAPSHOT_PATH)
+snapshot_changed_games: set[str] = set()  # game_ids, die seit ihrem letzten Snapshot geändert wurden
+if gamelog.EVENT_LOG_DIR:
+    os.makedirs(gamelog.EVENT_LOG_DIR, exist_ok=True)
+
+# Token für POST /cards/import (Authorization: Bearer <Token>), ohne Token ist der Import abgeschaltet
+CARD_IMPORT_TOKEN = os.environ.get('CARD_IMPORT_TOKEN', '')
+# Größte Datei für POST /cards/import; gilt für alle Requests, der Import ist der einzige mit Body
+CARD_IMPORT_MAX_BYTES = int(os.environ.get('CARD_IMPORT_MAX_BYTES', str(32 * 1024 * 1024)))
+app.config['MAX_CONTENT_LENGTH'] = CARD_IMPORT_MAX_BYTES
+
 # Globaler Timer-Task
 def universal_timer_task():
-    """Universeller Timer der alle Spiele durchläuft und Timer aktualisiert"""
+    """Universeller Timer der nur fällige Deadlines (Spiel-Timer, Disconnect-Timer) abarbeitet"""
     print("Universal Timer Task gestartet", flush=True)
     while True:
         try:
-            # Durchlaufe alle disconnected Benutzer und bereinige nach 30 Sekunden
-            current_time = time.time()
-            for username in list(disconnect_timers.keys()):
-                disconnect_time = disconnect_timers[username]
-                if current_time - disconnect_time >= 30:
-                    print(f"Bereinige Benutzer nach 30 Sekunden Inaktivität: {username}", flush=True)
-                    cleanup_user(username)
-
-            # Durchlaufe alle aktiven Spiele
-            for game_id in list(games.keys()):
-                if game_id not in games:
-                    continue    
-                game = games[game_id]
-                
-                # Nur laufende Spiele
-                if not game.is_game_started():
-                    continue
-                            
-                # Pausierte Spiele überspringen
-                if game.paused:
-                    continue
-                
-                # Timer tick
-                success, message = game.timer_tick()
-                if not success:
-                    print(f"Fehler beim Timer-Tick für Spiel {game_id}: {message}", flush=True)
-                    
-                # Sende Timer-Update an Clients
-                socketio.emit('timer_sync', {
-                    'time_left': game.currentTimerSeconds,
-                    'max_time': game.currentTimerTotalSeconds
-                    }, room=game_id)
-        
-            eventlet.sleep(1) # sleep 1s
+            scheduler_wakeup.clear()
+            if server_metrics is not None:
+                start = time.perf_counter()
+                scheduler.run_due()
+                server_metrics.timer_loop.observe(time.perf_counter() - start)
+            else:
+                scheduler.run_due()
+
+            # Schlafe bis zur nächsten Deadline oder bis eine frühere Deadline geplant wird
+            scheduler_wakeup.wait(scheduler.time_until_next())
         except Exception as e:
             print(f"Error in universal_timer_task: {e}", flush=True)
             traceback.print_exc()
             eventlet.sleep(1)
- 
 
-def broadcastPublicGames():
-    for username in users.keys():
-        sid = users[username]['sid']
-        socketio.emit('public_games_list', {'games': get_public_games(username)}, room=sid)
+def start_timer_task():
+    """Startet den Timer-Task, falls er noch nicht läuft (beim ersten Connect oder für wiederhergestellte Spiele)"""
+    global global_timer_task, timer_started
+    if not timer_started:
+        timer_started = True
+        print("Starte Universal Timer Task...", flush=True)
+        global_timer_task = socketio.start_background_task(universal_timer_task)
+        print("Universal Timer Task wurde gestartet", flush=True)
+
+def start_disconnect_timer(username):
+    """Bereinigt den Benutzer nach DISCONNECT_TIMEOUT Sekunden, falls er sich nicht wieder verbindet"""
+    def on_timeout():
+        print(f"Bereinige Benutzer nach {DISCONNECT_TIMEOUT} Sekunden Inaktivität: {username}", flush=True)
+        cleanup_user(username)
+
+    disconnect_timers[username] = time.time()
+    scheduler.schedule_in(('disconnect', username), DISCONNECT_TIMEOUT, on_timeout)
+
+def stop_disconnect_timer(username):
+    disconnect_timers.pop(username, None)
+    scheduler.cancel(('disconnect', username))
+
+def broadcastPublicGames(game_id):
+    """Merkt das Spiel für die nächste Lobby-Aktualisierung vor, Änderungen innerhalb von LOBBY_BROADCAST_DELAY werden zusammengefasst"""
+    public_games_index.mark_changed(game_id)
+    if not scheduler.is_scheduled(('lobby',)):
+        scheduler.schedule_in(('lobby',), LOBBY_BROADCAST_DELAY, sendPublicGames)
+
+def on_game_change(game_id):
+    """Game.on_change: Lobby-Eintrag prüfen und das Spiel für den nächsten Snapshot vormerken"""
+    broadcastPublicGames(game_id)
+    if snapshot_store is not None:
+        snapshot_changed_games.add(game_id)
+        if not scheduler.is_scheduled(('snapshot',)):
+            # nach dem laufenden Handler, damit ein Phasenwechsel vollständig gespeichert wird
+            scheduler.schedule_in(('snapshot',), 0, save_transition_snapshots)
+
+def save_transition_snapshots():
+    """Speichert Spiele mit neuer Phase sofort, übrige Änderungen beim nächsten periodischen Snapshot"""
+    for game_id in list(snapshot_changed_games):
+        game = games.get(game_id)
+        if game is None:
+            snapshot_store.delete(game_id)
+            snapshot_changed_games.discard(game_id)
+        elif snapshot_store.is_transition(game):
+            snapshot_store.save(game)
+            snapshot_changed_games.discard(game_id)
+
+def save_periodic_snapshots():
+    for game_id in snapshot_changed_games:
+        game = games.get(game_id)
+        if game is None:
+            snapshot_store.delete(game_id)
+        elif snapshot_store.is_stale(game):
+            snapshot_store.save(game)
+    snapshot_changed_games.clear()
+    scheduler.schedule_in(('snapshot_periodic',), snapshots.SNAPSHOT_INTERVAL, save_periodic_snapshots)
+
+def sendPublicGames():
+    """Sendet die Änderungen der öffentlichen Spiele als lobby_game_added/updated/removed an den Lobby-Raum (aller Worker)"""
+    events = public_games_index.refresh()
+    for event, data in events:
+        socketio.emit(event, data, room=LOBBY_ROOM)
+    if events and bus.clustered:
+        bus.publish('lobby', {'events': events})
+
+def handle_lobby_message(message):
+    """Lobby-Einträge der anderen Worker, damit Lobby-Seiten alle Spiele enthalten"""
+    if 'events' in message:
+        public_games_index.apply(message['events'])
+    elif 'sync_request' in message:
+        # ein neu gestarteter Worker fragt nach den Spielen der anderen
+        own_entries = [entry for entry in public_games_index.list() if cluster.shard_for(entry['id']) == bus.worker]
+        if own_entries:
+            bus.publish('lobby', {'events': [('lobby_game_added', {'game': entry}) for entry in own_entries]})
+
+def handle_cluster_message(message):
+    """Nachrichten des Brokers und der anderen Worker"""
+    if 'user_claimed' in message:
+        # ein anderer Worker hat den Namen eines getrennten Benutzers übernommen
+        print(f"Benutzer {message['user_claimed']} ist jetzt auf Worker {message['worker']}", flush=True)
+        cleanup_user(message['user_claimed'])
+    elif 'worker_gone' in message:
+        worker = message['worker_gone']
+        print(f"Worker {worker} beendet, entferne seine Spiele aus der Lobby", flush=True)
+        for game_id in public_games_index.remove_where(lambda entry: cluster.shard_for(entry['id']) == worker):
+            socketio.emit('lobby_game_removed', {'id': game_id}, room=LOBBY_ROOM, ignore_queue=True)
+    elif 'cards_changed' in message:
+        if CARD_DB is not None:
+            reload_cards()
+
+bus.subscribe('lobby', handle_lobby_message)
+bus.subscribe('cluster', handle_cluster_message)
+if bus.clustered:
+    bus.publish('lobby', {'sync_request': bus.worker})
+
+def reload_cards():
+    """Liest neu importierte Karten; hat sich der Katalog geändert, laden ihn die Clients dieses Workers neu"""
+    if CARD_DB.refresh():
+        card_catalog.invalidate()
+        socketio.emit('catalog_changed', {'filename': card_catalog.filename}, ignore_queue=True)
+
+def redirect_to_worker(username, game_id, event, data):
+    """Das Spiel liegt auf einem anderen Worker: der Client verbindet sich dort neu und sendet event erneut"""
+    if users[username].get('game_id') in games:
+        emit('error', {'message': 'Du bist bereits in einem Spiel'})
+        return
+    # der Name wird frei und vom anderen Worker beim set_username übernommen
+    cleanup_user(username)
+    users_by_sid[request.sid] = None
+    emit('switch_worker', {
+        'url': cluster.worker_url(cluster.shard_for(game_id), request.host, request.scheme),
+        'replay': {'event': event, 'data': data}
+    })
+
+def is_remote_game(game_id):
+    return bus.clustered and isinstance(game_id, str) and game_id not in games and cluster.shard_for(game_id) != bus.worker
+
+def join_lobby(username):
+    join_room(LOBBY_ROOM)
+    lobby_users.add(username)
+
+def leave_lobby(username):
+    if username in lobby_users:
+        leave_room(LOBBY_ROOM)
+        lobby_users.discard(username)
+
+def on_game_membership(game_id, username, joined):
+    """Game.on_membership: hält player_games aktuell, die Lobby findet offene Spiele eines Benutzers ohne Suche über alle Spiele"""
+    if joined:
+        player_games.setdefault(username, set()).add(game_id)
+        return
+    game_ids = player_games.get(username)
+    if game_ids is not None:
+        game_ids.discard(game_id)
+        if not game_ids:
+            del player_games[username]
+
+def delete_game(game):
+    """Entfernt ein Spiel ohne Spieler"""
+    game.stop_timer()
+    del games[game.game_id]
+    for player in list(game.player_status):
+        on_game_membership(game.game_id, player, False)
+    if game.event_log is not None:
+        game.event_log.close()
 
 def cleanup_user(username):
     """Entfernt Benutzer nach 30 Sekunden Inaktivität"""
@@ -81,21 +267,178 @@ def cleanup_user(username):
             
             # Spiel löschen wenn kein neuer owner -> kein Spieler mehr da
             if game.owner == None:
-                del games[game_id]
+                delete_game(game)
             else:
                 # Informiere andere Spieler
                 socketio.emit('player_left', {
-                    'username': username,
-                    'game': game.get_socket_game_data(include_history=True)
+                    'username': username
                 }, room=game_id)
+                game.send_socket_game_update_for_all()
         
         del users[username]
-        if username in disconnect_timers:
-            del disconnect_timers[username]
+        last_seen.pop(username, None)
+        lobby_users.discard(username)
+        stop_disconnect_timer(username)
+        bus.request('release', username)
+
+def restore_users():
+    """Benutzer eines früheren Prozesses (STATE_STORE mit Key-Value-Server): ihre Verbindungen sind weg,
+    sie können sich innerhalb von DISCONNECT_TIMEOUT wieder verbinden"""
+    for sid in list(users_by_sid):
+        del users_by_sid[sid]
+    for username in list(disconnect_timers):
+        del disconnect_timers[username]
+    for username in list(users):
+        claimed, _ = bus.request('claim', username)
+        if not claimed:
+            del users[username]
+            continue
+        bus.request('set_connected', username, False)
+        user = users[username]
+        user['status'] = 'disconnecting'
+        if user.get('game_id') not in games:
+            user['game_id'] = None
+        start_disconnect_timer(username)
+    if users:
+        print(f"{len(users)} Benutzer aus dem State-Store übernommen", flush=True)
+
+def restore_games():
+    """Spiele aus den Snapshots wiederherstellen, ihre Spieler verbinden sich über reconnect_user wieder"""
+    for snapshot in snapshot_store.load():
+        try:
+            game = Game.from_snapshot(socketio, users, snapshot, scheduler=scheduler)
+        except Exception as e:
+            # ein kaputter Snapshot darf den Start nicht verhindern
+            game_id = snapshot.get('game_id') if isinstance(snapshot, dict) else None
+            print(f"Snapshot von Spiel {game_id} nicht wiederherstellbar, wird verworfen: {e!r}", flush=True)
+            traceback.print_exc()
+            if game_id is not None:
+                scheduler.cancel(('timer', game_id))
+                snapshot_store.delete(game_id)
+            continue
+        games[game.game_id] = game
+        game.on_membership = on_game_membership
+        for player in game.player_status:
+            on_game_membership(game.game_id, player, True)
+        if gamelog.EVENT_LOG_DIR:
+            gamelog.start_log(game, gamelog.log_path(game.game_id))  # neuer Abschnitt ab dem Snapshot
+        for player in list(game.player_status):
+            if player in users:
+                # aus dem State-Store übernommen (restore_users), außer er ist inzwischen in einem anderen Spiel
+                if users[player].get('game_id') != game.game_id:
+                    game.remove_player(player)
+                continue
+            claimed, _ = bus.request('claim', player)
+            if not claimed:
+                # Name inzwischen anderweitig vergeben
+                game.remove_player(player)
+                continue
+            users[player] = {
+                'sid': None,
+                'game_id': game.game_id,
+                'status': 'disconnecting'
+            }
+            last_seen[player] = time.time()
+            bus.request('set_connected', player, False)
+            start_disconnect_timer(player)
+
+        if game.owner is None:
+            delete_game(game)
+            snapshot_store.delete(game.game_id)
+            continue
+        game.on_change = on_game_change
+        on_game_change(game.game_id)
+
+    if games:
+        print(f"{len(games)} Spiele aus Snapshots wiederhergestellt", flush=True)
+        start_timer_task()
+
+if snapshot_store is not None:
+    restore_games()
+    scheduler.schedule_in(('snapshot_periodic',), snapshots.SNAPSHOT_INTERVAL, save_periodic_snapshots)
+if state_store.persistent:
+    restore_users()
 
 @app.route('/')
 def index():
-    return render_template('index.html')
+    return render_template('index.html', card_catalog_url=url_for('get_card_catalog', filename=card_catalog.filename),
+                           custom_card_offset=CUSTOM_CARD_OFFSET)
+
+@app.route('/cards/<filename>')
+def get_card_catalog(filename):
+    """Kartenkatalog, die URL enthält den Inhalts-Hash und ändert sich mit jeder neuen Kartenversion"""
+    if filename != card_catalog.filename:
+        return redirect(url_for('get_card_catalog', filename=card_catalog.filename))
+
+    if 'gzip' in request.accept_encodings:
+        response = Response(card_catalog.gzip_body, mimetype='application/json')
+        response.content_encoding = 'gzip'
+    else:
+        response = Response(card_catalog.body, mimetype='application/json')
+    response.vary.add('Accept-Encoding')
+    response.set_etag(card_catalog.version)
+    response.cache_control.public = True
+    response.cache_control.max_age = 31536000
+    response.cache_control.immutable = True
+    return response.make_conditional(request)
+
+@app.route('/cards/import', methods=['POST'])
+def import_card_pack():
+    """Importiert einen Kartensatz aus dem Request-Body (CSV oder JSON Lines).
+
+    Der Body wird im Event-Loop blockweise in eine temporäre Datei kopiert, höchstens CARD_IMPORT_MAX_BYTES. Der Import
+    selbst (Sperre, zeilenweises Lesen, Deduplizierung, Schreiben) läuft in einem Thread von eventlet.tpool, damit er
+    die anderen Clients nicht blockiert.
+    """
+    if not CARD_IMPORT_TOKEN or CARD_DB is None:
+        return jsonify({'message': 'Kartenimport ist nicht aktiviert'}), 404
+    if not hmac.compare_digest(request.headers.get('Authorization', '').encode(), f'Bearer {CARD_IMPORT_TOKEN}'.encode()):
+        return jsonify({'message': 'Nicht autorisiert'}), 401
+
+    fmt = request.args.get('format') or ('csv' if request.mimetype == 'text/csv' else 'jsonl')
+    if fmt not in ('csv', 'jsonl'):
+        return jsonify({'message': 'Falscher Input'}), 400
+    if request.content_length is None:
+        # ohne Content-Length (chunked) liefert Werkzeug unter eventlet einen leeren Body
+        return jsonify({'message': 'Content-Length fehlt'}), 411
+    if request.content_length > CARD_IMPORT_MAX_BYTES:
+        return jsonify({'message': f'Datei ist größer als {CARD_IMPORT_MAX_BYTES} Bytes'}), 413
+    tags = request.args.get('tags')
+    with tempfile.NamedTemporaryFile(prefix='cards-import-') as upload:
+        try:
+            shutil.copyfileobj(request.stream, upload, 64 * 1024)
+        except RequestEntityTooLarge:
+            return jsonify({'message': f'Datei ist größer als {CARD_IMPORT_MAX_BYTES} Bytes'}), 413
+        upload.flush()
+        success, result = eventlet.tpool.execute(importer.import_file, upload.name, fmt, request.args.get('pack'),
+                                                 request.args.get('name'), request.args.get('description'),
+                                                 tags.split(',') if tags is not None else None, CARD_DB_PATH)
+    if not success:
+        return jsonify({'message': result}), 400
+
+    reload_cards()
+    bus.publish('cluster', {'cards_changed': True})
+    print(result.summary(), flush=True)
+    return jsonify(result.to_dict())
+
+@app.route('/metrics')
+def get_metrics():
+    """Metriken dieses Workers im Textformat von Prometheus, mit METRICS_TOKEN nur mit Authorization: Bearer <Token>"""
+    if server_metrics is None:
+        return Response('Metriken sind nicht aktiviert\n', status=404, mimetype='text/plain')
+    if metrics.METRICS_TOKEN and not hmac.compare_digest(request.headers.get('Authorization', '').encode(),
+                                                         f'Bearer {metrics.METRICS_TOKEN}'.encode()):
+        return Response('Nicht autorisiert\n', status=401, mimetype='text/plain')
+
+    text = server_metrics.render([
+        ('cae_games', "Spiele auf diesem Worker", len(games)),
+        ('cae_lobby_users', "Clients auf dem Lobby-Bildschirm", len(lobby_users)),
+        ('cae_scheduled_deadlines', "Geplante Deadlines im Timer-Task", len(scheduler)),
+    ])
+    response = Response(text, mimetype='text/plain')
+    response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+    response.cache_control.no_store = True
+    return response
 
 @socketio.on('funny_name_used')
 def handle_funny_name_used(data):
@@ -107,6 +450,9 @@ def handle_funny_name_used(data):
         available = True
         if n in users and users[n].get('status', 'connected') == 'connected':
             available = False
+        elif bus.clustered:
+            owner = bus.request('owner', n)
+            available = owner is None or owner[0] == bus.worker or not owner[1]
         if available:
             name = n
             break
@@ -129,28 +475,26 @@ def handle_ping(data):
     # update client last seen + game-player_status if exist
     username = users_by_sid.get(request.sid, None)
     if username and username in users:
-        users[username]['status'] = 'connected'
-        users[username]['last_seen'] = time.time()
+        last_seen[username] = time.time()
+        # StoredRecord schreibt jede Zuweisung zurück, daher nur bei einer Änderung
+        if users[username].get('status') != 'connected':
+            users[username]['status'] = 'connected'
         game_id = users[username].get('game_id')
         if game_id and game_id in games:
             game = games[game_id]
             game.mark_player_connection_status(username, 'connected')
 
 @socketio.on('connect')
-def handle_connect():
-    global global_timer_task, timer_started
+def handle_connect(auth=None):
     print(f'Client connected: {request.sid}', flush=True)
     users_by_sid[request.sid] = None  # Noch kein Username zugewiesen
     
     # Starte Timer beim ersten Connect
-    if not timer_started:
-        timer_started = True
-        print("Starte Universal Timer Task...", flush=True)
-        global_timer_task = socketio.start_background_task(universal_timer_task)
-        print("Universal Timer Task wurde gestartet", flush=True)
+    start_timer_task()
 
 @socketio.on('disconnect')
-def handle_disconnect():
+def handle_disconnect(reason=None):
+    # reason übergibt erst python-socketio >= 5.12, ohne Parameter würde jeder Disconnect über einen TypeError erneut aufgerufen
     print(f'Client disconnected: {request.sid}', flush=True)
     # Finde Benutzer mit dieser SID
     username = users_by_sid.get(request.sid, None)
@@ -159,6 +503,8 @@ def handle_disconnect():
     if username:
         # Markiere als disconnecting
         users[username]['status'] = 'disconnecting'
+        lobby_users.discard(username)  # SocketIO entfernt die SID selbst aus dem Raum
+        bus.request('set_connected', username, False)
         
         # Informiere Mitspieler über Status-Änderung
         game_id = users[username].get('game_id')
@@ -166,7 +512,7 @@ def handle_disconnect():
             game = games[game_id]
             game.mark_player_connection_status(username, 'disconnecting')
         
-        disconnect_timers[username] = time.time()
+        start_disconnect_timer(username)
 
 @socketio.on('set_username')
 def handle_set_username(data):
@@ -201,19 +547,24 @@ def handle_set_username(data):
         if user_status == 'connected':
             emit('username_error', {'message': 'Dieser Name ist bereits vergeben'})
             return
+
+    # Namen clusterweit belegen, auf anderen Workern kann er verbunden vergeben sein
+    claimed, _ = bus.request('claim', username)
+    if not claimed:
+        emit('username_error', {'message': 'Dieser Name ist bereits vergeben'})
+        return
     
     # Registriere Benutzer
     users[username] = {
         'sid': request.sid,
-        'last_seen': time.time(),
         'game_id': None,
         'status': 'connected'
     }
+    last_seen[username] = time.time()
     users_by_sid[request.sid] = username
     
     # Lösche eventuellen Timer
-    if username in disconnect_timers:
-        del disconnect_timers[username]
+    stop_disconnect_timer(username)
     
     emit('username_set', {'username': username})
 
@@ -233,13 +584,13 @@ def handle_reconnect(data):
 
         # Aktualisiere SID
         users[username]['sid'] = request.sid
-        users[username]['last_seen'] = time.time()
         users[username]['status'] = 'connected'
+        last_seen[username] = time.time()
         users_by_sid[request.sid] = username
+        bus.request('set_connected', username, True)
         
         # Lösche potenziellen Timer
-        if username in disconnect_timers:
-            del disconnect_timers[username]
+        stop_disconnect_timer(username)
 
         game_id = users[username].get('game_id')
         hasGame = game_id is not None and game_id in games
@@ -258,13 +609,18 @@ def handle_reconnect(data):
             
             emit('reconnected', {
                 'success': True,
-                'game': game.get_socket_game_data(current_playerName=username, include_history=True)
+                'game': game.get_full_sync_data(username)
             })
         else:
             emit('reconnected', {
                 'success': False
                 })
     else:
+        owner = bus.request('owner', username) if bus.clustered else None
+        if owner is not None and owner[0] != bus.worker:
+            # der Benutzer ist auf einem anderen Worker angemeldet (z.B. Seite neu geladen)
+            emit('switch_worker', {'url': cluster.worker_url(owner[0], request.host, request.scheme)})
+            return
         emit('reconnected', {
             'success': False,
             'reload': True,
@@ -298,11 +654,7 @@ def handle_submit_reaction(data):
         return
     
     # Benachrichtige den Spieler über den erfolgreichen Empfang
-    emit('game_state_update', game.get_socket_game_data(
-                    include_player_cards=False,
-                    current_playerName=username,
-                    include_history=False
-                ))
+    game.send_socket_game_update([username])
 
 @socketio.on('return_to_lobby')
 def handle_return_to_lobby():
@@ -317,8 +669,7 @@ def handle_return_to_lobby():
         return
     
     # Informiere alle Spieler
-    game.send_socket_game_update_for_all(channel='game_state_update', include_history=True)
-    broadcastPublicGames()
+    game.send_socket_game_update_for_all(channel='game_state_update')
 
 @socketio.on('create_game')
 def handle_create_game(data):
@@ -329,31 +680,100 @@ def handle_create_game(data):
     game_name = data.get('name', username + "'s Spiel").strip()
     is_public = data.get('is_public', True)
     password = data.get('password', '').strip()
+
+    # neue Spiele werden zufällig auf die Worker verteilt; das umgeleitete create_game nennt den gewählten
+    # Worker, der das Spiel dann selbst anlegt, statt erneut zu würfeln
+    if data.get('worker') != bus.worker:
+        target = str(uuid.uuid4())
+        if is_remote_game(target):
+            redirect_to_worker(username, target, 'create_game', dict(data, worker=cluster.shard_for(target)))
+            return
     
-    game = Game(socketio, users, username, game_name, isPublicVisible=is_public, password=password)
+    game = Game(socketio, users, username, game_name, isPublicVisible=is_public, password=password, scheduler=scheduler,
+                game_id=cluster.new_game_id() if bus.clustered else None)
     game_id = game.game_id
     games[game_id] = game
+    if gamelog.EVENT_LOG_DIR:
+        gamelog.start_log(game, gamelog.log_path(game_id))
+    game.on_change = on_game_change  # jede Änderung am Spiel prüft den Lobby-Eintrag und merkt einen Snapshot vor
+    game.on_membership = on_game_membership
+    on_game_membership(game_id, username, True)
+    broadcastPublicGames(game_id)
     
     users[username]['game_id'] = game_id
+    leave_lobby(username)
     join_room(game_id)
     
-    emit('game_created', game.get_socket_game_data())
-    # Aktualisiere Lobby für alle
-    broadcastPublicGames()
+    emit('game_created', game.get_full_sync_data(username))
 
 @socketio.on('get_public_games')
 def handle_get_public_games():
     success,username,game = get_current_data(need_game=False)
     if not success:
         return
-    emit('public_games_list', {'games': get_public_games(username)})
+    # Ab jetzt erhält der Client Lobby-Aktualisierungen über den Lobby-Raum
+    join_lobby(username)
+    emit('public_games_list', {'games': with_pending_games(public_games_index.list(), get_pending_games(username))})
+
+@socketio.on('query_public_games')
+def handle_query_public_games(data):
+    """Sendet eine Seite der öffentlichen Spiele (Sortierung, Filter, Namenssuche)"""
+    success,username,game = get_current_data(need_game=False)
+    if not success:
+        return
+
+    try:
+        offset = max(0, int(data.get('offset', 0)))
+        limit = int(data.get('limit', 20))
+        free_slots = int(data.get('free_slots', 0))
+        prefix = str(data.get('prefix', '')).strip()
+    except (TypeError, ValueError):
+        emit('error', {'message': 'Falscher Input'})
+        return
+
+    sort = data.get('sort', 'created')
+    if sort not in SORT_KEYS:
+        emit('error', {'message': 'Unbekannte Sortierung'})
+        return
+    has_password = data.get('has_password')
+
+    page, has_more = public_games_index.query(
+        sort=sort,
+        descending=bool(data.get('descending', False)),
+        offset=offset,
+        limit=limit,
+        prefix=prefix,
+        has_password=has_password if isinstance(has_password, bool) else None,
+        joinable=bool(data.get('joinable', False)),
+        not_started=bool(data.get('not_started', False)),
+        free_slots=free_slots
+    )
+    if offset == 0:
+        # Eigene offene Spiele stehen immer auf der ersten Seite
+        page = with_pending_games(page, get_pending_games(username))
+
+    # Änderungen an den Spielen kommen danach als Lobby-Deltas
+    join_lobby(username)
+    emit('public_games_page', {
+        'games': page,
+        'offset': offset,
+        'has_more': has_more
+    })
 
 @socketio.on('get_game_info_link_join')
 def handle_get_game_info(data):
-    success,username,game = get_current_data(need_game=True)
+    success,username,game = get_current_data(need_game=False)
     if not success:
         emit('game_info_link_join_error', {'message': 'Spiel nicht gefunden'})
         return
+    game_id = data.get('game_id')
+    if is_remote_game(game_id):
+        redirect_to_worker(username, game_id, 'get_game_info_link_join', data)
+        return
+    game = games.get(game_id)
+    if game is None:
+        emit('game_info_link_join_error', {'message': 'Spiel nicht gefunden'})
+        return
     
     emit('game_info_link_join', {
         'id': game.game_id,
@@ -362,20 +782,17 @@ def handle_get_game_info(data):
         'started': game.is_game_started()
     })
 
-def get_public_games(username=None):
-    """Gibt alle öffentlichen Spiele zurück"""
-    public_games = []
-    for game_id, game in games.items():
-        pending = game.is_pending_player(username)
-        if pending or ((not game.is_game_started() and game.settings["publicVisible"]) or (game.is_game_started() and game.settings["publicVisibleDuringGame"])):
-            public_games.append({
-                'id': game_id,
-                'is_pending': pending,
-                'name': game.settings["gameName"],
-                'players': len(game.active_players),
-                'has_password': bool(game.settings["password"])
-            })
-    return public_games
+def get_pending_games(username):
+    """Spiele, in denen der Nutzer noch als nicht verbunden geführt wird (nur seine Spiele aus player_games)"""
+    pending_games = [games[game_id] for game_id in player_games.get(username, ()) if game_id in games]
+    return sorted((game for game in pending_games if game.is_pending_player(username)), key=lambda game: game.created_at)
+
+def with_pending_games(public_games, pending_games):
+    """Blendet die offenen Spiele eines Nutzers in die gemeinsame Liste ein"""
+    if not pending_games:
+        return public_games
+    pending_ids = {game.game_id for game in pending_games}
+    return [public_game_entry(game, pending=True) for game in pending_games] + [entry for entry in public_games if entry['id'] not in pending_ids]
 
 @socketio.on('get_game_state')
 def handle_get_game_state():
@@ -384,7 +801,27 @@ def handle_get_game_state():
     if not success:
         return
     
-    emit('game_state_update', game.get_socket_game_data(current_playerName=username, include_history=True))
+    emit('game_state_update', game.get_full_sync_data(username))
+
+@socketio.on('get_history')
+def handle_get_history(data):
+    """Sendet einen Ausschnitt des Rundenverlaufs (für Clients die round_finished Events verpasst haben)"""
+    success,username,game = get_current_data(need_game=True)
+    if not success:
+        return
+
+    try:
+        from_round = max(0, int(data.get('from_round', 0)))
+        limit = int(data.get('limit', HISTORY_PAGE_LIMIT))
+    except (TypeError, ValueError):
+        emit('error', {'message': 'Falscher Input'})
+        return
+
+    emit('history_page', {
+        'from_round': from_round,
+        'entries': game.get_history(from_round, limit),
+        'total': len(game.history)
+    })
 
 @socketio.on('join_game')
 def handle_join_game(data):
@@ -395,6 +832,10 @@ def handle_join_game(data):
     game_id = data.get('game_id')
     password = data.get('password', '')
     is_spectator = data.get('is_spectator', False)  # Ob als Zuschauer beigetreten wird
+
+    if is_remote_game(game_id):
+        redirect_to_worker(username, game_id, 'join_game', data)
+        return
     
     if game_id not in games:
         emit('error', {'message': 'Spiel nicht gefunden'})
@@ -410,22 +851,20 @@ def handle_join_game(data):
     success, message = game.add_player(username, isSpectator=is_spectator)
     if success:
         users[username]['game_id'] = game_id
+        leave_lobby(username)
         join_room(game_id)
     
-        emit('game_joined', game.get_socket_game_data(current_playerName=username, include_history=True))
+        emit('game_joined', game.get_full_sync_data(username))
         
         # Informiere andere Spieler
         emit('player_joined', {
             'username': username,
-            'is_spectator': is_spectator,
-            'game': game.get_socket_game_data(include_history=True)
+            'is_spectator': is_spectator
         }, room=game_id, include_self=False)
+        game.send_socket_game_update([p for p in game.active_players + game.spectators if p != username])
 
     else:
         emit('error', {'message': message})
-            
-    # Aktualisiere Lobby
-    broadcastPublicGames()
 
 @socketio.on('leave_game')
 def handle_leave_game():
@@ -440,17 +879,15 @@ def handle_leave_game():
     
     # Spiel löschen wenn leer
     if game.owner == None:
-        del games[game.game_id]
+        delete_game(game)
     else:
         # Informiere andere Spieler
         emit('player_left', {
-            'username': username,
-            'game': game.get_socket_game_data(include_history=True)
+            'username': username
         }, room=game.game_id)
+        game.send_socket_game_update_for_all()
     
     emit('left_game', {})
-    # Aktualisiere Lobby
-    broadcastPublicGames()
 
 
 # return succes,username,game
@@ -508,14 +945,14 @@ def handle_kick_player(data):
                 socketio.emit('kicked_from_game', {
                     'message': f'Du wurdest von {kicker} aus dem Spiel entfernt'
                 }, room=kicked_sid)
+                leave_room(game.game_id, sid=kicked_sid)
             
             # Informiere alle anderen
             socketio.emit('player_left', {
-                'username': kicked_user,
-                'game': game.get_socket_game_data(include_history=True)
+                'username': kicked_user
             }, room=game.game_id)
+            game.send_socket_game_update_for_all()
             
-            broadcastPublicGames()
 
 @socketio.on('toggle_role')
 def handle_toggle_role():
@@ -535,9 +972,9 @@ def handle_toggle_role():
         # Informiere alle im Raum
         emit('role_changed', {
             'username': username,
-            'role': 'Spieler' if was_spectator else 'Zuschauer',
-            'game': game.get_socket_game_data(),
+            'role': 'Spieler' if was_spectator else 'Zuschauer'
         }, room=game.game_id)
+        game.send_socket_game_update_for_all()
         
         emit('success', {'message': f'Du bist jetzt {"Spieler" if was_spectator else "Zuschauer"}'})
     else:
@@ -576,9 +1013,9 @@ def handle_force_role(data):
         emit('role_changed', {
             'username': target_username,
             'role': 'Spieler' if was_spectator else 'Zuschauer',
-            'game': game.get_socket_game_data(),
             'forced_by': creator
         }, room=game.game_id)
+        game.send_socket_game_update_for_all()
         
         emit('success', {'message': f'Du bist jetzt {"Spieler" if was_spectator else "Zuschauer"}'})
     else:
@@ -601,8 +1038,6 @@ def handle_update_settings(settings):
     # Informiere alle Spieler im Raum
     game.send_socket_game_update_for_all(channel='settings_updated')
     
-    # Aktualisiere Lobby
-    broadcastPublicGames()
 
 @socketio.on('start_game')
 def handle_start_game():
@@ -620,13 +1055,15 @@ def handle_start_game():
     if active_player_count < 3:
         emit('error', {'message': 'Mindestens 3 aktive Spieler erforderlich (Zuschauer zählen nicht)'})
         return
+
+    missing_cards = game.missing_cards()
+    if missing_cards is not None:
+        emit('error', {'message': missing_cards})
+        return
     
     if game.start_game():
         socketio.emit('info', {'message': f'Spiel gestartet'}, room=game.game_id)
         game.send_socket_game_update_for_all(channel='game_started')
-        
-    # Aktualisiere Lobby in jedem Fall
-    broadcastPublicGames()
     
 @socketio.on('submit_answers')
 def handle_submit_answers(data):
@@ -669,7 +1106,7 @@ def handle_submit_answers(data):
         game.autosubmit_white_cards()
 
     # Sende vollständigen aktuellen Spielzustand an alle
-    game.send_socket_game_update_for_all(channel='game_state_update', include_history=True)
+    game.send_socket_game_update_for_all(channel='game_state_update')
 
 @socketio.on('vote_winner')
 def handle_vote_winner(data):
@@ -699,7 +1136,7 @@ def handle_vote_winner(data):
         emit('error', {'message': error})
         return
     
-    game.send_socket_game_update_for_all(channel='game_state_update', include_history=True)
+    game.send_socket_game_update_for_all(channel='game_state_update')
 
 
 @socketio.on('pause_game')
@@ -726,10 +1163,10 @@ def handle_pause_game():
         emit('error', {'message': 'Das Spiel ist bereits pausiert'})
         return
     
-    game.paused = True
+    game.pause()
     
     # Informiere alle Spieler mit aktuellem Timer
-    socketio.emit('game_paused', {'time_left': game.currentTimerSeconds}, room=game.game_id)
+    socketio.emit('game_paused', game.get_timer_sync_data(), room=game.game_id)
 
 @socketio.on('resume_game')
 def handle_resume_game():
@@ -750,10 +1187,19 @@ def handle_resume_game():
         emit('error', {'message': 'Das Spiel ist nicht pausiert'})
         return
     
-    game.paused = False
+    game.resume()
     
-    # Informiere alle Spieler - Timer läuft automatisch weiter durch universal_timer_task
-    socketio.emit('game_resumed', {'time_left': game.currentTimerSeconds}, room=game.game_id)
+    # Informiere alle Spieler - Clients zählen lokal bis zur neuen Deadline herunter
+    socketio.emit('game_resumed', game.get_timer_sync_data(), room=game.game_id)
+
+@socketio.on('request_timer_sync')
+def handle_request_timer_sync():
+    """Client fordert Timer-Sync an (z.B. nach erkannter Uhrabweichung oder wenn der Tab wieder sichtbar wird)"""
+    success,username,game = get_current_data(need_game=True)
+    if not success:
+        return
+
+    emit('timer_sync', game.get_timer_sync_data())
 
 @socketio.on('reset_to_lobby')
 def handle_reset_to_lobby():
@@ -770,10 +1216,22 @@ def handle_reset_to_lobby():
     game.reset_to_lobby()
     
     # Informiere alle Spieler
-    game.send_socket_game_update_for_all(channel='game_reset_to_lobby', include_history=True)
-    broadcastPublicGames()
+    game.send_socket_game_update_for_all(channel='game_reset_to_lobby')
+
+if server_metrics is not None:
+    server_metrics.instrument(socketio.server)
 
 if __name__ == '__main__':
     print("Starte Server...", flush=True)
-    socketio.run(app, host='0.0.0.0', port=5000, debug=True, allow_unsafe_werkzeug=True)
+    # im Mehr-Worker-Betrieb ohne Debug-Reloader, der einen zweiten Prozess mit demselben Worker-Index starten würde
+    try:
+        socketio.run(app, host='0.0.0.0', port=int(os.environ.get('PORT', '5000')), debug=DEBUG,
+                     allow_unsafe_werkzeug=True)
+    finally:
+        if snapshot_store is not None:
+            # letzter Stand aller Spiele vor dem Beenden
+            for game in games.values():
+                snapshot_store.save(game)
+            snapshot_store.close()
+        gamelog.flush()  # noch eingereihte Protokolldatensätze
 
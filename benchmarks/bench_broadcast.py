@@ -0,0 +1,68 @@
+"""Kodierungsaufwand pro Spielzustands-Broadcast.
+
+Vergleicht den früheren Weg (vollständiger Zustand pro Empfänger, einzeln
+kodiert) mit dem aktuellen (gemeinsames Delta einmal kodiert, plus kleine
+private Updates). 'vollsync' misst vollständige Zustände für alle Zuschauer
+innerhalb einer Revision (z.B. Massen-Reconnect), die aus dem pro Revision
+zwischengespeicherten, kodierten Zustand zusammengesetzt werden. Aufruf: python benchmarks/bench_broadcast.py [--players 10 --spectators 50]
+"""
+import argparse
+import time
+
+from common import make_game, payload
+
+
+def legacy_broadcast(game):
+    """Bisheriges Verhalten: get_socket_game_data und JSON-Kodierung für jeden Zuschauer einzeln"""
+    for player in game.active_players + game.spectators:
+        data = game.get_socket_game_data(current_playerName=player, include_history=True)
+        game.socketio.emit('game_state_update', data, room=game.global_player_data[player]['sid'])
+
+
+def shared_broadcast(game):
+    game.send_socket_game_update_for_all()
+
+
+def full_sync_burst(game):
+    """Massen-Reconnect: alle Zuschauer fordern innerhalb einer Revision den vollständigen Zustand an"""
+    for player in game.active_players + game.spectators:
+        game.socketio.emit('reconnected', {'success': True, 'game': game.get_full_sync_data(player)},
+                           room=game.global_player_data[player]['sid'])
+
+
+def measure(game, broadcast, iterations):
+    for player in game.active_players + game.spectators:
+        game.get_full_sync_data(player)
+    game.socketio.reset()
+
+    elapsed = 0.0
+    for i in range(iterations):
+        # typische Änderung zwischen zwei Broadcasts: ein Verbindungsstatus wechselt
+        player = game.active_players[i % len(game.active_players)]
+        game.player_status[player] = 'disconnected' if game.player_status[player] == 'connected' else 'connected'
+        game.mark_dirty()
+
+        start = time.perf_counter()
+        broadcast(game)
+        elapsed += time.perf_counter() - start
+    return elapsed / iterations, game.socketio.packets / iterations, game.socketio.bytes / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--players', type=int, default=10)
+    parser.add_argument('--spectators', type=int, default=50)
+    parser.add_argument('--rounds', type=int, default=10, help="bereits gespielte Runden (Größe des Verlaufs)")
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{args.players} Spieler, {args.spectators} Zuschauer, {args.rounds} Runden, {args.iterations} Broadcasts")
+    print(f"{'Variante':<10} {'ms/Broadcast':>13} {'Pakete':>8} {'Bytes':>10}")
+    for name, broadcast in (('einzeln', legacy_broadcast), ('geteilt', shared_broadcast), ('vollsync', full_sync_burst)):
+        game = make_game(args.players, args.spectators, args.rounds)
+        seconds, packets, size = measure(game, broadcast, args.iterations)
+        print(f"{name:<10} {seconds * 1000:>13.3f} {packets:>8.1f} {size:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,254 @@
+"""Mikro-Benchmarks der heißen Pfade von Game und der Lobby.
+
+Misst einzelne Aufrufe ohne Server gegen StubSocketIO (common.py) über ein
+Raster aus Spielerzahl, Zuschauerzahl und Verlaufslänge (Spiele bei der
+Lobby). Gemessen wird nur der Aufruf selbst; den Zustand davor (neue Runde,
+Handkarten, Revision) stellt eine Vorbereitung außerhalb der Zeitmessung her.
+
+Das Ergebnis kann als JSON gespeichert (--json) und mit einem früheren Lauf
+verglichen werden (--compare): Fälle, deren Median um mehr als --threshold
+langsamer ist, werden gemeldet und der Exit-Code ist 1.
+
+Aufruf: python benchmarks/bench_game.py [--quick] [--json ergebnis.json] [--compare vorher.json]
+"""
+import argparse
+import gc
+import itertools
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+
+from common import ROOT, make_game, StubSocketIO
+from game import Game
+from lobby import PublicGameIndex
+
+GRID = {'players': [3, 10], 'spectators': [0, 50, 200], 'rounds': [0, 50]}
+QUICK_GRID = {'players': [5], 'spectators': [0, 50], 'rounds': [10]}
+LOBBY_GAMES = [100, 1000, 10000]
+QUICK_LOBBY_GAMES = [100, 1000]
+
+
+def restart_round(game):
+    """Zurück an den Anfang der Kartenphase mit vollen Händen"""
+    game.state = 'choosing_cards'
+    game.submitted_white_cards = {}
+    game.player_mapping = []
+    game.current_reactions = {}
+    game.winner_choosen = False
+    game.fill_player_hands()
+
+
+_changes = itertools.count()
+
+
+def next_change(game):
+    """Typische Änderung zwischen zwei Updates: ein Verbindungsstatus wechselt"""
+    player = game.active_players[next(_changes) % len(game.active_players)]
+    game.player_status[player] = 'disconnected' if game.player_status[player] == 'connected' else 'connected'
+    game.mark_dirty()
+
+
+# Jeder Fall liefert (Vorbereitung() -> Argumente, Aufruf(*Argumente), Nachbereitung() oder None)
+def case_get_socket_game_data(game):
+    viewers = game.active_players + game.spectators
+
+    def setup():
+        next_change(game)
+        return (random.choice(viewers),)
+    return setup, lambda player: game.get_socket_game_data(current_playerName=player, include_history=True), None
+
+
+def case_send_socket_game_update_for_all(game):
+    for player in game.active_players + game.spectators:
+        game.get_full_sync_data(player)
+
+    def setup():
+        next_change(game)
+        return ()
+    return setup, game.send_socket_game_update_for_all, None
+
+
+def case_fill_player_hands(game):
+    def setup():
+        # nach einer Abgabe fehlen jedem Spieler außer dem Czar die gespielten Karten
+        for player in game.active_players:
+            if player != game.czar:
+                for card in game.playerCards[player][:game.current_black_card["num_blanks"]]:
+                    game.playerCards[player].remove(card)
+                    game.white_deck.discard(card)
+        return ()
+    return setup, game.fill_player_hands, None
+
+
+def case_submit_white_cards(game):
+    def setup():
+        waiting = [player for player in game.active_players
+                   if player != game.czar and player not in game.submitted_white_cards]
+        if game.state != 'choosing_cards' or not waiting:
+            restart_round(game)
+            waiting = [player for player in game.active_players if player != game.czar]
+        return waiting[0], list(range(game.current_black_card["num_blanks"]))
+    return setup, game.submit_white_cards, None
+
+
+def case_autosubmit_white_cards(game):
+    def setup():
+        restart_round(game)
+        return ()
+    return setup, lambda: game.autosubmit_white_cards(ignoreConnection=True), None
+
+
+def case_finalize_winner_choice(game):
+    def setup():
+        restart_round(game)
+        game.autosubmit_white_cards(ignoreConnection=True)
+        game.current_czar_selected_player = game.player_mapping[0]
+        game.choosing_playerName = game.czar
+        return ()
+
+    def teardown():
+        # der Verlauf soll die eingestellte Länge behalten
+        game.history.pop()
+    return setup, game.finalize_winner_choice, teardown
+
+
+GAME_CASES = {
+    'get_socket_game_data': case_get_socket_game_data,
+    'send_socket_game_update_for_all': case_send_socket_game_update_for_all,
+    'fill_player_hands': case_fill_player_hands,
+    'submit_white_cards': case_submit_white_cards,
+    'autosubmit_white_cards': case_autosubmit_white_cards,
+    'finalize_winner_choice': case_finalize_winner_choice,
+}
+
+
+def make_lobby(count):
+    games = {}
+    index = PublicGameIndex(games)
+    rng = random.Random(count)
+    for i in range(count):
+        game = Game(None, {}, f"Host{i}", f"Spiel {i}", password=rng.choice(['', '', '', 'geheim']))
+        game.active_players.extend(f"P{i}-{n}" for n in range(rng.randint(0, 8)))
+        games[game.game_id] = game
+        index.mark_changed(game.game_id)
+    index.refresh()
+    return index
+
+
+def case_get_public_games(index):
+    """Wie der Handler get_public_games: Liste aller gelisteten Spiele, als ein emit kodiert"""
+    socketio = StubSocketIO()
+    return (lambda: ()), lambda: socketio.emit('public_games_list', {'games': index.list()}), None
+
+
+def measure(case, iterations):
+    setup, call, teardown = case
+    times = []
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(iterations):
+            args = setup()
+            start = time.perf_counter()
+            call(*args)
+            times.append(time.perf_counter() - start)
+            if teardown is not None:
+                teardown()
+    finally:
+        gc.enable()
+    times.sort()
+    return {
+        'iterations': iterations,
+        'median_us': times[len(times) // 2] * 1e6,
+        'mean_us': sum(times) / len(times) * 1e6,
+        'min_us': times[0] * 1e6,
+        'p95_us': times[min(len(times) - 1, int(len(times) * 0.95))] * 1e6,
+    }
+
+
+def case_key(result):
+    return result['name'], tuple(sorted(result['params'].items()))
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path, threshold):
+    """Vergleicht die Mediane mit einem früheren Lauf, gibt die Anzahl der Verschlechterungen zurück"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    before = {case_key(result): result for result in baseline['results']}
+    print(f"\nVergleich mit {baseline_path} (Commit {baseline['meta'].get('commit')}), Schwelle {threshold:.2f}x")
+    regressions = 0
+    for result in results:
+        old = before.get(case_key(result))
+        if old is None:
+            continue
+        ratio = result['median_us'] / old['median_us'] if old['median_us'] else 1.0
+        if ratio > threshold:
+            regressions += 1
+            params = ', '.join(f"{key}={value}" for key, value in result['params'].items())
+            print(f"  LANGSAMER {result['name']} ({params}): {old['median_us']:.1f} -> {result['median_us']:.1f} µs ({ratio:.2f}x)")
+    if not regressions:
+        print("  keine Verschlechterung")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--quick', action='store_true', help="kleines Raster, z.B. vor jedem Commit")
+    parser.add_argument('--iterations', type=int, default=300)
+    parser.add_argument('--cases', nargs='+', choices=list(GAME_CASES) + ['get_public_games'], help="nur diese Fälle")
+    parser.add_argument('--json', help="Ergebnis als JSON in diese Datei schreiben")
+    parser.add_argument('--compare', help="früheres JSON-Ergebnis, mit dem verglichen wird")
+    parser.add_argument('--threshold', type=float, default=1.25, help="Faktor, ab dem ein Fall als langsamer gilt")
+    args = parser.parse_args()
+    random.seed(1)
+
+    grid = QUICK_GRID if args.quick else GRID
+    lobby_games = QUICK_LOBBY_GAMES if args.quick else LOBBY_GAMES
+    cases = args.cases or list(GAME_CASES) + ['get_public_games']
+    results = []
+
+    print(f"{'Fall':<32} {'Parameter':<34} {'Median µs':>10} {'p95 µs':>10}")
+    for name in cases:
+        if name == 'get_public_games':
+            configurations = [({'games': count}, lambda count=count: case_get_public_games(make_lobby(count)))
+                              for count in lobby_games]
+        else:
+            configurations = [(dict(zip(grid, values)), lambda values=values: GAME_CASES[name](make_game(*values)))
+                              for values in itertools.product(*grid.values())]
+        for params, build in configurations:
+            result = {'name': name, 'params': params}
+            result.update(measure(build(), args.iterations))
+            results.append(result)
+            label = ', '.join(f"{key}={value}" for key, value in params.items())
+            print(f"{name:<32} {label:<34} {result['median_us']:>10.1f} {result['p95_us']:>10.1f}", flush=True)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'meta': {
+                    'commit': git_commit(),
+                    'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                    'python': platform.python_version(),
+                    'machine': platform.machine(),
+                    'quick': args.quick,
+                },
+                'results': results
+            }, f, indent=2)
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
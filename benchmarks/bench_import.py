@@ -0,0 +1,120 @@
+"""Durchsatz und Speicherbedarf des Kartenimports (importer.py).
+
+Erzeugt CSV- und JSON-Lines-Dateien mit synthetischen Karten (20 % Fragen,
+dazu ein Anteil Duplikate), importiert sie in eine Kopie der Kartendatenbank
+und misst Dauer und RSS-Spitze in einem eigenen Prozess pro Lauf.
+Aufruf: python benchmarks/bench_import.py [--cards 100000]
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from common import ROOT
+
+# Läuft im Kindprozess, misst nur den Import (Datenbank und Manifest liegen schon bereit)
+CHILD = r'''
+import json, resource, sys, time
+sys.path.insert(0, {root!r})
+import importer
+
+def peak_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+before = peak_kb()
+start = time.perf_counter()
+with open({source!r}, encoding='utf-8', newline='') as stream:
+    success, report = importer.import_cards(importer.read_rows(stream, {fmt!r}), 'bench', db_path={db!r}, manifest_path={manifest!r})
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'peak_kb': peak_kb(), 'baseline_kb': before, 'report': report.to_dict()}}))
+'''
+
+WORDS = ("Waschbär Toaster Oma Raumschiff Bürokratie Käsekuchen Einhorn Steuererklärung Tanzbär "
+         "Nachbar Kaffeemaschine Gartenzwerg Philosophie Autobahn Quarkbällchen Zahnarzt").split()
+
+
+def generate_cards(count, rng):
+    """(Typ, Text, num_blanks); jede zehnte Karte wiederholt eine frühere (teils mit anderer Schreibweise)"""
+    cards = []
+    for index in range(count):
+        if index % 10 == 9 and cards:
+            card_type, text, num_blanks = cards[rng.randrange(len(cards))]
+            yield card_type, text.upper() if index % 20 == 19 else text, num_blanks
+            continue
+        words = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 6)))
+        if index % 5 == 0:
+            num_blanks = rng.choice((1, 1, 1, 2))
+            card = ('question', f"{words} {index}: " + ' und '.join(['_____'] * num_blanks) + '.', num_blanks)
+        else:
+            card = ('answer', f"{words} Nr. {index}", '')
+        if len(cards) < 1000:
+            cards.append(card)
+        yield card
+
+
+def write_sources(directory, count):
+    rng = random.Random(42)
+    csv_path = os.path.join(directory, 'cards.csv')
+    jsonl_path = os.path.join(directory, 'cards.jsonl')
+    with open(csv_path, 'w', encoding='utf-8', newline='') as csv_file, open(jsonl_path, 'w', encoding='utf-8') as jsonl_file:
+        import csv
+        writer = csv.writer(csv_file)
+        writer.writerow(('type', 'text', 'num_blanks'))
+        for card_type, text, num_blanks in generate_cards(count, rng):
+            writer.writerow((card_type, text, num_blanks))
+            row = {'type': card_type, 'text': text}
+            if num_blanks:
+                row['num_blanks'] = num_blanks
+            jsonl_file.write(json.dumps(row, ensure_ascii=False) + '\n')
+    return {'csv': csv_path, 'jsonl': jsonl_path}
+
+
+def run(directory, source, fmt):
+    """Frische Kopie von Datenbank und Manifest, dann Import im Kindprozess"""
+    import carddb
+    db = os.path.join(directory, 'cards.db')
+    manifest = os.path.join(directory, 'packs.json')
+    shutil.copyfile(carddb.DEFAULT_PATH, db)
+    with open(carddb.MANIFEST_PATH, encoding='utf-8') as f:
+        entries = json.load(f)
+    for entry in entries:  # Quellen relativ zum Repository, die Kopie liegt woanders
+        for key in carddb.SOURCE_KEYS:
+            if entry.get(key):
+                entry[key] = os.path.join(ROOT, entry[key])
+    with open(manifest, 'w', encoding='utf-8') as f:
+        json.dump(entries, f)
+    shutil.rmtree(os.path.join(directory, 'packs'), ignore_errors=True)
+
+    code = CHILD.format(root=ROOT, source=source, fmt=fmt, db=db, manifest=manifest)
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cards', type=int, default=100000)
+    args = parser.parse_args()
+
+    import carddb
+    if not carddb.is_current():
+        carddb.build_from_sources()
+
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"{'Format':<8} {'Karten':>8} {'Sekunden':>9} {'Karten/s':>10} {'RSS-Spitze KB':>14} {'davon Import':>13}  Ergebnis")
+        for count in sorted({args.cards // 10, args.cards}):
+            sources = write_sources(directory, count)
+            for fmt, source in sources.items():
+                result = run(directory, source, fmt)
+                report = result['report']
+                outcome = (f"{report['imported']['questions']} Fragen, {report['imported']['answers']} Antworten, "
+                           f"{report['duplicates'] + report['near_duplicates']} Duplikate, {report['invalid']} ungültig")
+                print(f"{fmt:<8} {count:>8} {result['seconds']:>9.2f} {count / result['seconds']:>10.0f} "
+                      f"{result['peak_kb']:>14} {result['peak_kb'] - result['baseline_kb']:>13}  {outcome}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,428 @@
+"""Lastgenerator: simulierte Socket.IO-Spieler gegen einen lokalen Server.
+
+Startet den Server (app.py, mit --workers N cluster.py) als eigenen Prozess
+ohne Debug-Modus und Snapshots und lässt --games Spiele mit je --players
+Spielern laufen. Jeder simulierte Spieler ist ein Socket.IO-Client (eventlet,
+ein Green Thread pro Client) und durchläuft dieselbe Ereignisfolge wie der
+Browser: set_username, create_game bzw. join_game, start_game (Ersteller),
+submit_answers, submit_reaction, vote_winner (Czar) und alle 5 Sekunden ping.
+Der Spielzustand wird wie im Browser aus vollständigen Zuständen und Deltas
+(statediff.patch) nachgeführt. Die Timer sind verkürzt (TIMER_SETTINGS), ein
+Teil der Spieler gibt nicht ab (--idle), damit auch Timer-Abläufe vorkommen.
+
+Gemessen werden:
+    - gesendete und empfangene Ereignisse pro Sekunde
+    - Handler-Latenz pro Ereignis (emit bis Ack des Servers), p50/p99
+    - Timer-Verspätung: server_time des timer_sync nach einem Phasenende minus
+      der angekündigten Deadline
+    - RSS aller Serverprozesse (Start, Maximum, Ende) und des Lastgenerators
+
+Aufruf: python benchmarks/bench_load.py [--games 50] [--players 5] [--duration 60] [--workers 1] [--json ergebnis.json]
+        python benchmarks/bench_load.py --url http://127.0.0.1:5000 ...   (bereits laufender Server, ohne RSS)
+Benötigt den Socket.IO-Client mit WebSocket-Transport: pip install -r benchmarks/requirements.txt
+"""
+import eventlet
+eventlet.monkey_patch()
+
+import argparse
+import json
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+
+import socketio
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from cards import CARDS_QUESTIONS
+from statediff import patch
+
+# verkürzte Phasen, die Spiele laufen bis zum Ende der Messung
+TIMER_SETTINGS = {
+    "timeToChooseWhiteCards": 4,
+    "timeToChooseWinner": 3,
+    "timeAfterWinnerChosen": 1,
+    "maxRounds": 10000,
+    "maxPointsToWin": 10000,
+    "maxPlayers": 20
+}
+PING_INTERVAL = 5  # Sekunden, wie static/js/script.js
+STATE_EVENTS = ('game_created', 'game_joined', 'game_state_update', 'game_started', 'settings_updated',
+                'game_reset_to_lobby')  # Ereignisse mit vollständigem Zustand, falls kein Delta möglich ist
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Stats:
+    def __init__(self):
+        self.sent = Counter()              # event: Anzahl
+        self.received = Counter()          # event: Anzahl
+        self.latencies = defaultdict(list)  # event: [Sekunden bis zum Ack]
+        self.lateness = []                 # Sekunden, die Phasen-Timer zu spät abgelaufen sind
+        self.errors = Counter()            # Fehlermeldung des Servers: Anzahl
+        self.resyncs = 0                   # Deltas mit unbekannter Basis, vollständiger Zustand angefordert
+
+
+class SimulatedPlayer:
+    def __init__(self, name, url, stats, options, host=False):
+        self.name = name
+        self.url = url
+        self.stats = stats
+        self.options = options
+        self.host = host
+        self.client = socketio.Client(reconnection=False)
+        self.client.on('*', self.on_event)
+        self.username_set = eventlet.Event()
+        self.game_joined = eventlet.Event()
+        self.game_id = None
+        self.state = None      # öffentlicher Spielzustand wie im Browser
+        self.revision = None
+        self.hand = []
+        self.acted = None      # (Runde, Phase), in der zuletzt gehandelt wurde
+        self.deadline = None   # letzte angekündigte Deadline (Server-Uhr), nur beim Ersteller
+        self.pending_switch = None
+        self.running = True
+
+    def connect(self):
+        self.client.connect(self.url, transports=['websocket'])
+        self.emit('set_username', {'username': self.name})
+        self.username_set.wait()
+        eventlet.spawn(self.ping_loop)
+
+    def emit(self, event, data=None):
+        sent = time.perf_counter()
+        self.stats.sent[event] += 1
+
+        def ack(*args):
+            self.stats.latencies[event].append(time.perf_counter() - sent)
+        self.client.emit(event, data, callback=ack)
+
+    def ping_loop(self):
+        ping_id = 0
+        eventlet.sleep(random.uniform(0, PING_INTERVAL))
+        while self.running and self.client.connected:
+            self.emit('ping', {'pingId': ping_id, 'startTime': int(time.time() * 1000)})
+            ping_id += 1
+            eventlet.sleep(PING_INTERVAL)
+
+    def on_event(self, event, *args):
+        self.stats.received[event] += 1
+        data = args[0] if args else None
+        if event == 'username_set':
+            if not self.username_set.ready():
+                self.username_set.send()
+            if self.pending_switch:
+                replay, self.pending_switch = self.pending_switch, None
+                self.emit(replay['event'], replay['data'])
+        elif event == 'switch_worker':
+            # Spiel liegt auf einem anderen Worker (cluster.py), dort neu anmelden und das Ereignis wiederholen
+            self.pending_switch = data['replay']
+            self.url = data['url']
+            eventlet.spawn(self.switch_worker)
+        elif event == 'error':
+            self.stats.errors[data.get('message')] += 1
+        elif event == 'game_state_delta':
+            if self.state is None or data['base'] != self.revision:
+                self.stats.resyncs += 1
+                self.emit('get_game_state')
+                return
+            patch(self.state, data['ops'])
+            self.revision = data['revision']
+            self.on_state_change()
+        elif event == 'game_private_update':
+            self.hand = data['private']['currentPlayerCards']
+            self.on_state_change()
+        elif event in STATE_EVENTS and isinstance(data, dict) and 'revision' in data:
+            self.state = data
+            self.revision = data['revision']
+            self.hand = data.get('currentPlayerCards', [])
+            self.game_id = data['game_id']
+            if not self.game_joined.ready():
+                self.game_joined.send()
+            self.on_state_change()
+        elif event == 'timer_sync' and self.host:
+            self.on_timer_sync(data)
+
+    def switch_worker(self):
+        self.client.disconnect()
+        self.client.connect(self.url, transports=['websocket'])
+        self.client.emit('set_username', {'username': self.name})
+
+    def on_timer_sync(self, data):
+        # eine neue Deadline nach Ablauf der alten: die Phase endete durch den Timer, nicht durch die Spieler
+        if self.deadline is not None and data['server_time'] >= self.deadline:
+            self.stats.lateness.append(data['server_time'] - self.deadline)
+        self.deadline = None if data['paused'] else data['deadline']
+
+    def on_state_change(self):
+        state = self.state
+        if state is None or not self.running:
+            return
+        if self.host and state['state'] == 'lobby' and len(state['active_players']) >= self.options.players \
+                and self.acted != 'start':
+            self.acted = 'start'
+            self.emit('update_settings', TIMER_SETTINGS)
+            self.emit('start_game')
+            return
+        key = (state['current_round'], state['state'])
+        if key == self.acted or state['paused']:
+            return
+        if state['state'] == 'choosing_cards' and state['czar'] != self.name and self.name in state['active_players'] \
+                and self.name not in state['submitted_white_cards'] and self.hand:
+            self.acted = key
+            if random.random() >= self.options.idle:
+                eventlet.spawn_after(random.uniform(*self.options.think), self.submit_answers, key)
+        elif state['state'] == 'choosing_winner':
+            self.acted = key
+            if state['czar'] == self.name:
+                eventlet.spawn_after(random.uniform(*self.options.think), self.vote_winner, key)
+            elif self.name in state['active_players'] and random.random() < 0.5:
+                eventlet.spawn_after(random.uniform(*self.options.think), self.submit_reaction, key)
+
+    def is_current(self, key):
+        return self.running and self.state is not None and (self.state['current_round'], self.state['state']) == key
+
+    def submit_answers(self, key):
+        if not self.is_current(key):
+            return
+        num_blanks = CARDS_QUESTIONS[self.state['current_black_card']]['num_blanks']
+        self.emit('submit_answers', {'answer_indices': random.sample(range(len(self.hand)), min(num_blanks, len(self.hand)))})
+
+    def vote_winner(self, key):
+        if self.is_current(key) and self.state['player_mapping']:
+            self.emit('vote_winner', {'winner_index': random.randrange(len(self.state['player_mapping']))})
+
+    def submit_reaction(self, key):
+        mapping = self.state['player_mapping'] if self.is_current(key) else []
+        others = [index for index, player in enumerate(mapping) if player != self.name]
+        if others:
+            self.emit('submit_reaction', {'to_player_index': random.choice(others), 'points': random.randint(-2, 2)})
+
+    def close(self):
+        self.running = False
+        try:
+            self.client.disconnect()
+        except Exception:
+            pass
+
+
+def run_game(number, url, stats, options, players):
+    """Ersteller legt das Spiel an, die übrigen Spieler treten bei; der Ersteller startet, sobald alle da sind"""
+    host = SimulatedPlayer(f"last{number}-0", url, stats, options, host=True)
+    players.append(host)
+    host.connect()
+    host.emit('create_game', {'name': f"Last {number}", 'is_public': False})
+    host.game_joined.wait()
+    for index in range(1, options.players):
+        player = SimulatedPlayer(f"last{number}-{index}", url, stats, options)
+        players.append(player)
+        player.connect()
+        player.emit('join_game', {'game_id': host.game_id})
+        player.game_joined.wait()
+
+
+def child_pids(pid):
+    children = []
+    for task in os.listdir(f"/proc/{pid}/task"):
+        with open(f"/proc/{pid}/task/{task}/children") as f:
+            children.extend(int(child) for child in f.read().split())
+    return children
+
+
+def process_tree(pid):
+    pids = [pid]
+    for child in child_pids(pid):
+        pids.extend(process_tree(child))
+    return pids
+
+
+def rss_mb(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def cpu_seconds(pid):
+    """Verbrauchte CPU-Zeit (user + system) eines Prozesses"""
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+def cpu_snapshot(root_pid):
+    pids = (process_tree(root_pid) if root_pid else []) + [os.getpid()]
+    return {pid: cpu_seconds(pid) for pid in pids}
+
+
+class RssMonitor:
+    """Misst jede Sekunde den RSS aller Prozesse unter root_pid"""
+
+    def __init__(self, root_pid):
+        self.root_pid = root_pid
+        self.samples = {}  # pid: [MB]
+        self.running = True
+
+    def sample(self):
+        try:
+            pids = process_tree(self.root_pid) if self.root_pid else []
+        except OSError:
+            return
+        for pid in pids + [os.getpid()]:
+            try:
+                self.samples.setdefault(pid, []).append(rss_mb(pid))
+            except OSError:
+                pass
+
+    def loop(self):
+        while self.running:
+            self.sample()
+            eventlet.sleep(1)
+
+
+def start_server(options):
+    env = dict(os.environ, DEBUG='0', SNAPSHOT_PATH='', EVENT_LOG_DIR='', STATE_STORE='memory', PORT=str(options.port))
+    if options.workers > 1:
+        command = [sys.executable, 'cluster.py', '--workers', str(options.workers), '--port', str(options.port)]
+    else:
+        command = [sys.executable, 'app.py']
+    log = open(options.server_log, 'ab') if options.server_log else subprocess.DEVNULL
+    server = subprocess.Popen(command, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    deadline = time.time() + 30
+    ports = [options.port + worker for worker in range(options.workers)]
+    while ports:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server beendet (Exit-Code {server.returncode})")
+        if time.time() > deadline:
+            server.kill()
+            raise RuntimeError("Server nicht erreichbar")
+        try:
+            socket.create_connection(('127.0.0.1', ports[0]), timeout=1).close()
+            ports.pop(0)
+        except OSError:
+            eventlet.sleep(0.2)
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--games', type=int, default=50)
+    parser.add_argument('--players', type=int, default=5, help="Spieler pro Spiel (mindestens 3)")
+    parser.add_argument('--duration', type=float, default=60, help="Sekunden Messung, nachdem alle Spiele laufen")
+    parser.add_argument('--ramp', type=float, default=10, help="Sekunden, über die die Spiele verteilt gestartet werden")
+    parser.add_argument('--idle', type=float, default=0.2, help="Anteil der Runden, in denen ein Spieler nicht abgibt")
+    parser.add_argument('--think', type=float, nargs=2, default=(0.2, 2.0), metavar=('MIN', 'MAX'),
+                        help="Bedenkzeit eines Spielers in Sekunden")
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--port', type=int, default=5100)
+    parser.add_argument('--url', help="bereits laufender Server statt eines eigenen")
+    parser.add_argument('--server-log', help="Ausgabe des Servers in diese Datei (Standard: verwerfen)")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help="Ergebnis zusätzlich als JSON in diese Datei schreiben")
+    options = parser.parse_args()
+    random.seed(options.seed)
+
+    # je Client ein Socket, dazu die Sockets des Servers
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    server = None if options.url else start_server(options)
+    url = options.url or f"http://127.0.0.1:{options.port}"
+    stats = Stats()
+    players = []
+    monitor = RssMonitor(server.pid if server else None)
+    eventlet.spawn(monitor.loop)
+
+    try:
+        start = time.perf_counter()
+        pool = eventlet.GreenPool()
+        for number in range(options.games):
+            pool.spawn(run_game, number, url, stats, options, players)
+            eventlet.sleep(options.ramp / options.games)
+        pool.waitall()
+        ramp_seconds = time.perf_counter() - start
+        print(f"{options.games} Spiele mit {len(players)} Clients in {ramp_seconds:.1f}s gestartet", flush=True)
+
+        sent_before, received_before = sum(stats.sent.values()), sum(stats.received.values())
+        cpu_before = cpu_snapshot(monitor.root_pid)
+        for latencies in stats.latencies.values():
+            latencies.clear()
+        stats.lateness.clear()
+        start = time.perf_counter()
+        eventlet.sleep(options.duration)
+        elapsed = time.perf_counter() - start
+        cpu_after = cpu_snapshot(monitor.root_pid)
+        sent = sum(stats.sent.values()) - sent_before
+        received = sum(stats.received.values()) - received_before
+    finally:
+        for player in players:
+            player.running = False
+        monitor.running = False
+        monitor.sample()
+        for player in players:
+            player.close()
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    result = {
+        'games': options.games,
+        'players_per_game': options.players,
+        'clients': len(players),
+        'workers': options.workers,
+        'duration': elapsed,
+        'sent_per_second': sent / elapsed,
+        'received_per_second': received / elapsed,
+        'handler_latency_ms': {event: {'count': len(values),
+                                       'p50': percentile(values, 0.5) * 1000,
+                                       'p99': percentile(values, 0.99) * 1000}
+                               for event, values in sorted(stats.latencies.items()) if values},
+        'timer_lateness_ms': {'count': len(stats.lateness),
+                              'p50': percentile(stats.lateness, 0.5) * 1000,
+                              'p99': percentile(stats.lateness, 0.99) * 1000,
+                              'max': max(stats.lateness, default=0) * 1000},
+        'rss_mb': {('lastgenerator' if pid == os.getpid() else str(pid)): {'start': values[0], 'max': max(values), 'end': values[-1]}
+                   for pid, values in monitor.samples.items()},
+        'cpu_percent': {('lastgenerator' if pid == os.getpid() else str(pid)): (cpu_after[pid] - cpu_before[pid]) * 100 / elapsed
+                        for pid in cpu_before if pid in cpu_after},
+        'resyncs': stats.resyncs,
+        'errors': dict(stats.errors)
+    }
+
+    print(f"\n{result['clients']} Clients, {options.workers} Worker, {elapsed:.0f}s Messung")
+    print(f"Ereignisse/s: {result['sent_per_second']:.0f} gesendet, {result['received_per_second']:.0f} empfangen")
+    print(f"\n{'Ereignis':<16} {'Anzahl':>8} {'p50 ms':>9} {'p99 ms':>9}")
+    for event, latency in result['handler_latency_ms'].items():
+        print(f"{event:<16} {latency['count']:>8} {latency['p50']:>9.2f} {latency['p99']:>9.2f}")
+    lateness = result['timer_lateness_ms']
+    print(f"\nTimer-Verspätung: {lateness['count']} Abläufe, p50 {lateness['p50']:.1f} ms, p99 {lateness['p99']:.1f} ms, "
+          f"max {lateness['max']:.1f} ms")
+    print(f"\n{'Prozess':<14} {'Start MB':>9} {'Max MB':>9} {'Ende MB':>9} {'CPU %':>7}")
+    for name, rss in result['rss_mb'].items():
+        print(f"{name:<14} {rss['start']:>9.1f} {rss['max']:>9.1f} {rss['end']:>9.1f} {result['cpu_percent'].get(name, 0):>7.0f}")
+    if result['cpu_percent'].get('lastgenerator', 0) > 80:
+        print("\nDer Lastgenerator ist selbst ausgelastet, die Latenzen enthalten Wartezeit im Client "
+              "(weniger Clients oder den Server auf einem anderen Rechner/Kern messen)")
+    if stats.resyncs or stats.errors:
+        print(f"\n{stats.resyncs} Resyncs, Fehler vom Server: {dict(stats.errors)}")
+
+    if options.json:
+        with open(options.json, 'w') as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""Kosten einer Lobby-Abfrage (query_public_games) in Abhängigkeit von der Spielanzahl.
+
+Aufruf: python benchmarks/bench_lobby.py [--games 100 1000 10000]
+"""
+import argparse
+import random
+import time
+
+from common import ROOT  # noqa: F401 (Repo-Wurzel in sys.path)
+from game import Game
+from lobby import PublicGameIndex
+
+QUERIES = {
+    'neueste': {'sort': 'created', 'descending': True},
+    'voll': {'sort': 'fill', 'descending': True},
+    'name+präfix': {'sort': 'name', 'prefix': 'sp'},
+    'filter': {'sort': 'created', 'joinable': True, 'not_started': True},
+}
+
+
+def make_index(count):
+    games = {}
+    index = PublicGameIndex(games)
+    rng = random.Random(count)
+    for i in range(count):
+        game = Game(None, {}, f"Host{i}", f"{rng.choice(['Spaß', 'Spiel', 'Runde', 'Party'])} {i}",
+                    password=rng.choice(['', '', '', 'geheim']))
+        game.active_players.extend(f"P{i}-{n}" for n in range(rng.randint(0, 8)))
+        games[game.game_id] = game
+        index.mark_changed(game.game_id)
+    index.refresh()
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--games', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--iterations', type=int, default=500)
+    args = parser.parse_args()
+
+    print(f"{'Spiele':>7} " + ' '.join(f"{name:>12}" for name in QUERIES) + "   (µs pro Seite)")
+    for count in args.games:
+        index = make_index(count)
+        timings = []
+        for query in QUERIES.values():
+            start = time.perf_counter()
+            for i in range(args.iterations):
+                index.query(offset=(i % 5) * args.limit, limit=args.limit, **query)
+            timings.append((time.perf_counter() - start) / args.iterations * 1e6)
+        print(f"{count:>7} " + ' '.join(f"{t:>12.1f}" for t in timings))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Replay von Ereignisprotokollen (gamelog.py).
+
+Spielt ein Spiel mit Protokoll (Einreichungen, Reaktionen, Timer-Abläufe,
+Pausen), baut es mit gamelog.replay() neu auf und misst den Durchsatz in
+Ereignissen pro Sekunde. Weicht das nachgespielte Spiel vom Original ab
+(Revision, Punkte, Verlauf, Handkarten), bricht das Skript mit Fehler ab und
+dient so auch als Regressionstest für den Determinismus der Spiellogik.
+Aufruf: python benchmarks/bench_replay.py [--rounds 200]
+"""
+import argparse
+import pickle
+import random
+import sys
+import time
+
+from common import make_game
+import gamelog
+
+
+def play(rounds, seed):
+    """Spiel mit rounds Runden, die Aktionen der Spieler kommen aus einem eigenen Zufallsgenerator"""
+    actions = random.Random(seed)
+    game = make_game(players=8, spectators=4, rounds=0, log=True)
+    game.updateSettings({"maxRounds": rounds, "maxPointsToWin": rounds})
+    for _ in range(rounds):
+        for player in game.active_players:
+            if player != game.czar and actions.random() < 0.8:
+                game.submit_white_cards(player, actions.sample(range(len(game.playerCards[player])),
+                                                               game.current_black_card["num_blanks"]))
+        if actions.random() < 0.2:
+            game.pause()
+            game.resume()
+        game.timer_expired()  # übrige Spieler geben automatisch ab
+        for player in game.active_players:
+            if player != game.czar and actions.random() < 0.5:
+                game.submit_reaction(player, actions.randrange(len(game.player_mapping)), actions.randint(-2, 2))
+        if actions.random() < 0.5:
+            game.choose_winner(actions.choice(game.player_mapping), choosing_playerName=game.czar)
+        game.timer_expired()
+        game.timer_expired()
+        if game.state == 'game_ended':
+            break
+    return game
+
+
+def fingerprint(game):
+    return (game.revision, game.state, game.scores, game.history, game.playerCards, game.player_mapping)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    game = play(args.rounds, args.seed)
+    log = game.event_log
+    events = len(log.events)
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        replayed = gamelog.replay(log.header, log.events)
+    elapsed = time.perf_counter() - start
+
+    if fingerprint(replayed) != fingerprint(game):
+        print("Replay weicht vom Original ab", file=sys.stderr)
+        sys.exit(1)
+    size = len(pickle.dumps(log.events, pickle.HIGHEST_PROTOCOL))
+    print(f"{game.current_round + 1} Runden, {events} Ereignisse, {size / events:.1f} Bytes pro Ereignis")
+    print(f"Replay: {events * args.repeat / elapsed:.0f} Ereignisse/s, {elapsed * 1000 / args.repeat:.2f} ms pro Spiel")
+
+
+if __name__ == '__main__':
+    main()
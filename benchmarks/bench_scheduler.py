@@ -0,0 +1,99 @@
+"""Planen, Abbrechen und Abarbeiten von Deadlines (scheduler.py).
+
+Misst den Durchsatz von DeadlineScheduler bei --entries Einträgen (z.B.
+Disconnect-Timer vieler Benutzer): schedule, cancel (mit Kompaktierung des
+Heaps) und run_due. Vorher prüft das Skript den Fall, dass ein Callback
+während run_due viele Einträge abbricht (Disconnect-Timeout -> cleanup_user
+-> delete_game -> stop_timer) und damit den Heap kompaktiert: jeder
+Callback muss genau einmal laufen. Sonst bricht das Skript mit Fehler ab.
+Aufruf: python benchmarks/bench_scheduler.py [--entries 100000]
+"""
+import argparse
+import sys
+import time
+
+from common import ROOT  # noqa: F401 (Repo-Wurzel in sys.path)
+from scheduler import DeadlineScheduler
+
+
+class ManualClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def check_cancel_during_run(entries=100):
+    """Ein Callback bricht die meisten übrigen Einträge ab; gibt eine Fehlermeldung oder None zurück"""
+    clock = ManualClock()
+    scheduler = DeadlineScheduler(clock)
+    ran = []
+    cancelled = range(int(entries * 0.7))
+
+    def cancel_others():
+        ran.append('cancel')
+        for i in cancelled:
+            scheduler.cancel(('entry', i))
+
+    scheduler.schedule(('cancel',), 1.0, cancel_others)
+    for i in range(entries):
+        scheduler.schedule(('entry', i), 1.0 + (i + 1) / 1000, lambda i=i: ran.append(i))
+    clock.now = 10.0
+    try:
+        scheduler.run_due()
+        scheduler.run_due()
+    except Exception as e:
+        return f"run_due: {e!r}"
+    expected = ['cancel'] + [i for i in range(entries) if i not in cancelled]
+    if ran != expected:
+        return f"{len(ran)} Callbacks gelaufen statt {len(expected)}"
+    if len(scheduler) or scheduler.next_deadline() is not None:
+        return f"{len(scheduler)} Einträge übrig"
+    return None
+
+
+def measure(entries):
+    clock = ManualClock()
+    scheduler = DeadlineScheduler(clock)
+    results = {}
+
+    def callback():
+        pass
+
+    start = time.perf_counter()
+    for i in range(entries):
+        scheduler.schedule(('disconnect', i), (i * 7919 % entries) / entries, callback)
+    results['schedule'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(0, entries, 2):
+        scheduler.cancel(('disconnect', i))
+    results['cancel'] = time.perf_counter() - start
+
+    clock.now = 1.0
+    start = time.perf_counter()
+    executed = scheduler.run_due()
+    results['run_due'] = time.perf_counter() - start
+    return results, executed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--entries', type=int, default=100000)
+    args = parser.parse_args()
+
+    error = check_cancel_during_run()
+    if error is not None:
+        print(f"Abbrechen während run_due: {error}", file=sys.stderr)
+        sys.exit(1)
+
+    results, executed = measure(args.entries)
+    print(f"{args.entries} Einträge, davon {executed} ausgeführt")
+    for operation, seconds in results.items():
+        count = args.entries if operation == 'schedule' else args.entries // 2
+        print(f"  {operation:<9} {seconds * 1000:8.1f} ms  {seconds * 1e6 / count:6.2f} µs pro Eintrag")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""Kosten der Spiel-Snapshots (snapshots.py).
+
+Misst pro Spiel die Zeit im Event-Loop (Game.to_snapshot plus pickle), die
+Größe des Snapshots und die Wiederherstellung (Game.from_snapshot) für
+verschiedene Verlaufslängen, dazu den Durchsatz des Schreib-Threads.
+Aufruf: python benchmarks/bench_snapshot.py [--games 500]
+"""
+import argparse
+import os
+import pickle
+import tempfile
+import time
+
+from common import make_game, StubSocketIO
+from game import Game
+from snapshots import SnapshotStore
+
+
+def measure_game(rounds, iterations):
+    game = make_game(players=10, spectators=50, rounds=rounds)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        data = pickle.dumps(game.to_snapshot(), pickle.HIGHEST_PROTOCOL)
+    encode_ms = (time.perf_counter() - start) * 1000 / iterations
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        Game.from_snapshot(StubSocketIO(), game.global_player_data, pickle.loads(data))
+    restore_ms = (time.perf_counter() - start) * 1000 / iterations
+    return encode_ms, len(data), restore_ms
+
+
+def measure_writes(games):
+    """games Snapshots an den Schreib-Thread übergeben und warten, bis sie in der Datei sind"""
+    game_list = [make_game(players=6, spectators=0, rounds=5) for _ in range(games)]
+    with tempfile.TemporaryDirectory() as directory:
+        store = SnapshotStore(os.path.join(directory, 'snapshots.db'))
+        start = time.perf_counter()
+        submit = 0.0
+        for game in game_list:
+            submit_start = time.perf_counter()
+            store.save(game)
+            submit += time.perf_counter() - submit_start
+        store.flush()
+        total = time.perf_counter() - start
+        store.close()
+    return submit * 1000 / games, games / total, store.bytes_written / games
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--games', type=int, default=500, help="Spiele für die Messung des Schreib-Threads")
+    args = parser.parse_args()
+
+    print("10 Spieler, 50 Zuschauer")
+    print(f"{'Runden':>6} {'Snapshot ms':>12} {'Bytes':>8} {'Wiederherstellen ms':>20}")
+    for rounds in (0, 10, 24):
+        encode_ms, size, restore_ms = measure_game(rounds, args.iterations)
+        print(f"{rounds:>6} {encode_ms:>12.3f} {size:>8} {restore_ms:>20.3f}")
+
+    submit_ms, per_second, size = measure_writes(args.games)
+    print(f"\nSchreib-Thread: {args.games} Spiele (6 Spieler, 5 Runden), {submit_ms:.3f} ms im Event-Loop pro Spiel, "
+          f"{per_second:.0f} Spiele/s in der Datei, {size:.0f} Bytes pro Spiel")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Startzeit und Speicherbedarf beim Laden der Karten.
+
+Vergleicht den Import von questions.py/answers.py mit dem Laden der
+Kartendatenbank (cards.py / carddb.py). Jede Messung läuft in einem neuen
+Python-Prozess. Aufruf: python benchmarks/bench_startup.py [--runs 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from common import ROOT
+
+# Läuft im Kindprozess: misst Dauer und RSS-Zuwachs des Imports und greift auf alle Karten einmal zu ("Zugriff")
+CHILD = r'''
+import json, sys, time
+
+def rss_kb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+
+before = rss_kb()
+start = time.perf_counter()
+{import_statement}
+loaded = time.perf_counter()
+after_load = rss_kb()
+count = sum(len(card['card_text']) for card in CARDS_QUESTIONS) + sum(len(card) for card in CARDS_ANSWERS)
+accessed = time.perf_counter()
+print(json.dumps({{
+    'load_ms': (loaded - start) * 1000,
+    'access_ms': (accessed - loaded) * 1000,
+    'rss_kb': after_load - before,
+}}))
+'''
+
+VARIANTS = {
+    'python-module': "from questions import CARDS_QUESTIONS\nfrom answers import CARDS_ANSWERS",
+    'kartendatenbank': "from cards import CARDS_QUESTIONS, CARDS_ANSWERS",
+}
+
+
+def run(import_statement):
+    result = subprocess.run([sys.executable, '-c', CHILD.format(import_statement=import_statement)],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    import carddb
+    if not carddb.is_current():
+        carddb.build_from_sources()
+    # einmal vorab importieren, damit .pyc Dateien existieren (wie im Betrieb)
+    for statement in VARIANTS.values():
+        run(statement)
+
+    print(f"{'Variante':<16} {'Laden ms':>9} {'Zugriff ms':>11} {'RSS KB':>8}   (Median aus {args.runs} Prozessen)")
+    for name, statement in VARIANTS.items():
+        results = [run(statement) for _ in range(args.runs)]
+        load = statistics.median(r['load_ms'] for r in results)
+        access = statistics.median(r['access_ms'] for r in results)
+        rss = statistics.median(r['rss_kb'] for r in results)
+        print(f"{name:<16} {load:>9.2f} {access:>11.2f} {rss:>8.0f}")
+
+
+if __name__ == '__main__':
+    main()
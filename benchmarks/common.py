@@ -0,0 +1,57 @@
+"""Gemeinsame Hilfen für die Benchmarks: Socket.IO-Attrappe und Testspiele.
+
+Die Benchmarks laufen ohne Server. StubSocketIO kodiert jedes emit() wie
+python-socketio (ein Paket pro Aufruf, bei Räumen einmal für alle Empfänger)
+und zählt Pakete und Bytes.
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import gamelog
+import payload
+from game import Game
+
+
+class StubSocketIO:
+    def __init__(self):
+        self.packets = 0
+        self.bytes = 0
+
+    def emit(self, event, data=None, room=None, skip_sid=None, **kwargs):
+        encoded = payload.dumps([event, data], separators=(',', ':'))
+        self.packets += 1
+        self.bytes += len(encoded)
+
+    def reset(self):
+        self.packets = 0
+        self.bytes = 0
+
+
+def make_game(players=10, spectators=50, rounds=0, log=False):
+    """Gestartetes Spiel mit players Spielern, spectators Zuschauern und rounds gespielten Runden,
+    mit log=True von Anfang an im Ereignisprotokoll (game.event_log)"""
+    socketio = StubSocketIO()
+    names = [f"Spieler{i}" for i in range(players)] + [f"Zuschauer{i}" for i in range(spectators)]
+    global_player_data = {name: {'sid': f"sid-{name}"} for name in names}
+
+    game = Game(socketio, global_player_data, names[0], "Benchmark")
+    if log:
+        gamelog.start_log(game)
+    game.updateSettings({"maxPlayers": max(players, 3), "maxRounds": rounds + 25, "maxPointsToWin": rounds + 25})
+    for name in names[1:players]:
+        game.add_player(name, False)
+    for name in names[players:]:
+        game.add_player(name, True)
+    game.start_game()
+
+    for _ in range(rounds):
+        for player in game.active_players:
+            if player != game.czar:
+                game.submit_white_cards(player, list(range(game.current_black_card["num_blanks"])))
+        game.choose_winner(game.player_mapping[0])
+        game.next_round()
+    return game
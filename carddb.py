@@ -0,0 +1,494 @@
+"""Kompilierte Kartendatenbank.
+
+Die in packs.json eingetragenen Quelldateien (z.B. questions.py und answers.py)
+bleiben die Quelle der Karten, zur Laufzeit werden sie aber nicht mehr
+importiert: `python carddb.py build` schreibt die Karten in eine Binärdatei
+(cards.db), die per mmap geladen wird. Texte werden erst beim
+Zugriff dekodiert, es entstehen keine tausenden str/dict Objekte pro Prozess.
+
+Dateiformat (little endian), nach dem Dateikopf FILE_MAGIC folgen Segmente:
+
+    SEGMENT_HEADER  magic b'SEG0', Art (0 = Frage, 1 = Antwort, 2 = Sätze), reserviert,
+                    Länge des Namens, Anzahl Karten, Länge des Textblocks
+    Name            UTF-8 (ID des Kartensatzes), auf 4 Bytes aufgefüllt
+    Offsets         uint32 x (Anzahl + 1), Start der Texte im Textblock
+    num_blanks      uint8 x Anzahl (nur Fragen), auf 4 Bytes aufgefüllt
+    Textblock       UTF-8 Texte aller Karten ohne Trennzeichen, auf 4 Bytes aufgefüllt
+
+Mehrere Segmente gleicher Art werden in Reihenfolge aneinandergehängt, die
+Karten-ID ist die Position über alle Segmente dieser Art.
+
+Kartensätze: der Name eines Kartensegments ist die ID seines Kartensatzes. Die
+Metadaten der Sätze (Name, Beschreibung, Tags, Standardauswahl) stehen als JSON
+in einem Segment der Art 2 (KIND_PACKS) mit genau einem Eintrag. Beim Laden
+werden für jeden Satz die Karten-IDs als Arrays vorberechnet, ein Deck aus
+mehreren Sätzen ist dann nur eine Verkettung dieser Arrays.
+
+importer.py hängt neue Segmente (und Metadaten) an eine bestehende Datei an,
+spätere Metadaten eines Satzes ersetzen frühere.
+"""
+from array import array
+from bisect import bisect_right
+from collections.abc import Sequence
+import json
+import mmap
+import os
+import struct
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_PATH = os.path.join(ROOT, 'cards.db')
+MANIFEST_PATH = os.path.join(ROOT, 'packs.json')
+SOURCE_KEYS = ('questions', 'answers', 'cards')  # Quelldateien eines Satzes in packs.json
+
+FILE_MAGIC = b'CAEDB1\n\x00'
+SEGMENT_HEADER = struct.Struct('<4sBBHII')
+SEGMENT_MAGIC = b'SEG0'
+KIND_QUESTION = 0
+KIND_ANSWER = 1
+KIND_PACKS = 2
+
+
+def _padding(length):
+    return b'\x00' * (-length % 4)
+
+
+class Segment:
+    __slots__ = ('kind', 'name', 'count', 'offsets', 'blanks', 'text')
+
+    def __init__(self, kind, name, count, offsets, blanks, text):
+        self.kind = kind
+        self.name = name
+        self.count = count
+        self.offsets = offsets  # memoryview uint32
+        self.blanks = blanks    # memoryview uint8, nur Fragen
+        self.text = text        # memoryview des Textblocks
+
+    def card_text(self, index):
+        return str(self.text[self.offsets[index]:self.offsets[index + 1]], 'utf-8')
+
+
+class CardSequence(Sequence):
+    """Alle Karten einer Art über alle Segmente, Zugriff per Karten-ID"""
+
+    def __init__(self):
+        self._segments = []
+        self._starts = []  # erste Karten-ID jedes Segments
+        self._length = 0
+
+    def _add_segment(self, segment):
+        self._segments.append(segment)
+        self._starts.append(self._length)
+        self._length += segment.count
+
+    def __len__(self):
+        return self._length
+
+    def _locate(self, index):
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("Karten-ID außerhalb des Bereichs")
+        if len(self._segments) == 1:
+            return self._segments[0], index
+        position = bisect_right(self._starts, index) - 1
+        return self._segments[position], index - self._starts[position]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._length))]
+        segment, local_index = self._locate(index)
+        return self._card(segment, local_index)
+
+    def __iter__(self):
+        for segment in self._segments:
+            for local_index in range(segment.count):
+                yield self._card(segment, local_index)
+
+    def text(self, index):
+        segment, local_index = self._locate(index)
+        return segment.card_text(local_index)
+
+    def _card(self, segment, index):
+        return segment.card_text(index)
+
+
+class QuestionSequence(CardSequence):
+    """Fragen wie in questions.py: {"card_text": str, "num_blanks": int}"""
+
+    def _card(self, segment, index):
+        return {"card_text": segment.card_text(index), "num_blanks": segment.blanks[index]}
+
+    def num_blanks(self, index):
+        segment, local_index = self._locate(index)
+        return segment.blanks[local_index]
+
+
+class CardPack:
+    """Ein Kartensatz mit den vorberechneten Karten-IDs seiner Fragen und Antworten"""
+    __slots__ = ('id', 'name', 'description', 'tags', 'default', 'questions', 'answers')
+
+    def __init__(self, pack_id, name=None, description='', tags=(), default=False, typecode='H'):
+        self.id = pack_id
+        self.name = name or pack_id
+        self.description = description
+        self.tags = list(tags)
+        self.default = bool(default)
+        self.questions = array(typecode)
+        self.answers = array(typecode)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'description': self.description,
+            'tags': self.tags,
+            'default': self.default,
+            'questions': len(self.questions),
+            'answers': len(self.answers),
+        }
+
+
+def build_pack_index(manifest, segments):
+    """Berechnet die Kartensätze; manifest: Metadaten wie in packs.json, segments: [(Art, Satz-ID, Anzahl)] in Dateireihenfolge.
+
+    Alle Arrays nutzen denselben Typ, damit sie ohne Umwandlung verkettet werden können.
+    """
+    totals = {KIND_QUESTION: 0, KIND_ANSWER: 0}
+    for kind, _, count in segments:
+        totals[kind] += count
+    typecode = 'H' if max(totals.values()) <= 0xFFFF else 'I'
+
+    packs = {}
+    for meta in manifest:
+        packs[meta['id']] = CardPack(meta['id'], meta.get('name'), meta.get('description', ''),
+                                     meta.get('tags', ()), meta.get('default', False), typecode)
+
+    starts = {KIND_QUESTION: 0, KIND_ANSWER: 0}
+    for kind, pack_id, count in segments:
+        if pack_id not in packs:
+            packs[pack_id] = CardPack(pack_id, typecode=typecode)
+        ids = packs[pack_id].questions if kind == KIND_QUESTION else packs[pack_id].answers
+        ids.extend(range(starts[kind], starts[kind] + count))
+        starts[kind] += count
+    return packs
+
+
+class CardDatabase:
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self.segments = []
+        self.questions = QuestionSequence()
+        self.answers = CardSequence()
+        self.manifest = []
+        self.packs = {}
+        self._mmaps = []  # angehängte Segmente werden über eine neue Abbildung gelesen, alte bleiben gültig
+        self._inode = None
+        self._end = 0
+        if not self.refresh():
+            raise ValueError(f"{path} ist keine Kartendatenbank")
+
+    def refresh(self):
+        """Liest neu angehängte Segmente (siehe append_segments), bestehende Karten-IDs bleiben gültig.
+
+        Gibt False zurück, wenn nichts Neues gelesen wurde.
+        """
+        with open(self.path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            if self._inode is not None and stat.st_ino != self._inode:
+                raise ValueError(f"{self.path} wurde neu erstellt, die Karten-IDs können sich geändert haben")
+            if stat.st_size <= self._end:
+                return False
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapped)
+        position = self._end
+        if not position:
+            if view[:len(FILE_MAGIC)] != FILE_MAGIC:
+                return False
+            position = len(FILE_MAGIC)
+        self._inode = stat.st_ino
+        self._mmaps.append(mapped)
+
+        while position < len(view):
+            segment, position = self._read_segment(view, position)
+            if segment.kind == KIND_PACKS:
+                self._merge_manifest(json.loads(segment.card_text(0)))
+                continue
+            self.segments.append(segment)
+            (self.questions if segment.kind == KIND_QUESTION else self.answers)._add_segment(segment)
+        self._end = position
+
+        packs = build_pack_index(self.manifest, [(segment.kind, segment.name, segment.count) for segment in self.segments])
+        self.packs.clear()  # gleiches dict, damit importierte Referenzen (cards.CARD_PACKS) aktuell bleiben
+        self.packs.update(packs)
+        return True
+
+    def _merge_manifest(self, entries):
+        """Spätere Metadaten eines Satzes ersetzen frühere"""
+        positions = {meta['id']: index for index, meta in enumerate(self.manifest)}
+        for meta in entries:
+            if meta['id'] in positions:
+                self.manifest[positions[meta['id']]] = meta
+            else:
+                positions[meta['id']] = len(self.manifest)
+                self.manifest.append(meta)
+
+    def _read_segment(self, view, position):
+        magic, kind, _, name_length, count, text_length = SEGMENT_HEADER.unpack_from(view, position)
+        if magic != SEGMENT_MAGIC:
+            raise ValueError(f"{self.path}: beschädigtes Segment bei Byte {position}")
+        position += SEGMENT_HEADER.size
+
+        name = str(view[position:position + name_length], 'utf-8')
+        position += name_length + len(_padding(name_length))
+
+        offsets = view[position:position + 4 * (count + 1)].cast('I')
+        if sys.byteorder != 'little':
+            offsets = array('I', offsets)
+            offsets.byteswap()
+        position += 4 * (count + 1)
+
+        blanks = None
+        if kind == KIND_QUESTION:
+            blanks = view[position:position + count]
+            position += count + len(_padding(count))
+
+        text = view[position:position + text_length]
+        position += text_length + len(_padding(text_length))
+        return Segment(kind, name, count, offsets, blanks, text), position
+
+
+def encode_segment(kind, name, cards):
+    """Kodiert Karten als Segment; cards sind Texte (Antworten) oder (Text, num_blanks) (Fragen)"""
+    offsets = array('I', [0])
+    blanks = array('B')
+    texts = []
+    length = 0
+    for card in cards:
+        if kind == KIND_QUESTION:
+            text, num_blanks = card
+            blanks.append(num_blanks)
+        else:
+            text = card
+        encoded = text.encode('utf-8')
+        texts.append(encoded)
+        length += len(encoded)
+        offsets.append(length)
+
+    if sys.byteorder != 'little':
+        offsets.byteswap()
+    name_bytes = name.encode('utf-8')
+    count = len(offsets) - 1
+    parts = [
+        SEGMENT_HEADER.pack(SEGMENT_MAGIC, kind, 0, len(name_bytes), count, length),
+        name_bytes, _padding(len(name_bytes)),
+        offsets.tobytes(),
+    ]
+    if kind == KIND_QUESTION:
+        parts += [blanks.tobytes(), _padding(count)]
+    parts += texts
+    parts.append(_padding(length))
+    return b''.join(parts)
+
+
+class SegmentWriter:
+    """Baut ein Segment Karte für Karte in temporären Dateien auf, der Speicherbedarf hängt nicht von der Kartenzahl ab"""
+    OFFSET = struct.Struct('<I')
+
+    def __init__(self, kind, name):
+        import tempfile
+        self.kind = kind
+        self.name = name
+        self.count = 0
+        self.length = 0
+        self._offsets = tempfile.TemporaryFile()
+        self._blanks = tempfile.TemporaryFile() if kind == KIND_QUESTION else None
+        self._text = tempfile.TemporaryFile()
+        self._offsets.write(self.OFFSET.pack(0))
+
+    def add(self, text, num_blanks=None):
+        encoded = text.encode('utf-8')
+        self._text.write(encoded)
+        self.length += len(encoded)
+        self._offsets.write(self.OFFSET.pack(self.length))
+        if self._blanks:
+            self._blanks.write(bytes((num_blanks,)))
+        self.count += 1
+
+    def write_to(self, f):
+        import shutil
+        name_bytes = self.name.encode('utf-8')
+        f.write(SEGMENT_HEADER.pack(SEGMENT_MAGIC, self.kind, 0, len(name_bytes), self.count, self.length))
+        f.write(name_bytes + _padding(len(name_bytes)))
+        for part in (self._offsets, self._blanks):
+            if part:
+                part.seek(0)
+                shutil.copyfileobj(part, f)
+        if self._blanks:
+            f.write(_padding(self.count))
+        self._text.seek(0)
+        shutil.copyfileobj(self._text, f)
+        f.write(_padding(self.length))
+
+    def close(self):
+        for part in (self._offsets, self._blanks, self._text):
+            if part:
+                part.close()
+
+
+def append_segments(f, manifest, writers):
+    """Hängt Metadaten (falls manifest) und Segmente an die geöffnete Datenbank f ('r+b') an.
+
+    Laufende Server lesen die neuen Segmente mit CardDatabase.refresh(), ohne Neuaufbau. Bei einem
+    Fehler wird die Datei auf die alte Länge gekürzt. Der Aufrufer hält die Sperre (flock) auf f.
+    """
+    f.seek(0)
+    if f.read(len(FILE_MAGIC)) != FILE_MAGIC:
+        raise ValueError(f"{f.name} ist keine Kartendatenbank")
+    end = f.seek(0, os.SEEK_END)
+    try:
+        if manifest:
+            f.write(encode_segment(KIND_PACKS, 'packs', [json.dumps(manifest, ensure_ascii=False)]))
+        for writer in writers:
+            writer.write_to(f)
+        f.flush()
+        os.fsync(f.fileno())
+    except BaseException:
+        f.truncate(end)
+        raise
+
+
+def write_database(path, segments):
+    """Schreibt die Datenbank atomar (temporäre Datei + Umbenennen); segments: [(Art, Name, Karten)]"""
+    import tempfile
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.cards-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(FILE_MAGIC)
+            for kind, name, cards in segments:
+                f.write(encode_segment(kind, name, cards))
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def read_manifest(path=MANIFEST_PATH):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_sources(manifest_path=MANIFEST_PATH, report=None):
+    """Lädt und bereinigt die Quelldateien aller Kartensätze (siehe ingest.py).
+
+    Ergebnis: (Metadaten ohne Quellangaben, [(Satz-ID, [(Text, num_blanks)], [Text])])
+    """
+    import runpy
+    from ingest import DeckCleaner
+    cleaner = DeckCleaner(report)
+    directory = os.path.dirname(os.path.abspath(manifest_path))
+    manifest = read_manifest(manifest_path)
+    packs = []
+    for meta in manifest:
+        questions = runpy.run_path(os.path.join(directory, meta['questions']))['CARDS_QUESTIONS'] if meta.get('questions') else []
+        answers = runpy.run_path(os.path.join(directory, meta['answers']))['CARDS_ANSWERS'] if meta.get('answers') else []
+        if meta.get('cards'):
+            questions, answers = list(questions), list(answers)
+            _read_imported_cards(os.path.join(directory, meta['cards']), questions, answers)
+        packs.append((meta['id'], cleaner.questions(meta['id'], questions), cleaner.answers(meta['id'], answers)))
+    metadata = [pack_metadata(meta) for meta in manifest]
+    return metadata, packs
+
+
+def pack_metadata(meta):
+    """Eintrag aus packs.json ohne Quellangaben, so wie er in der Datenbank steht"""
+    return {key: value for key, value in meta.items() if key not in SOURCE_KEYS}
+
+
+def _read_imported_cards(path, questions, answers):
+    """Liest die von importer.py geschriebene JSON-Lines Quelle eines Kartensatzes"""
+    from importer import read_rows, parse_card
+    with open(path, encoding='utf-8', newline='') as f:
+        for _, row in read_rows(f, 'jsonl'):
+            success, card = parse_card(row)
+            if not success:
+                continue
+            is_question, text, num_blanks = card
+            if is_question:
+                questions.append({"card_text": text, "num_blanks": num_blanks})
+            else:
+                answers.append(text)
+
+
+def build_from_sources(path=DEFAULT_PATH, manifest_path=MANIFEST_PATH):
+    """Kompiliert alle Kartensätze aus packs.json bereinigt nach path, gibt den IngestReport zurück"""
+    from ingest import IngestReport
+    report = IngestReport()
+    metadata, packs = load_sources(manifest_path, report)
+    segments = [(KIND_PACKS, 'packs', [json.dumps(metadata, ensure_ascii=False)])]
+    for pack_id, questions, answers in packs:
+        segments.append((KIND_QUESTION, pack_id, questions))
+        segments.append((KIND_ANSWER, pack_id, answers))
+    write_database(path, segments)
+    return report
+
+
+def sources(manifest_path=MANIFEST_PATH):
+    """packs.json und alle darin genannten Quelldateien"""
+    directory = os.path.dirname(os.path.abspath(manifest_path))
+    try:
+        manifest = read_manifest(manifest_path)
+    except (OSError, ValueError):
+        return [manifest_path]
+    return [manifest_path] + [os.path.join(directory, meta[key]) for meta in manifest
+                              for key in SOURCE_KEYS if meta.get(key)]
+
+
+def is_current(path=DEFAULT_PATH, manifest_path=MANIFEST_PATH):
+    """True wenn die Datenbank existiert und nicht älter als packs.json und die Quelldateien ist"""
+    try:
+        built = os.path.getmtime(path)
+    except OSError:
+        return False
+    return all(built >= os.path.getmtime(source) for source in sources(manifest_path) if os.path.exists(source))
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Kartendatenbank erstellen und prüfen")
+    commands = parser.add_subparsers(dest='command', required=True)
+    build_parser = commands.add_parser('build', help="Kartensätze aus packs.json kompilieren")
+    build_parser.add_argument('--output', default=DEFAULT_PATH)
+    build_parser.add_argument('--report', action='store_true', help="alle Änderungen der Bereinigung ausgeben")
+    check_parser = commands.add_parser('check', help="Quellen bereinigen und Bericht ausgeben, ohne zu schreiben")
+    check_parser.add_argument('--manifest', default=MANIFEST_PATH)
+    info_parser = commands.add_parser('info', help="Segmente einer Datenbank anzeigen")
+    info_parser.add_argument('path', nargs='?', default=DEFAULT_PATH)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        report = build_from_sources(args.output)
+        for line in (report.lines() if args.report else [report.summary()]):
+            print(line)
+        print(f"{args.output}: {os.path.getsize(args.output)} Bytes")
+    elif args.command == 'check':
+        from ingest import IngestReport
+        report = IngestReport()
+        load_sources(args.manifest, report)
+        for line in report.lines():
+            print(line)
+    elif args.command == 'info':
+        db = CardDatabase(args.path)
+        for segment in db.segments:
+            kind = 'Fragen' if segment.kind == KIND_QUESTION else 'Antworten'
+            print(f"{segment.name}: {segment.count} {kind}")
+        for pack in db.packs.values():
+            default = ', Standard' if pack.default else ''
+            print(f"Kartensatz {pack.id} ({pack.name}{default}): {len(pack.questions)} Fragen, {len(pack.answers)} Antworten, Tags: {', '.join(pack.tags) or '-'}")
+        print(f"Gesamt: {len(db.questions)} Fragen, {len(db.answers)} Antworten")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Kartendecks für Server und Spiele.
+
+CARDS_QUESTIONS und CARDS_ANSWERS verhalten sich wie die Listen aus
+questions.py/answers.py, kommen aber aus der per mmap geladenen
+Kartendatenbank (siehe carddb.py). Fehlt die Datenbank oder ist sie älter als
+die Quelldateien, wird sie neu erstellt; ist das nicht möglich (z.B.
+schreibgeschütztes Verzeichnis), werden die Quelldateien direkt importiert.
+In beiden Fällen sind die Karten bereinigt (ohne Duplikate, siehe ingest.py).
+
+CARD_PACKS enthält die Kartensätze (ID -> carddb.CardPack) mit den beim Laden
+vorberechneten Karten-IDs, pack_cards() liefert sie für das Deck eines Spiels.
+Eigene Karten eines Spiels bekommen IDs ab CUSTOM_CARD_OFFSET. Nach
+einem Import (importer.py) liest CARD_DB.refresh() die neuen Sätze nach, die
+Listen und CARD_PACKS werden dabei an Ort und Stelle erweitert.
+"""
+import functools
+import hashlib
+import os
+
+import carddb
+
+CARD_DB_PATH = os.environ.get('CARD_DB_PATH', carddb.DEFAULT_PATH)
+CUSTOM_CARD_OFFSET = 0x1000000  # ID einer eigenen Karte = Offset + Index in den customCards des Spiels
+
+
+def load_cards(path=CARD_DB_PATH):
+    if not carddb.is_current(path):
+        try:
+            report = carddb.build_from_sources(path)
+            print(f"Kartendatenbank erstellt: {path} ({report.summary()})", flush=True)
+        except OSError as e:
+            print(f"Kartendatenbank konnte nicht erstellt werden ({e}), nutze die Quelldateien", flush=True)
+            return (None,) + load_sources()
+
+    db = carddb.CardDatabase(path)
+    return db, db.questions, db.answers, db.packs
+
+
+def load_sources():
+    metadata, sources = carddb.load_sources()
+    questions, answers, segments = [], [], []
+    for pack_id, pack_questions, pack_answers in sources:
+        questions += [{"card_text": text, "num_blanks": num_blanks} for text, num_blanks in pack_questions]
+        answers += pack_answers
+        segments += [(carddb.KIND_QUESTION, pack_id, len(pack_questions)), (carddb.KIND_ANSWER, pack_id, len(pack_answers))]
+    return questions, answers, carddb.build_pack_index(metadata, segments)
+
+
+def pack_cards(pack_ids):
+    """Karten-IDs (Fragen, Antworten) der Kartensätze als Listen der gemeinsamen Arrays (ohne Kopie), unbekannte IDs werden ignoriert"""
+    packs = [CARD_PACKS[pack_id] for pack_id in dict.fromkeys(pack_ids) if pack_id in CARD_PACKS]
+    return [pack.questions for pack in packs], [pack.answers for pack in packs]
+
+
+@functools.lru_cache(maxsize=8)
+def cards_digest(question_count, answer_count):
+    """Hash über Text und Lücken der ersten question_count Fragen und answer_count Antworten"""
+    digest = hashlib.sha256()
+    for index in range(question_count):
+        card = CARDS_QUESTIONS[index]
+        digest.update(f"{card['num_blanks']}\x1f{card['card_text']}\x1e".encode('utf-8'))
+    digest.update(b'\x1d')
+    for index in range(answer_count):
+        digest.update(CARDS_ANSWERS[index].encode('utf-8') + b'\x1e')
+    return digest.hexdigest()[:16]
+
+
+def cards_version():
+    """(Anzahl Fragen, Anzahl Antworten, Hash) der geladenen Karten, z.B. für Spiel-Snapshots"""
+    return len(CARDS_QUESTIONS), len(CARDS_ANSWERS), cards_digest(len(CARDS_QUESTIONS), len(CARDS_ANSWERS))
+
+
+def is_compatible_version(version):
+    """Stehen die Karten-IDs einer früheren cards_version() noch für dieselben Karten? Angehängte Karten (Import) sind erlaubt"""
+    question_count, answer_count, digest = version
+    return (question_count <= len(CARDS_QUESTIONS) and answer_count <= len(CARDS_ANSWERS)
+            and cards_digest(question_count, answer_count) == digest)
+
+
+CARD_DB, CARDS_QUESTIONS, CARDS_ANSWERS, CARD_PACKS = load_cards()  # CARD_DB ist None, wenn die Quelldateien direkt genutzt werden
+DEFAULT_PACKS = [pack.id for pack in CARD_PACKS.values() if pack.default] or list(CARD_PACKS)[:1]
@@ -0,0 +1,44 @@
+"""Kartenkatalog für die Clients.
+
+Spielzustände übertragen Karten nur als IDs (Index in CARDS_QUESTIONS bzw.
+CARDS_ANSWERS). Die Texte lädt der Client einmal als JSON-Datei, deren URL den
+Inhalts-Hash enthält und die daher unbegrenzt gecacht werden kann.
+"""
+from functools import cached_property
+import gzip
+import hashlib
+import json
+
+
+class CardCatalog:
+    """Wird erst beim ersten Aufruf der Seite bzw. des Katalogs erzeugt, nicht beim Serverstart"""
+
+    def __init__(self, questions, answers, packs=None):
+        self.questions = questions
+        self.answers = answers
+        self.packs = packs or {}
+
+    @cached_property
+    def body(self):
+        return json.dumps({
+            'questions': [[card['card_text'], card['num_blanks']] for card in self.questions],  # ID: [Text, Lücken]
+            'answers': list(self.answers),                                                       # ID: Text
+            'packs': [pack.to_dict() for pack in self.packs.values()]                            # Kartensätze für die Einstellungen
+        }, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    @cached_property
+    def gzip_body(self):
+        return gzip.compress(self.body, 9)
+
+    @cached_property
+    def version(self):
+        return hashlib.sha256(self.body).hexdigest()[:16]  # auch ETag
+
+    def invalidate(self):
+        """Nach einem Kartenimport: Text, Kompression und Version werden beim nächsten Zugriff neu erzeugt"""
+        for name in ('body', 'gzip_body', 'version'):
+            self.__dict__.pop(name, None)
+
+    @property
+    def filename(self):
+        return f"catalog.{self.version}.json"
@@ -0,0 +1,421 @@
+"""Mehr-Worker-Betrieb: Spiele verteilt auf mehrere Prozesse.
+
+Jeder Worker ist ein eigener app.py-Prozess mit eigenem Port und hält nur die
+Spiele, deren game_id per Hash auf ihn fällt (shard_for). Clients bleiben an
+einem Worker (eigener Port = Sticky Routing); betreten sie ein Spiel eines
+anderen Workers, schickt der Server `switch_worker` mit der URL des Workers
+und dem Event, das der Client dort wiederholen soll.
+
+Die Worker tauschen sich über einen Bus aus:
+
+    - Socket.IO-Emits an Räume, die nicht lokal sind (z.B. den Lobby-Raum),
+      gehen über BusManager an alle Worker
+    - Lobby-Einträge aller Worker (Kanal 'lobby'), damit jede Lobby alle Spiele zeigt
+    - das clusterweite Namensregister (UserRegistry): jeder Benutzername gehört
+      genau einem Worker
+
+LocalBus läuft im Prozess (ein Worker, Standard; mehrere LocalBus an einem
+LocalHub für Tests), UnixSocketBus verbindet Worker-Prozesse über den Broker
+des Supervisors:
+
+    python cluster.py --workers 4 --port 5000   # Worker auf Port 5000-5003
+
+Nachrichten zwischen den Prozessen werden mit pickle kodiert, der Unix-Socket
+darf daher nur für den Server-Benutzer zugänglich sein (Rechte 0600).
+"""
+import os
+import pickle
+import struct
+import uuid
+import zlib
+
+import socketio
+
+WORKERS = max(1, int(os.environ.get('WORKERS', '1')))
+WORKER_INDEX = int(os.environ.get('WORKER_INDEX', '0'))
+CLUSTER_SOCKET = os.environ.get('CLUSTER_SOCKET', '')
+CLUSTER_BASE_PORT = int(os.environ.get('CLUSTER_BASE_PORT', '5000'))  # Worker i lauscht auf Basis-Port + i
+WORKER_URLS = [url for url in os.environ.get('WORKER_URLS', '').split(',') if url]  # öffentliche URLs, z.B. hinter einem Proxy
+
+FRAME_HEADER = struct.Struct('>I')
+
+
+def shard_for(key, workers=None):
+    """Worker, dem ein Spiel (game_id) gehört; stabil über Prozesse hinweg (im Gegensatz zu hash())"""
+    return zlib.crc32(key.encode('utf-8')) % (workers or WORKERS)
+
+
+def new_game_id():
+    """Zufällige game_id, die auf diesen Worker fällt (im Mittel WORKERS Versuche)"""
+    while True:
+        game_id = str(uuid.uuid4())
+        if shard_for(game_id) == WORKER_INDEX:
+            return game_id
+
+
+def worker_url(worker, host, scheme='http'):
+    """URL, unter der sich Clients mit einem Worker verbinden; ohne WORKER_URLS gleicher Host, Port Basis-Port + worker"""
+    if worker < len(WORKER_URLS):
+        return WORKER_URLS[worker]
+    hostname = host.rsplit(':', 1)[0] if not host.endswith(']') else host
+    return f"{scheme}://{hostname}:{CLUSTER_BASE_PORT + worker}"
+
+
+class UserRegistry:
+    """Clusterweites Namensregister: Benutzername -> (Worker, verbunden).
+
+    Ein Name kann übernommen werden, wenn er frei ist, schon dem Worker gehört
+    oder sein Besitzer nicht verbunden ist (wie set_username innerhalb eines
+    Workers). Der bisherige Besitzer wird dann benachrichtigt.
+    """
+
+    def __init__(self):
+        self.owners = {}  # name: [worker, connected]
+
+    def claim(self, worker, name):
+        """(True, bisheriger Besitzer oder None) bzw. (False, Besitzer)"""
+        entry = self.owners.get(name)
+        if entry is not None and entry[0] != worker and entry[1]:
+            return False, entry[0]
+        previous = entry[0] if entry is not None and entry[0] != worker else None
+        self.owners[name] = [worker, True]
+        return True, previous
+
+    def release(self, worker, name):
+        if self.owners.get(name, [None])[0] == worker:
+            del self.owners[name]
+
+    def set_connected(self, worker, name, connected):
+        entry = self.owners.get(name)
+        if entry is not None and entry[0] == worker:
+            entry[1] = connected
+
+    def owner(self, worker, name):
+        entry = self.owners.get(name)
+        return tuple(entry) if entry is not None else None
+
+    def drop_worker(self, worker):
+        """Ein Worker ist weg: seine Namen werden frei"""
+        for name in [name for name, entry in self.owners.items() if entry[0] == worker]:
+            del self.owners[name]
+
+    OPERATIONS = ('claim', 'release', 'set_connected', 'owner')
+
+    def handle(self, worker, operation, args):
+        """Führt eine Anfrage eines Workers aus -> (Ergebnis, Benachrichtigungen [(Worker, Nachricht)])"""
+        if operation not in self.OPERATIONS:
+            raise ValueError(f"Unbekannte Registry-Operation: {operation}")
+        result = getattr(self, operation)(worker, *args)
+        notifications = []
+        if operation == 'claim' and result[0] and result[1] is not None:
+            notifications.append((result[1], {'user_claimed': args[0], 'worker': worker}))
+        return result, notifications
+
+
+class LocalHub:
+    """Verbindet LocalBus-Instanzen im selben Prozess und hält deren Namensregister"""
+
+    def __init__(self):
+        self.buses = {}  # worker: LocalBus
+        self.registry = UserRegistry()
+
+
+class LocalBus:
+    """Bus innerhalb eines Prozesses; Nachrichten werden sofort an die Abonnenten der anderen Worker zugestellt"""
+
+    def __init__(self, worker=0, hub=None):
+        self.worker = worker
+        self.hub = hub or LocalHub()
+        self.hub.buses[worker] = self
+        self.subscribers = {}  # channel: [callback]
+
+    @property
+    def clustered(self):
+        return len(self.hub.buses) > 1
+
+    def subscribe(self, channel, callback):
+        self.subscribers.setdefault(channel, []).append(callback)
+
+    def _deliver(self, channel, message):
+        for callback in self.subscribers.get(channel, []):
+            callback(message)
+
+    def publish(self, channel, message):
+        for worker, bus in list(self.hub.buses.items()):
+            if worker != self.worker:
+                bus._deliver(channel, message)
+
+    def request(self, operation, *args):
+        result, notifications = self.hub.registry.handle(self.worker, operation, args)
+        for worker, message in notifications:
+            if worker in self.hub.buses:
+                self.hub.buses[worker]._deliver('cluster', message)
+        return result
+
+
+def send_frame(sock, obj):
+    data = pickle.dumps(obj, pickle.HIGHEST_PROTOCOL)
+    sock.sendall(FRAME_HEADER.pack(len(data)) + data)
+
+
+def read_frame(stream):
+    """Nächster Frame aus einem Datei-Objekt des Sockets, None bei Verbindungsende"""
+    try:
+        header = stream.read(FRAME_HEADER.size)
+        if len(header) < FRAME_HEADER.size:
+            return None
+        (length,) = FRAME_HEADER.unpack(header)
+        data = stream.read(length)
+    except OSError:  # z.B. ConnectionResetError, wenn der andere Prozess beendet wurde
+        return None
+    if len(data) < length:
+        return None
+    return pickle.loads(data)
+
+
+class UnixSocketBus:
+    """Bus zwischen Worker-Prozessen über den Broker (siehe Broker) an einem Unix-Socket.
+
+    async_mode wie bei Socket.IO: 'eventlet' nutzt grüne Sockets und Greenlets,
+    'threading' normale Threads.
+
+    Der Empfang (_listen) beantwortet nur Anfragen und reiht Nachrichten ein;
+    die Abonnenten laufen der Reihe nach in _dispatch. So dürfen sie selbst
+    request() aufrufen (z.B. cleanup_user nach user_claimed), die Antwort
+    darauf nimmt weiterhin _listen entgegen.
+    """
+
+    def __init__(self, path, worker, async_mode='threading'):
+        if async_mode == 'eventlet':
+            from eventlet.green import socket, threading
+            import eventlet
+            import eventlet.queue
+            self._spawn = eventlet.spawn_n
+            self.messages = eventlet.queue.LightQueue()
+        else:
+            import queue
+            import socket
+            import threading
+            self._spawn = lambda function: threading.Thread(target=function, daemon=True).start()
+            self.messages = queue.SimpleQueue()
+        self._event = threading.Event
+        self._send_lock = threading.Lock()  # Frames dürfen sich beim Senden nicht vermischen
+        self.worker = worker
+        self.clustered = True
+        self.subscribers = {}
+        self.pending = {}  # request_id: [Event, Ergebnis]
+        self.next_request_id = 0
+
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+        self._send(('hello', worker))
+        self._spawn(self._listen)
+        self._spawn(self._dispatch)
+
+    def _send(self, frame):
+        with self._send_lock:
+            send_frame(self.sock, frame)
+
+    def subscribe(self, channel, callback):
+        self.subscribers.setdefault(channel, []).append(callback)
+
+    def publish(self, channel, message):
+        self._send(('pub', channel, pickle.dumps(message, pickle.HIGHEST_PROTOCOL)))
+
+    def request(self, operation, *args):
+        request_id = self.next_request_id
+        self.next_request_id += 1
+        waiter = [self._event(), None]
+        self.pending[request_id] = waiter
+        self._send(('req', request_id, operation, args))
+        if not waiter[0].wait(10):
+            self.pending.pop(request_id, None)
+            raise TimeoutError(f"Broker antwortet nicht auf {operation}")
+        return waiter[1]
+
+    def _listen(self):
+        stream = self.sock.makefile('rb')
+        while True:
+            frame = read_frame(stream)
+            if frame is None:
+                print("Verbindung zum Cluster-Broker verloren", flush=True)
+                return
+            if frame[0] == 'res':
+                waiter = self.pending.pop(frame[1], None)
+                if waiter is not None:
+                    waiter[1] = frame[2]
+                    waiter[0].set()
+            elif frame[0] == 'msg':
+                self.messages.put((frame[1], frame[2]))
+
+    def _dispatch(self):
+        while True:
+            channel, data = self.messages.get()
+            message = pickle.loads(data)
+            for callback in self.subscribers.get(channel, []):
+                try:
+                    callback(message)
+                except Exception as e:
+                    print(f"Fehler in Bus-Abonnent {channel}: {e}", flush=True)
+
+
+class Broker:
+    """Verteilt Nachrichten zwischen den Workern und hält das Namensregister; läuft im Supervisor (Threads)"""
+
+    def __init__(self, path):
+        import threading
+        self.path = path
+        self.registry = UserRegistry()
+        self.connections = {}  # worker: socket
+        self.lock = threading.Lock()  # schützt registry, connections und das Senden
+
+    def start(self):
+        import socket
+        import threading
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(self.path)
+        os.chmod(self.path, 0o600)
+        self.server.listen()
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        import threading
+        while True:
+            connection, _ = self.server.accept()
+            threading.Thread(target=self._serve, args=(connection,), daemon=True).start()
+
+    def _send_to(self, worker, frame):
+        connection = self.connections.get(worker)
+        if connection is None:
+            return
+        try:
+            send_frame(connection, frame)
+        except OSError:
+            pass  # Verbindungsende wird im Thread des Workers behandelt
+
+    def _serve(self, connection):
+        stream = connection.makefile('rb')
+        hello = read_frame(stream)
+        if not hello or hello[0] != 'hello':
+            connection.close()
+            return
+        worker = hello[1]
+        with self.lock:
+            self.connections[worker] = connection
+        print(f"Worker {worker} mit dem Broker verbunden", flush=True)
+
+        while True:
+            frame = read_frame(stream)
+            if frame is None:
+                break
+            with self.lock:
+                if frame[0] == 'pub':
+                    for other in list(self.connections):
+                        if other != worker:
+                            self._send_to(other, ('msg', frame[1], frame[2]))
+                elif frame[0] == 'req':
+                    _, request_id, operation, args = frame
+                    result, notifications = self.registry.handle(worker, operation, args)
+                    self._send_to(worker, ('res', request_id, result))
+                    for target, message in notifications:
+                        self._send_to(target, ('msg', 'cluster', pickle.dumps(message)))
+
+        with self.lock:
+            if self.connections.get(worker) is connection:
+                del self.connections[worker]
+            self.registry.drop_worker(worker)
+            for other in list(self.connections):
+                self._send_to(other, ('msg', 'cluster', pickle.dumps({'worker_gone': worker})))
+        connection.close()
+        print(f"Worker {worker} vom Broker getrennt", flush=True)
+
+
+class BusManager(socketio.PubSubManager):
+    """Socket.IO Client-Manager über einen Bus: Emits an nicht lokale Räume erreichen alle Worker.
+
+    Räume mit Mitgliedern auf diesem Worker (seine Spiele, SIDs seiner Clients)
+    werden lokal bedient, außer sie stehen in shared_rooms (z.B. der
+    Lobby-Raum, den es auf jedem Worker gibt).
+    """
+    name = 'bus'
+
+    def __init__(self, bus, shared_rooms=(), channel='socketio'):
+        super().__init__(channel=channel)
+        self.bus = bus
+        self.shared_rooms = set(shared_rooms)
+        self.queue = None
+
+    def initialize(self):
+        self.queue = self.server.eio.create_queue()
+        self.bus.subscribe(self.channel, self.queue.put)
+        super().initialize()
+
+    def emit(self, event, data, namespace=None, room=None, skip_sid=None, callback=None, **kwargs):
+        room = kwargs.pop('to', None) or room
+        if (isinstance(room, str) and callback is None and room not in self.shared_rooms
+                and room in self.rooms.get(namespace or '/', {})):
+            kwargs['ignore_queue'] = True
+        return super().emit(event, data, namespace=namespace, room=room, skip_sid=skip_sid, callback=callback, **kwargs)
+
+    def _publish(self, data):
+        self.bus.publish(self.channel, data)
+
+    def _listen(self):
+        while True:
+            yield self.queue.get()
+
+
+def create_bus(async_mode='threading'):
+    """Bus dieses Prozesses: UnixSocketBus bei mehreren Workern, sonst LocalBus"""
+    if WORKERS > 1:
+        if not CLUSTER_SOCKET:
+            raise RuntimeError("WORKERS > 1 braucht CLUSTER_SOCKET (Start über python cluster.py)")
+        return UnixSocketBus(CLUSTER_SOCKET, WORKER_INDEX, async_mode)
+    return LocalBus(WORKER_INDEX)
+
+
+def main():
+    """Supervisor: startet den Broker und die Worker-Prozesse, beendet alle bei Strg+C / SIGTERM"""
+    import argparse
+    import signal
+    import subprocess
+    import sys
+    import tempfile
+
+    parser = argparse.ArgumentParser(description="Server mit mehreren Worker-Prozessen starten")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2)
+    parser.add_argument('--port', type=int, default=CLUSTER_BASE_PORT, help="Port von Worker 0, Worker i nutzt Port + i")
+    parser.add_argument('--socket', default=os.path.join(tempfile.gettempdir(), 'cards-against-everyone.sock'))
+    args = parser.parse_args()
+
+    broker = Broker(args.socket)
+    broker.start()
+
+    workers = []
+    for worker in range(args.workers):
+        env = dict(os.environ, WORKERS=str(args.workers), WORKER_INDEX=str(worker), CLUSTER_SOCKET=args.socket,
+                   CLUSTER_BASE_PORT=str(args.port), PORT=str(args.port + worker))
+        workers.append(subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')], env=env))
+    print(f"{args.workers} Worker auf Port {args.port}-{args.port + args.workers - 1} gestartet", flush=True)
+
+    def stop(*_):
+        for process in workers:
+            process.terminate()
+
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        for process in workers:
+            process.wait()
+    except KeyboardInterrupt:
+        stop()
+        for process in workers:
+            process.wait()
+    finally:
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+from array import array
+from bisect import bisect_right
+import random
+
+
+class Deck:
+    """Gemischter Kartenstapel aus Kartenindizes (z.B. Index in CARDS_ANSWERS).
+
+    Der Stapel ist die Verkettung mehrerer Teile, z.B. der gemeinsamen Arrays
+    der gewählten Kartensätze (siehe cards.pack_cards) und eines range() mit
+    den IDs der eigenen Karten eines Spiels. Die Teile werden weder kopiert
+    noch verändert: gezogen wird per verzögertem Fisher-Yates, also eine
+    zufällige Position im noch nicht gezogenen Bereich, und nur die dabei
+    vertauschten Positionen werden gemerkt. Der Speicher pro Spiel wächst so
+    mit der Zahl gezogener Karten, nicht mit der Größe der Kartensätze.
+
+    Gespielte Karten kommen auf den Ablagestapel. Ist der Stapel leer, wird der
+    Ablagestapel zum neuen Stapel. Karten auf der Hand sind in keinem der
+    beiden Stapel, daher gibt es im Spiel keine doppelten Karten.
+    """
+
+    def __init__(self, parts, rng=random):
+        self.rng = rng
+        self.discards = array('I')  # Ablagestapel
+        self._use(parts)
+
+    def _use(self, parts):
+        self.parts = [part for part in parts if len(part)]
+        self.starts = []     # erste Position jedes Teils im verketteten Stapel
+        total = 0
+        for part in self.parts:
+            self.starts.append(total)
+            total += len(part)
+        self.remaining = total  # Positionen 0..remaining-1 sind noch nicht gezogen
+        self.swapped = {}       # Position -> Position, deren Karte jetzt dort liegt
+
+    def __len__(self):
+        """Anzahl der Karten im Nachziehstapel"""
+        return self.remaining
+
+    def _card_at(self, position):
+        index = bisect_right(self.starts, position) - 1 if len(self.parts) > 1 else 0
+        return self.parts[index][position - self.starts[index]]
+
+    def draw(self):
+        if not self.remaining:
+            self.reshuffle()
+            if not self.remaining:
+                raise IndexError("Keine Karten mehr im Stapel")
+        last = self.remaining - 1
+        position = self.rng.randrange(self.remaining)
+        drawn = self.swapped.get(position, position)
+        # die letzte ungezogene Karte rückt an die gezogene Position, der ungezogene Bereich schrumpft um eins
+        if position != last:
+            self.swapped[position] = self.swapped.get(last, last)
+        self.swapped.pop(last, None)
+        self.remaining = last
+        return self._card_at(drawn)
+
+    def discard(self, card):
+        self.discards.append(card)
+
+    def reshuffle(self):
+        """Der Ablagestapel wird zum neuen Nachziehstapel (gemischt wird beim Ziehen)"""
+        discards = self.discards
+        self.discards = array('I')
+        self._use([discards])
+
+    def to_snapshot(self, shared_parts=None):
+        """Position im Stapel als einfache Daten (für Snapshots).
+
+        Teile aus shared_parts ({Name: Teil}, z.B. die Arrays der Kartensätze)
+        werden nur über ihren Namen referenziert, ranges über Start und Ende;
+        kopiert wird nur ein neu gemischter Ablagestapel.
+        """
+        names = {id(part): name for name, part in (shared_parts or {}).items()}
+        parts = []
+        for part in self.parts:
+            if id(part) in names:
+                parts.append({'shared': names[id(part)]})
+            elif isinstance(part, range):
+                parts.append({'range': [part.start, part.stop]})
+            else:
+                parts.append({'cards': list(part)})
+        return {
+            'parts': parts,
+            'total': sum(len(part) for part in self.parts),
+            'remaining': self.remaining,
+            'swapped': list(self.swapped.items()),
+            'discards': list(self.discards),
+        }
+
+    @classmethod
+    def from_snapshot(cls, snapshot, shared_parts=None, rng=random):
+        """Gegenstück zu to_snapshot(); ValueError, wenn sich die gemeinsamen Teile seitdem geändert haben"""
+        parts = []
+        for part in snapshot['parts']:
+            if 'shared' in part:
+                if part['shared'] not in (shared_parts or {}):
+                    raise ValueError(f"Unbekannter Teil {part['shared']}")
+                parts.append(shared_parts[part['shared']])
+            elif 'range' in part:
+                parts.append(range(*part['range']))
+            else:
+                parts.append(array('I', part['cards']))
+        deck = cls(parts, rng)
+        if deck.remaining != snapshot['total']:
+            raise ValueError("Kartensätze haben sich seit dem Snapshot geändert")
+        deck.remaining = snapshot['remaining']
+        deck.swapped = dict(snapshot['swapped'])
+        deck.discards = array('I', snapshot['discards'])
+        return deck
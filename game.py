@@ -1,33 +1,109 @@
-from questions import CARDS_QUESTIONS
-from answers import CARDS_ANSWERS
+from cards import CARDS_QUESTIONS, CARD_PACKS, DEFAULT_PACKS, CUSTOM_CARD_OFFSET, pack_cards, cards_version, is_compatible_version
+from ingest import validate_card, duplicate_key, MAX_BLANKS
+from statediff import diff
+from deck import Deck
+from payload import encode, merge
+from collections import OrderedDict
+import functools
 import uuid
 import random
+import math
+import time
+import os
+
+TIMER_LATENESS_WARNING = 0.5  # seconds a phase deadline may fire late before it is logged
+
+# > 0: presence changes are batched into one player_status_digest per game and interval (seconds)
+PRESENCE_DIGEST_INTERVAL = float(os.environ.get('PRESENCE_DIGEST_INTERVAL', '0'))
+
+STATE_HISTORY_SIZE = 16  # number of past revisions clients can receive deltas against
+HISTORY_PAGE_LIMIT = 50  # max. rounds per get_history request
+MAX_CUSTOM_CARDS = 200  # per kind, custom cards are stored in the settings and sent with every full state
+MAX_GAME_NAME_LENGTH = 30  # like the maxlength of the settings form
+# inclusive bounds of integer settings, all others are at least 1;
+# a hand must hold enough cards for the question with the most blanks (like min of the settings form)
+SETTING_LIMITS = {"maxPlayers": (3, 42), "maxWhiteCardsPerPlayer": (MAX_BLANKS, None)}
+
+# emitted: presence broadcasts sent, suppressed: unchanged status reports (e.g. pings) not broadcast,
+# batched: changes merged into a digest
+PRESENCE_COUNTERS = {'emitted': 0, 'suppressed': 0, 'batched': 0}
+
+# fields stored as they are in a snapshot (see Game.to_snapshot), the rest is derived or per connection
+SNAPSHOT_FIELDS = (
+    'created_at', 'owner', 'active_players', 'spectators', 'history', 'current_round', 'playerCards',
+    'current_black_card_id', 'winning_white_cards', 'submitted_white_cards', 'player_mapping', 'scores',
+    'czarIndex', 'czar', 'state', 'currentTimerTotalSeconds', 'currentTimerSeconds', 'paused', 'winner_choosen',
+    'current_czar_selected_player', 'choosing_playerName', 'current_reactions', 'resetted_to_lobby', 'settings',
+    'revision'
+)
+
+def logged(method):
+    """Record accepted top-level calls of a command in the game's event log (see gamelog.py).
+
+    A call counts as accepted if it changed the shared state (revision) or returned (True, message);
+    calls made from within another command are reproduced by replaying the outer one.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        revision = self.revision
+        result = None
+        self.log_depth += 1
+        try:
+            result = method(self, *args, **kwargs)
+            return result
+        finally:
+            self.log_depth -= 1
+            if self.event_log is not None and self.log_depth == 0 and \
+                    (self.revision != revision or (isinstance(result, tuple) and result[0] is True)):
+                self.event_log.record(self.clock(), self.revision, method.__name__, args, kwargs)
+    return wrapper
+
+def shared_deck_parts():
+    """({pack_id: question ids}, {pack_id: answer ids}) of all packs, decks reference these arrays in snapshots"""
+    return ({pack_id: pack.questions for pack_id, pack in CARD_PACKS.items()},
+            {pack_id: pack.answers for pack_id, pack in CARD_PACKS.items()})
 
 class Game:
-    def __init__(self, socketio, global_player_data, ownerName, gameName, isPublicVisible=True, password=""):
+    def __init__(self, socketio, global_player_data, ownerName, gameName, isPublicVisible=True, password="", scheduler=None, game_id=None, seed=None):
         self.socketio = socketio
         self.global_player_data = global_player_data
-        self.game_id = str(uuid.uuid4())
+        self.scheduler = scheduler  # DeadlineScheduler for phase deadlines, None = timer driven manually
+        self.on_change = None       # called with game_id after every mutation (e.g. to refresh the lobby index)
+        self.on_membership = None   # called with (game_id, playerName, joined) when a player or spectator joins or is removed
+        self.clock = scheduler.clock if scheduler is not None else time.monotonic
+        self.game_id = game_id or str(uuid.uuid4())  # in cluster mode the id decides the worker (cluster.new_game_id)
+        self.created_at = time.time()
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.rng = random.Random(self.seed)  # all randomness of the game, a replay with the same seed draws the same cards
+        self.event_log = None  # gamelog.EventLog recording the accepted commands, None = not recorded
+        self.log_depth = 0     # nesting of logged commands, only the outermost call is recorded
         self.owner = ownerName      # Owner's player name
         self.active_players = [ownerName]         # List of player objects or IDs
         self.player_status = {ownerName: 'connected'}   # playerName: 'connected', 'disconnected', etc.
+        self.pending_presence = {}  # playerName: status, changes waiting for the next presence digest
         self.spectators = []      # List of spectator names
 
 
         # Game variables
         self.history = []          # list of past rounds
         self.current_round = 0     # current round number
-        self.playerCards = {}   # playerName: list of white cards
+        self.playerCards = {}   # playerName: list of white card ids (indices into CARDS_ANSWERS)
+        self.white_deck = None  # Deck of CARDS_ANSWERS indices of the selected card packs, shuffled at game start
+        self.black_deck = None  # Deck of CARDS_QUESTIONS indices of the selected card packs
+        self.current_black_card_id = None  # card id (index in CARDS_QUESTIONS) of the current black card, sent to clients
         self.current_black_card = {} # current black card -> card_text: str, num_blanks: int
         self.winning_white_cards = {}  # list of winning white cards in current round
-        self.submitted_white_cards = {}  # playerName: [white_card(s)]
+        self.submitted_white_cards = {}  # playerName: [white card id(s)]
         self.player_mapping = []    # List of playerNames random order for displaying submitted cards
         self.scores = {}           # playerName: score
         self.czarIndex = 0      # index of current czar in active_players -> random set-value at start
         self.czar = None           # playerName of current czar
         self.state = 'lobby'  # 'lobby', 'choosing_cards', 'choosing_winner', 'countdown_next_round', 'game_ended'
         self.currentTimerTotalSeconds = 0  # total seconds for current timer
-        self.currentTimerSeconds = 0      # remaining seconds for current timer
+        self.currentTimerSeconds = 0      # remaining seconds when the timer was last (re)armed
+        self.phase_deadline = None        # absolute monotonic deadline of the current phase
+        self.phase_deadline_wall = None   # same deadline as server wall clock time for the clients
+        self.paused_remaining = None      # remaining seconds stored while paused
         self.paused = False # whether the game is paused (owner can pause during choosing phases)
         self.winner_choosen = False
         self.current_czar_selected_player = None   
@@ -35,6 +111,13 @@ class Game:
         self.current_reactions = {}  # playerName: { to_player_index: points }
         self.resetted_to_lobby = []  # list of playerNames who have reset to lobby after game ended
 
+        # Versioned state for delta updates
+        self.revision = 0                   # bumped on every mutation of the shared state
+        self.state_history = OrderedDict()  # revision: public state, the last STATE_HISTORY_SIZE revisions
+        self.viewer_revisions = {}          # playerName: revision the viewer got last
+        self.viewer_private = {}            # playerName: private state the viewer got last
+        self.encoded_state = (None, None, None)  # (revision, encoded public state, encoded history)
+
         # Game Settings
         self.settings = {    
             "gameName": gameName if gameName else ownerName + "'s Game",
@@ -47,57 +130,319 @@ class Game:
             "timeToChooseWhiteCards": 60,
             "timeToChooseWinner": 60,
             "timeAfterWinnerChosen": 15,
-            "maxPlayers": 10
+            "maxPlayers": 10,
+            "cardPacks": list(DEFAULT_PACKS),
+            "customCards": {"questions": [], "answers": []}  # house cards of this game: questions [[text, num_blanks]], answers [text]
         }
 
+    @logged
     def updateSettings(self, newSettings):
+        if not isinstance(newSettings, dict):
+            return
         for key, value in newSettings.items():
+            if key == "cardPacks":
+                value = self.validate_card_packs(value)
+            elif key == "customCards":
+                # card ids of custom cards are list positions, they must not change while a game is running
+                value = self.validate_custom_cards(value) if self.state == 'lobby' else None
+            elif key in self.settings:
+                value = self.validate_setting(key, value)
             if key in self.settings and value is not None:
                 self.settings[key] = value
+        self.mark_dirty()
+
+    def validate_setting(self, key, value):
+        """value for a plain setting in the type of its current value, None (keep the current value) if it doesn't fit.
+
+        gameName and maxPlayers end up in the lobby index shared by all clients, a wrong type there would break it.
+        """
+        current = self.settings[key]
+        if isinstance(current, bool):
+            return value if isinstance(value, bool) else None
+        if isinstance(current, int):
+            if not isinstance(value, int) or isinstance(value, bool):
+                return None
+            low, high = SETTING_LIMITS.get(key, (1, None))
+            return value if value >= low and (high is None or value <= high) else None
+        if isinstance(current, str):
+            if not isinstance(value, str):
+                return None
+            if key == "gameName":
+                value = value.strip()[:MAX_GAME_NAME_LENGTH]
+                return value or None
+            return value
+        return None
+
+    def validate_card_packs(self, pack_ids):
+        """Known pack ids without duplicates, None (keep the current selection) if they cannot deal a game (missing_cards)"""
+        if not isinstance(pack_ids, list):
+            return None
+        pack_ids = [pack_id for pack_id in dict.fromkeys(pack_id for pack_id in pack_ids if isinstance(pack_id, str)) if pack_id in CARD_PACKS]
+        if self.missing_cards(pack_ids) is not None:
+            return None
+        return pack_ids
+
+    def missing_cards(self, pack_ids=None):
+        """Why the packs (default: the selected ones) plus the custom cards cannot deal a game, None if they can.
+
+        A game needs a question and a full hand for maxPlayers players, otherwise the answer deck runs dry while dealing.
+        """
+        questions, answers = pack_cards(self.settings["cardPacks"] if pack_ids is None else pack_ids)
+        custom_cards = self.settings["customCards"]
+        if sum(map(len, questions)) + len(custom_cards["questions"]) == 0:
+            return "Die gewählten Kartensätze enthalten keine Fragekarten"
+        answer_count = sum(map(len, answers)) + len(custom_cards["answers"])
+        needed = self.settings["maxPlayers"] * self.settings["maxWhiteCardsPerPlayer"]
+        if answer_count < needed:
+            return f"Zu wenige Antwortkarten: {answer_count}, für {self.settings['maxPlayers']} Spieler mindestens {needed}"
+        return None
+
+    @staticmethod
+    def validate_custom_cards(custom_cards):
+        """Valid, deduplicated custom cards ({"questions": [text], "answers": [text]} from the client), None if malformed.
+
+        Invalid entries are dropped, num_blanks is derived from the blanks like for imported cards.
+        """
+        if not isinstance(custom_cards, dict):
+            return None
+        result = {"questions": [], "answers": []}
+        for kind in result:
+            texts = custom_cards.get(kind, [])
+            if not isinstance(texts, list):
+                return None
+            seen = set()
+            for text in texts:
+                success, card = validate_card(kind == "questions", text)
+                if not success or duplicate_key(card[0]) in seen:
+                    continue
+                seen.add(duplicate_key(card[0]))
+                result[kind].append(list(card) if kind == "questions" else card[0])
+                if len(result[kind]) >= MAX_CUSTOM_CARDS:
+                    break
+        return result
+
+    def question_card(self, card_id):
+        """Black card dict for a card id, custom cards have ids from CUSTOM_CARD_OFFSET on"""
+        if card_id >= CUSTOM_CARD_OFFSET:
+            card_text, num_blanks = self.settings["customCards"]["questions"][card_id - CUSTOM_CARD_OFFSET]
+            return {"card_text": card_text, "num_blanks": num_blanks}
+        return CARDS_QUESTIONS[card_id]
     
-    def send_socket_game_update_for_all(self, channel="game_state_update", include_history=False):
-        for player in self.active_players + self.spectators:
-            self.socketio.emit(channel, self.get_socket_game_data(
-                    include_player_cards=False,
-                    current_playerName=player,
-                    include_history=include_history
-                )
-            , room=self.global_player_data[player]['sid'])
+    def mark_dirty(self):
+        """Every mutation of the shared game state bumps the revision"""
+        self.revision += 1
+        if self.on_change:
+            self.on_change(self.game_id)
+
+    def send_socket_game_update_for_all(self, channel="game_state_update"):
+        self.send_socket_game_update(self.active_players + self.spectators, channel)
+
+    def send_socket_game_update(self, viewers, channel="game_state_update"):
+        """Send the viewers the shared delta against the revision they got last plus their private part if it changed.
+
+        The shared delta is encoded once per base revision and emitted to the game room, viewers on another
+        base (or already up to date) are skipped there. Viewers with an unknown base get a full snapshot.
+        """
+        revision, state = self.get_versioned_state()
+        groups = {}  # base revision: [playerName]
+        for player in viewers:
+            if player not in self.global_player_data:
+                continue
+            base = self.viewer_revisions.get(player)
+            if base not in self.state_history:
+                self.socketio.emit(channel, self.get_full_sync_data(player), room=self.global_player_data[player]['sid'])
+                continue
+
+            # private part first, the client applies it together with the following shared delta
+            self.send_private_update(player, revision, channel)
+            if base != revision:
+                groups.setdefault(base, []).append(player)
+
+        if not groups:
+            return
+
+        room_base = max(groups, key=lambda base: len(groups[base]))
+        for base, players in groups.items():
+            payload = encode({
+                'channel': channel,
+                'base': base,
+                'revision': revision,
+                'ops': diff(self.state_history[base], state)
+            })
+            if base == room_base:
+                skip_sids = [self.global_player_data[member]['sid'] for member in self.active_players + self.spectators
+                             if member not in players and member in self.global_player_data]
+                self.socketio.emit('game_state_delta', payload, room=self.game_id, skip_sid=skip_sids or None)
+            else:
+                for player in players:
+                    self.socketio.emit('game_state_delta', payload, room=self.global_player_data[player]['sid'])
+            for player in players:
+                self.viewer_revisions[player] = revision
+
+    def send_private_update(self, playerName, revision, channel="game_state_update"):
+        """Send the viewer's private state if it differs from what the viewer got last"""
+        private = self.get_private_state(playerName)
+        if self.viewer_private.get(playerName) == private:
+            return False
+        self.viewer_private[playerName] = private
+        self.socketio.emit('game_private_update', {
+            'channel': channel,
+            'revision': revision,
+            'private': private
+        }, room=self.global_player_data[playerName]['sid'])
+        return True
 
     def broadcast_event_to_game(self, channel, data):
         for player in self.active_players + self.spectators:
             self.socketio.emit(channel, data, room=self.global_player_data[player]['sid'])
 
+    def get_public_state(self):
+        """Part of the game data that is identical for every viewer.
 
-    def get_socket_game_data(self, include_player_cards=False, current_playerName:str=None, include_history=False):
+        Containers are copied so states stored for older revisions stay unchanged.
+        """
         return {
             "game_id": self.game_id,
             "owner": self.owner,
-            "active_players": self.active_players,
-            "player_status": self.player_status,
-            "spectators": self.spectators,
-            "history": self.history if include_history else [],
+            "active_players": list(self.active_players),
+            "player_status": dict(self.player_status),
+            "spectators": list(self.spectators),
+            "history_count": len(self.history),  # history itself is sent on join/reconnect and via round_finished
             "current_round": self.current_round,
-            "playerCards": self.playerCards if include_player_cards else {},
-            "currentPlayerCards": self.playerCards.get(current_playerName, []) if current_playerName else [],
-            "current_black_card": self.current_black_card,
-            "player_mapping": self.player_mapping,
-            "winning_white_cards": self.winning_white_cards,
-            "submitted_white_cards": self.submitted_white_cards,
-            "scores": self.scores,
+            "current_black_card": self.current_black_card_id,
+            "player_mapping": list(self.player_mapping),
+            "winning_white_cards": dict(self.winning_white_cards),
+            "submitted_white_cards": {player: list(cards) for player, cards in self.submitted_white_cards.items()},
+            "scores": dict(self.scores),
             "czarIndex": self.czarIndex,
             "czar": self.czar,
             "state": self.state,
             "currentTimerTotalSeconds": self.currentTimerTotalSeconds,
             "currentTimerSeconds": self.currentTimerSeconds,
+            "timerDeadline": self.phase_deadline_wall,
             "paused": self.paused,
             "winner_choosen": self.winner_choosen,
+            "resetted_to_lobby": list(self.resetted_to_lobby),
+            "settings": dict(self.settings)
+        }
+
+    def get_private_state(self, current_playerName):
+        """Part of the game data that differs per viewer"""
+        return {
+            "currentPlayerCards": list(self.playerCards.get(current_playerName, [])) if current_playerName else [],
             "current_czar_selected_player": self.current_czar_selected_player if self.czar == current_playerName else None,
-            "player_reactions": self.current_reactions[current_playerName] if current_playerName in self.current_reactions else {},
-            "resetted_to_lobby": self.resetted_to_lobby,
-            "settings": self.settings
+            "player_reactions": dict(self.current_reactions[current_playerName]) if current_playerName in self.current_reactions else {}
         }
+
+    def get_versioned_state(self):
+        """Current (revision, public state), built once per revision and kept so later deltas can be computed against it"""
+        state = self.state_history.get(self.revision)
+        if state is None:
+            state = self.get_public_state()
+            self.state_history[self.revision] = state
+            while len(self.state_history) > STATE_HISTORY_SIZE:
+                self.state_history.popitem(last=False)
+        return self.revision, state
+
+    def get_encoded_state(self):
+        """Current (revision, encoded public state, encoded history); encoded at most once per revision"""
+        if self.encoded_state[0] != self.revision:
+            revision, state = self.get_versioned_state()
+            self.encoded_state = (revision, encode(state), encode(self.history))
+        return self.encoded_state
+
+    def get_socket_game_data(self, include_player_cards=False, current_playerName:str=None, include_history=False):
+        revision, state = self.get_versioned_state()
+        data = dict(state)
+        data.update(self.get_private_state(current_playerName))
+        data["revision"] = revision
+        data["playerCards"] = self.playerCards if include_player_cards else {}
+        data["history"] = list(self.history) if include_history else []
+        return data
+
+    def get_history(self, from_round=0, limit=HISTORY_PAGE_LIMIT):
+        """Page of the round history for clients that missed round_finished events"""
+        from_round = max(0, from_round)
+        limit = max(0, min(limit, HISTORY_PAGE_LIMIT))
+        return self.history[from_round:from_round + limit]
+
+    def get_full_sync_data(self, playerName):
+        """Full snapshot for a viewer (join, reconnect, revision gap); following updates are deltas against it.
+
+        Same content as get_socket_game_data(current_playerName=playerName, include_history=True), but assembled
+        from the cached encoding of the public state so only the private part is encoded per call.
+        """
+        revision, public, history = self.get_encoded_state()
+        private = self.get_private_state(playerName)
+        self.viewer_revisions[playerName] = revision
+        self.viewer_private[playerName] = private
+        return merge(public, private, {"revision": revision, "playerCards": {}}, {"history": history})
     
+    def to_snapshot(self):
+        """Game as plain data for persistence. Contains references to live containers, encode it right away.
+
+        Timer deadlines are stored as remaining seconds since monotonic clocks differ between processes.
+        """
+        if self.paused_remaining is not None:
+            timer_remaining = self.paused_remaining
+        elif self.phase_deadline is not None:
+            timer_remaining = max(0.0, self.phase_deadline - self.clock())
+        else:
+            timer_remaining = None
+        shared_questions, shared_answers = shared_deck_parts()
+        snapshot = {field: getattr(self, field) for field in SNAPSHOT_FIELDS}
+        snapshot.update({
+            'game_id': self.game_id,
+            'cards_version': cards_version(),  # card ids are only meaningful with the same card set
+            'players': list(self.player_status),
+            'timer_remaining': timer_remaining,
+            'white_deck': self.white_deck.to_snapshot(shared_answers) if self.white_deck is not None else None,
+            'black_deck': self.black_deck.to_snapshot(shared_questions) if self.black_deck is not None else None,
+        })
+        return snapshot
+
+    @classmethod
+    def from_snapshot(cls, socketio, global_player_data, snapshot, scheduler=None, seed=None):
+        """Restore a game from to_snapshot(); all players start as disconnected and reattach via reconnect_user,
+        the phase timer is re-armed with the remaining time it had when the snapshot was taken.
+
+        If the card set changed since the snapshot (other than appended cards), its card ids would point at other
+        cards or out of range: such a game is restored in the lobby, without hands and history.
+        """
+        game = cls(socketio, global_player_data, snapshot['owner'], snapshot['settings']['gameName'],
+                   scheduler=scheduler, game_id=snapshot['game_id'], seed=seed)
+        for field in SNAPSHOT_FIELDS:
+            setattr(game, field, snapshot[field])
+        game.player_status = {player: 'disconnecting' for player in snapshot['players']}
+        version = snapshot.get('cards_version')
+        if version is None or not is_compatible_version(version):
+            print(f"Karten haben sich seit dem Snapshot von Spiel {game.game_id} geändert, es beginnt wieder in der Lobby", flush=True)
+            game.reset_to_lobby()
+            game.history = []
+            return game
+
+        if game.current_black_card_id is not None:
+            game.current_black_card = game.question_card(game.current_black_card_id)
+
+        if snapshot['white_deck'] is not None:
+            shared_questions, shared_answers = shared_deck_parts()
+            try:
+                game.white_deck = Deck.from_snapshot(snapshot['white_deck'], shared_answers, game.rng)
+                game.black_deck = Deck.from_snapshot(snapshot['black_deck'], shared_questions, game.rng)
+            except ValueError as e:
+                # card packs changed in between: fresh decks, cards on hand may be drawn a second time
+                print(f"Stapel von Spiel {game.game_id} neu gemischt: {e}", flush=True)
+                question_parts, answer_parts = game.deck_parts()
+                game.white_deck, game.black_deck = Deck(answer_parts, game.rng), Deck(question_parts, game.rng)
+
+        remaining = snapshot['timer_remaining']
+        if game.paused:
+            game.paused_remaining = remaining
+        elif remaining is not None and game.is_game_started():
+            game.arm_timer(remaining)
+        return game
+
+    @logged
     def toggle_role(self, playerName):
         if self.is_game_started():
             return False, "Spiel bereits gestartet"
@@ -108,52 +453,138 @@ class Game:
                 return False, "Maximale Spieleranzahl erreicht"
             self.spectators.remove(playerName)
             self.active_players.append(playerName)
+            self.mark_dirty()
             return True, "Spieler"
         
         if playerName in self.active_players:
             # switch to spectator
             self.active_players.remove(playerName)
             self.spectators.append(playerName)
+            self.mark_dirty()
             return True, "Zuschauer"
         
         return False, "Spieler nicht gefunden"
 
     def toogle_pause(self):
-        self.paused = not self.paused
+        if self.paused:
+            self.resume()
+        else:
+            self.pause()
+
+    @logged
+    def pause(self):
+        if self.phase_deadline is not None:
+            self.paused_remaining = max(0.0, self.phase_deadline - self.clock())
+            self.currentTimerSeconds = math.ceil(self.paused_remaining)
+        self.paused = True
+        self.stop_timer()
+        self.mark_dirty()
+
+    @logged
+    def resume(self):
+        self.paused = False
+        self.mark_dirty()
+        if self.paused_remaining is not None:
+            remaining, self.paused_remaining = self.paused_remaining, None
+            self.arm_timer(remaining)
+
+    def start_phase_timer(self, seconds):
+        """Start the timer of a new phase: the phase ends at an absolute monotonic deadline"""
+        self.currentTimerTotalSeconds = seconds
+        self.paused_remaining = None
+        self.arm_timer(seconds)
+
+    def arm_timer(self, seconds):
+        self.phase_deadline = self.clock() + seconds
+        self.phase_deadline_wall = time.time() + seconds
+        self.currentTimerSeconds = math.ceil(seconds)
+        self.mark_dirty()
+        if self.scheduler is not None:
+            self.scheduler.schedule(('timer', self.game_id), self.phase_deadline, self.on_timer_expired)
+        self.send_timer_sync()
+
+    def stop_timer(self):
+        self.phase_deadline = None
+        self.phase_deadline_wall = None
+        self.mark_dirty()
+        if self.scheduler is not None:
+            self.scheduler.cancel(('timer', self.game_id))
+
+    def get_remaining_seconds(self):
+        """Remaining seconds of the current phase, derived from the deadline (-1 = no timer)"""
+        if self.currentTimerTotalSeconds < 0:
+            return -1
+        if self.paused_remaining is not None:
+            return math.ceil(self.paused_remaining)
+        if self.phase_deadline is None:
+            return self.currentTimerSeconds
+        return max(0, math.ceil(self.phase_deadline - self.clock()))
+
+    def get_timer_sync_data(self):
+        # clients count down locally towards the (server wall clock) deadline
+        return {
+            'time_left': self.get_remaining_seconds(),
+            'max_time': self.currentTimerTotalSeconds,
+            'deadline': self.phase_deadline_wall,
+            'server_time': time.time(),
+            'paused': self.paused
+        }
+
+    def send_timer_sync(self, room=None):
+        """Only sent on phase start, pause/resume and on request, not every second"""
+        self.socketio.emit('timer_sync', self.get_timer_sync_data(), room=room or self.game_id)
+
+    def on_timer_expired(self):
+        lateness = self.clock() - self.phase_deadline if self.phase_deadline is not None else 0
+        if lateness > TIMER_LATENESS_WARNING:
+            print(f"Timer für Spiel {self.game_id} {lateness:.2f}s zu spät abgelaufen", flush=True)
 
-    def timer_tick(self):
-        if self.currentTimerSeconds < 0:
+        success, message = self.timer_expired()
+        if not success:
+            print(f"Fehler beim Timer-Ablauf für Spiel {self.game_id}: {message}", flush=True)
+
+    @logged
+    def timer_expired(self):
+        if not self.is_game_started() or self.paused:
             return False, "Timer nicht aktiv (state={})".format(self.state)
-        
-        if not self.paused:
-            self.currentTimerSeconds -= 1
-        
-        if self.currentTimerSeconds == 0:
+
+        self.phase_deadline = None
+        self.phase_deadline_wall = None
+        self.currentTimerSeconds = 0
+        self.mark_dirty()
+        if self.state == 'choosing_cards':
+            self.autosubmit_white_cards(ignoreConnection=True)
             if self.state == 'choosing_cards':
-                self.autosubmit_white_cards(ignoreConnection=True)
-            elif self.state == 'choosing_winner':
-                if self.winner_choosen:
-                    self.finalize_winner_choice()
-                    self.winner_choosen = False
-                    self.current_czar_selected_player = None
-                    self.choosing_playerName = None
+                # players without cards (exhausted answer deck) could not submit, the phase still has to end
+                if self.submitted_white_cards:
+                    self.start_choosing_winner()
                 else:
-                    # auto choose random winner
-                    possible_winners = list(self.submitted_white_cards.keys())
-                    if possible_winners:
-                        chosen_winner = random.choice(possible_winners)
-                        self.choose_winner(chosen_winner, choosing_playerName=None)
-
-            elif self.state == 'countdown_next_round':
-                success,error = self.next_round()
-                if not success:
-                    print("Error moving to next round:", error)
-            self.send_socket_game_update_for_all(include_history=True)
-        return True,"Timer aktualisiert"
+                    print(f"Spiel {self.game_id}: keine Antwortkarten mehr, Spiel wird beendet", flush=True)
+                    self.end_game()
+        elif self.state == 'choosing_winner':
+            if self.winner_choosen:
+                self.finalize_winner_choice()
+                self.winner_choosen = False
+                self.current_czar_selected_player = None
+                self.choosing_playerName = None
+            else:
+                # auto choose random winner
+                possible_winners = list(self.submitted_white_cards.keys())
+                if possible_winners:
+                    chosen_winner = self.rng.choice(possible_winners)
+                    self.choose_winner(chosen_winner, choosing_playerName=None)
+
+        elif self.state == 'countdown_next_round':
+            success,error = self.next_round()
+            if not success:
+                print("Error moving to next round:", error)
+        self.send_socket_game_update_for_all()
+        return True,"Timer abgelaufen"
 
     def is_game_started(self):
         return self.state != 'lobby' and self.state != 'game_ended'
 
+    @logged
     def add_player(self, playerName, isSpectator):
         if not playerName:
             return False, "Ungültiger Spielername"
@@ -171,14 +602,34 @@ class Game:
             if not playerName in self.active_players:
                 self.active_players.append(playerName)
         
+        joined = playerName not in self.player_status
         self.player_status[playerName] = 'connected'
+        self.mark_dirty()
+        if joined and self.on_membership:
+            self.on_membership(self.game_id, playerName, True)
 
         return True, "Spieler hinzugefügt"
     
+    @logged
     def mark_player_connection_status(self, playerName, status):
         if playerName in self.player_status:
+            # only broadcast actual changes (handle_ping reports 'connected' on every heartbeat)
+            if self.player_status[playerName] == status:
+                PRESENCE_COUNTERS['suppressed'] += 1
+                return True
+
             self.player_status[playerName] = status
+            self.mark_dirty()
+
+            if PRESENCE_DIGEST_INTERVAL > 0 and self.scheduler is not None:
+                # collect changes and send them as one digest per interval
+                self.pending_presence[playerName] = status
+                PRESENCE_COUNTERS['batched'] += 1
+                if not self.scheduler.is_scheduled(('presence', self.game_id)):
+                    self.scheduler.schedule_in(('presence', self.game_id), PRESENCE_DIGEST_INTERVAL, self.flush_presence_digest)
+                return True
 
+            PRESENCE_COUNTERS['emitted'] += 1
             self.socketio.emit('player_status_changed', {
                 'username': playerName,
                 'status': status
@@ -188,11 +639,28 @@ class Game:
             
         return False
 
+    def flush_presence_digest(self):
+        statuses = {player: status for player, status in self.pending_presence.items() if player in self.player_status}
+        self.pending_presence = {}
+        if not statuses:
+            return
+
+        PRESENCE_COUNTERS['emitted'] += 1
+        self.socketio.emit('player_status_digest', {
+            'statuses': statuses
+        }, room=self.game_id)
+
+    @logged
     def remove_player(self, playerName):
         isSpectator = playerName in self.spectators
         isPlayer = playerName in self.active_players
 
-        self.player_status.pop(playerName, None)
+        was_member = self.player_status.pop(playerName, None) is not None
+        self.viewer_revisions.pop(playerName, None)
+        self.viewer_private.pop(playerName, None)
+        self.mark_dirty()
+        if was_member and self.on_membership:
+            self.on_membership(self.game_id, playerName, False)
 
         if not isSpectator and not isPlayer:
             return False
@@ -204,6 +672,8 @@ class Game:
             self.active_players.remove(playerName)
             self.scores.pop(playerName, None)
             self.submitted_white_cards.pop(playerName, None)
+            for card in self.playerCards.pop(playerName, []):
+                self.white_deck.discard(card)
             
             if self.is_game_started(): # only if game started
                 if self.czar == playerName: # only player
@@ -234,14 +704,18 @@ class Game:
     def is_status_connected(self, playerName):
         return self.player_status.get(playerName) == 'connected'
 
+    @logged
     def start_game(self):
         if self.is_game_started():
             return False
         if len(self.active_players) < 3:
             return False
+        if self.missing_cards() is not None:
+            return False
 
         self.broadcast_event_to_game("sound_event", "game_start")
 
+        self.mark_dirty()
         self.state = 'choosing_cards'
         self.current_round = 0
         self.scores = {}
@@ -252,34 +726,62 @@ class Game:
         self.playerCards = {}
         self.winning_white_cards = {}
         self.scores = {player: 0 for player in self.active_players}
-        self.czarIndex = random.randint(0, len(self.active_players) - 1)
+        self.czarIndex = self.rng.randint(0, len(self.active_players) - 1)
         self.czar = self.active_players[self.czarIndex % len(self.active_players)]
-        self.currentTimerTotalSeconds = self.settings["timeToChooseWhiteCards"]
-        self.currentTimerSeconds = self.currentTimerTotalSeconds
-        self.current_black_card = random.choice(CARDS_QUESTIONS)
+        question_parts, answer_parts = self.deck_parts()
+        self.white_deck = Deck(answer_parts, self.rng)
+        self.black_deck = Deck(question_parts, self.rng)
+        self.current_black_card_id = None
+        self.draw_black_card()
         self.fill_player_hands()
+        self.start_phase_timer(self.settings["timeToChooseWhiteCards"])
 
         return True
 
+    def deck_parts(self):
+        """(question parts, answer parts) for new decks: the shared per-pack id arrays plus the id range of
+        this game's custom cards, nothing is copied"""
+        question_ids, answer_ids = pack_cards(self.settings["cardPacks"])
+        custom_cards = self.settings["customCards"]
+        return (question_ids + [range(CUSTOM_CARD_OFFSET, CUSTOM_CARD_OFFSET + len(custom_cards["questions"]))],
+                answer_ids + [range(CUSTOM_CARD_OFFSET, CUSTOM_CARD_OFFSET + len(custom_cards["answers"]))])
+
     def fill_player_hands(self):
         for player in self.active_players:
-            if player not in self.playerCards:
-                self.playerCards[player] = []
-            while len(self.playerCards[player]) < self.settings["maxWhiteCardsPerPlayer"]:
-                new_card = random.choice(CARDS_ANSWERS)
-                self.playerCards[player].append(new_card)
-
+            hand = self.playerCards.setdefault(player, [])
+            while len(hand) < self.settings["maxWhiteCardsPerPlayer"]:
+                try:
+                    hand.append(self.white_deck.draw())
+                except IndexError:
+                    break  # all cards are in players' hands, this player keeps a short (or empty) hand
+
+    def draw_black_card(self):
+        if self.current_black_card_id is not None:
+            self.black_deck.discard(self.current_black_card_id)
+        self.current_black_card_id = self.black_deck.draw()
+        self.current_black_card = self.question_card(self.current_black_card_id)
+
+    @logged
     def autosubmit_white_cards(self, ignoreConnection=False):
+        if self.paused or self.state != 'choosing_cards':
+            return  # submissions would be rejected, don't draw from the rng either (replays depend on it)
         for playerName in self.active_players:
             if playerName != self.czar and playerName not in self.submitted_white_cards:
                 if ignoreConnection or self.player_status.get(playerName, 'connected') != 'connected':    
-                    # choose random white card(s)
-                    num_cards_needed = self.current_black_card["num_blanks"]
-                    player_hand = self.playerCards[playerName]
-                    chosen_cards = random.sample(player_hand, num_cards_needed)
-                    chosen_indices = [player_hand.index(card) for card in chosen_cards]
-                    self.submit_white_cards(playerName, chosen_indices)
-
+                    # choose random white card(s), a short hand (exhausted deck) submits what it has
+                    player_hand = self.playerCards.get(playerName, [])
+                    num_cards = min(len(player_hand), self.current_black_card["num_blanks"])
+                    if num_cards == 0:
+                        continue
+                    try:
+                        chosen_cards = self.rng.sample(player_hand, num_cards)
+                        chosen_indices = [player_hand.index(card) for card in chosen_cards]
+                        self.submit_white_cards(playerName, chosen_indices)
+                    except Exception as e:
+                        # one broken hand must not stop the other submissions (and the phase transition)
+                        print(f"Automatische Abgabe für {playerName} fehlgeschlagen: {e!r}", flush=True)
+
+    @logged
     def submit_white_cards(self, playerName, white_cards_indicies):
         if self.paused:
             return False,"Spiel ist pausiert"
@@ -301,25 +803,30 @@ class Game:
                 return False,"Karte(n) nicht in deinem Blatt"
             submitting_cards.append(playerCards[card_indicies])
 
+        self.mark_dirty()
         self.submitted_white_cards[playerName] = submitting_cards
 
-        # remove white cards from player's hand
+        # remove white cards from player's hand, played cards go to the discard pile
         for submit_card in submitting_cards:
             playerCards.remove(submit_card)
+            self.white_deck.discard(submit_card)
 
         # if everyone has submitted, move to choosing_winner
         if len(self.submitted_white_cards) >= len(self.active_players) - 1:
-            self.state = 'choosing_winner'
-            self.currentTimerTotalSeconds = self.settings["timeToChooseWinner"]
-            self.currentTimerSeconds = self.currentTimerTotalSeconds
-
-            # Bestimmte universelle Spieler reinfolge für die anzeige der eingesendeten Karten
-            self.player_mapping = list(self.submitted_white_cards.keys())
-            random.shuffle(self.player_mapping)
+            self.start_choosing_winner()
 
         return True,"Erfiolgreich abgegeben"
 
+    def start_choosing_winner(self):
+        self.state = 'choosing_winner'
+
+        # Bestimmte universelle Spieler reinfolge für die anzeige der eingesendeten Karten
+        self.player_mapping = list(self.submitted_white_cards.keys())
+        self.rng.shuffle(self.player_mapping)
+        self.start_phase_timer(self.settings["timeToChooseWinner"])
+
     def finalize_winner_choice(self):
+        self.mark_dirty()
         winning_cards = self.submitted_white_cards[self.current_czar_selected_player]
 
         winning_reaction_points = 0
@@ -334,15 +841,22 @@ class Game:
             'reaction_points': winning_reaction_points
         }
         self.scores[self.current_czar_selected_player] += 1
-        self.history.append({
+        history_entry = {
             'round': self.current_round,
-            'black_card': self.current_black_card,
+            'black_card': self.current_black_card_id,
             'submitted_cards': self.submitted_white_cards,
             'playerName': self.current_czar_selected_player,
             'winning_cards': winning_cards,
             'reaction_points': winning_reaction_points,
             'czar': self.choosing_playerName # can be None if auto-chosen
-        })
+        }
+        self.history.append(history_entry)
+
+        # clients append the finished round to their local history
+        self.socketio.emit('round_finished', {
+            'index': len(self.history) - 1,
+            'entry': history_entry
+        }, room=self.game_id)
 
         self.current_czar_selected_player = None
         self.choosing_playerName = None
@@ -351,10 +865,10 @@ class Game:
         self.current_reactions = {}
 
         self.state = 'countdown_next_round'
-        self.currentTimerTotalSeconds = self.settings["timeAfterWinnerChosen"]
-        self.currentTimerSeconds = self.currentTimerTotalSeconds
+        self.start_phase_timer(self.settings["timeAfterWinnerChosen"])
 
 
+    @logged
     def choose_winner(self, winner_playerName, choosing_playerName=None):
         if self.paused:
             return False,"Spiel ist pausiert"
@@ -365,14 +879,14 @@ class Game:
         if winner_playerName not in self.submitted_white_cards:
             return False,"Ungültiger Gewinner"
 
+        self.mark_dirty()
         self.current_czar_selected_player = winner_playerName
         self.choosing_playerName = choosing_playerName
 
         if not self.winner_choosen:
             self.winner_choosen = True
             self.broadcast_event_to_game("sound_event", "round_end_tick")
-            self.currentTimerTotalSeconds = 10
-            self.currentTimerSeconds = 10
+            self.start_phase_timer(10)
 
         if(self.choosing_playerName is None):
             # auto-chosen winner
@@ -389,6 +903,7 @@ class Game:
             return not self.is_status_connected(playerName)
 
 
+    @logged
     def next_round(self):
         if self.state != 'countdown_next_round':
             return False,"Falsche Spielphase"
@@ -412,35 +927,41 @@ class Game:
 
         self.broadcast_event_to_game("sound_event", "round_start")
 
+        self.mark_dirty()
         self.current_round += 1
         self.submitted_white_cards = {}
         self.winning_white_cards = {}
         self.player_mapping = []
         self.czarIndex = (self.czarIndex + 1) % len(self.active_players)
         self.czar = self.active_players[self.czarIndex % len(self.active_players)]
-        self.current_black_card = random.choice(CARDS_QUESTIONS)
+        self.draw_black_card()
         self.fill_player_hands()
         self.state = 'choosing_cards'
-        self.currentTimerTotalSeconds = self.settings["timeToChooseWhiteCards"]
-        self.currentTimerSeconds = self.currentTimerTotalSeconds
+        self.start_phase_timer(self.settings["timeToChooseWhiteCards"])
         return True,"Neue Runde gestartet"
 
+    @logged
     def end_game(self):
         self.broadcast_event_to_game("sound_event", "game_finished")
+        self.mark_dirty()
         self.state = 'game_ended'
+        self.stop_timer()
         self.currentTimerTotalSeconds = -1
         self.currentTimerSeconds = -1
+        self.paused_remaining = None
         self.czar = None
         self.czarIndex = 0
         self.current_czar_selected_player = None   
         self.choosing_playerName = None
         self.playerCards = {}
         self.current_black_card = {}
+        self.current_black_card_id = None
         self.winning_white_cards = {}
         self.submitted_white_cards = {}
         self.player_mapping = []
         self.resetted_to_lobby = []
 
+    @logged
     def user_return_to_lobby(self, playerName):
         if self.state != 'game_ended':
             return False, "Das Spiel ist noch nicht beendet"
@@ -450,32 +971,39 @@ class Game:
             return False, "Du bist bereits zur Lobby zurückgekehrt"
 
         self.resetted_to_lobby.append(playerName)
+        self.mark_dirty()
 
         if len(self.resetted_to_lobby) >= len(self.active_players) + len(self.spectators):
             self.reset_to_lobby()
 
         return True, "Zurück zur Lobby"
 
+    @logged
     def reset_to_lobby(self):
+        self.mark_dirty()
         self.resetted_to_lobby = []
         self.state = 'lobby'
         self.current_round = 0
         self.playerCards = {}
         self.current_black_card = {}
+        self.current_black_card_id = None
         self.winning_white_cards = {}
         self.submitted_white_cards = {}
         self.player_mapping = []
         self.scores = {}
         self.czarIndex = 0
         self.czar = None
+        self.stop_timer()
         self.currentTimerTotalSeconds = 0
         self.currentTimerSeconds = 0
         self.paused = False
+        self.paused_remaining = None
         self.winner_choosen = False
         self.current_czar_selected_player = None   
         self.choosing_playerName = None
     
 
+    @logged
     def submit_reaction(self, username, to_player_index, points):
         if self.state != 'choosing_winner':
             return False, "Reaktionen können nur während der Czar-Wahl-Phase abgegeben werden"
@@ -0,0 +1,257 @@
+"""Ereignisprotokoll der Spiele und Replayer.
+
+Jeder angenommene Befehl an ein Spiel (Game-Methoden mit @logged, z.B.
+submit_white_cards, choose_winner, timer_expired) wird als kompaktes Tupel
+(t, revision, befehl, args[, kwargs]) festgehalten: t sind die Sekunden seit
+Beginn des Protokolls, revision der Stand des Spiels nach dem Befehl. Da alle
+Zufallsentscheidungen über Game.rng mit bekanntem Seed laufen, ist der Ablauf
+damit vollständig bestimmt: replay() baut das Spiel ohne Server und Clients
+aus dem Protokoll neu auf und prüft nach jedem Ereignis die Revision.
+
+Ein Protokoll beginnt mit einem Kopf: für neue Spiele die Parameter von
+Game(...), für wiederhergestellte Spiele ein Snapshot (Game.to_snapshot),
+ab dem mit einem neuen Seed weitergespielt wird.
+
+Mit EVENT_LOG_DIR schreibt app.py das Protokoll jedes Spiels nach
+EVENT_LOG_DIR/<game_id>.log (pickle-Datensätze; nach einem Neustart beginnt
+ein neuer Abschnitt in derselben Datei). Kodiert wird im Event-Loop,
+geschrieben von einem gemeinsamen Thread (LogWriter), der die anstehenden
+Datensätze pro Datei sammelt und sie jeweils mit einem Öffnen, Anhängen und
+Schließen schreibt; kein Spiel hält also eine Datei offen. Ohne Datei bleiben
+die Ereignisse in EventLog.events (Tests, Benchmarks).
+
+Aufruf: python gamelog.py replay DATEI [--repeat N] [--verbose]
+"""
+import argparse
+import os
+import pickle
+import queue
+import random
+import threading
+import time
+
+from game import Game
+from scheduler import DeadlineScheduler
+
+EVENT_LOG_DIR = os.environ.get('EVENT_LOG_DIR', '')  # leer = keine Protokolldateien
+
+
+class LogWriter:
+    """Schreib-Thread für alle Protokolldateien; write() reiht einen kodierten Datensatz ein und kehrt sofort zurück"""
+
+    def __init__(self):
+        self.queue = queue.Queue()  # (Pfad, Datensatz), None beendet den Thread
+        self.thread = threading.Thread(target=self._write_loop, name='gamelog', daemon=True)
+        self.thread.start()
+
+    def write(self, path, data):
+        self.queue.put((path, data))
+
+    def _write_loop(self):
+        while True:
+            items = [self.queue.get()]
+            # alles, was inzwischen angefallen ist, mit einem open/write/close pro Datei schreiben
+            while True:
+                try:
+                    items.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            batches = {}
+            for item in items:
+                if item is not None:
+                    batches.setdefault(item[0], []).append(item[1])
+            for path, records in batches.items():
+                try:
+                    with open(path, 'ab') as f:
+                        f.write(b''.join(records))
+                except OSError as e:
+                    print(f"Fehler beim Schreiben des Protokolls {path}: {e}", flush=True)
+            for _ in items:
+                self.queue.task_done()
+            if None in items:
+                return
+
+    def flush(self):
+        """Wartet, bis alle eingereihten Datensätze geschrieben sind"""
+        self.queue.join()
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+
+
+_writer = None  # LogWriter, beim ersten Protokoll mit Datei gestartet
+
+
+def writer():
+    global _writer
+    if _writer is None:
+        _writer = LogWriter()
+    return _writer
+
+
+def flush():
+    """Wartet, bis alle Protokolldateien geschrieben sind (z.B. vor dem Beenden)"""
+    if _writer is not None:
+        _writer.flush()
+
+
+class EventLog:
+    """Protokoll eines Spiels ab header; mit path werden die Datensätze an die Datei angehängt, sonst in events gesammelt"""
+
+    def __init__(self, header, epoch, path=None):
+        self.header = header
+        self.epoch = epoch  # Game.clock() beim Beginn des Protokolls
+        self.events = []
+        self.path = path
+        if self.path is not None:
+            self._write(('header', header))
+
+    def record(self, now, revision, command, args, kwargs):
+        t = round(now - self.epoch, 3)
+        event = (t, revision, command, args, kwargs) if kwargs else (t, revision, command, args)
+        if self.path is not None:
+            self._write(event)
+        else:
+            self.events.append(event)
+
+    def _write(self, record):
+        # sofort kodieren, die Argumente können sich danach noch ändern
+        writer().write(self.path, pickle.dumps(record, pickle.HIGHEST_PROTOCOL))
+
+    def close(self):
+        """Beendet das Protokoll; schon eingereihte Datensätze schreibt der LogWriter noch"""
+        self.path = None
+
+
+def log_path(game_id):
+    """Protokolldatei eines Spiels, None ohne EVENT_LOG_DIR"""
+    return os.path.join(EVENT_LOG_DIR, f"{game_id}.log") if EVENT_LOG_DIR else None
+
+
+def start_log(game, path=None):
+    """Beginnt das Protokoll von game und gibt es zurück.
+
+    Neue Spiele (Revision 0) bekommen die Parameter von Game(...) als Kopf, alle anderen einen Snapshot;
+    dabei wird neu geseedet, denn der Zustand von Game.rng ist nicht im Snapshot.
+    """
+    if game.revision == 0:
+        header = {
+            'game_id': game.game_id,
+            'seed': game.seed,
+            'owner': game.owner,
+            'name': game.settings["gameName"],
+            'public': game.settings["publicVisible"],
+            'password': game.settings["password"]
+        }
+    else:
+        game.seed = random.randrange(2 ** 32)
+        game.rng.seed(game.seed)
+        header = {
+            'game_id': game.game_id,
+            'seed': game.seed,
+            'snapshot': pickle.loads(pickle.dumps(game.to_snapshot(), pickle.HIGHEST_PROTOCOL)),
+            'player_status': dict(game.player_status)
+        }
+    game.event_log = EventLog(header, game.clock(), path)
+    return game.event_log
+
+
+def load(path):
+    """Abschnitte einer Protokolldatei -> [(Kopf, [Ereignis])]; ein abgeschnittener letzter Datensatz wird ignoriert"""
+    segments = []
+    with open(path, 'rb') as f:
+        while True:
+            try:
+                record = pickle.load(f)
+            except EOFError:
+                break
+            except pickle.UnpicklingError as e:
+                print(f"{path}: Protokoll nach {sum(len(events) for _, events in segments)} Ereignissen nicht lesbar: {e}", flush=True)
+                break
+            if record[0] == 'header':
+                segments.append((record[1], []))
+            elif segments:
+                segments[-1][1].append(record)
+    return segments
+
+
+class ReplayClock:
+    """Uhr des Replays, steht jeweils auf der Zeit des aktuellen Ereignisses"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class NullSocketIO:
+    """Socket.IO-Ersatz für den Replay, alle Nachrichten werden verworfen"""
+
+    def emit(self, *args, **kwargs):
+        pass
+
+
+class ReplayPlayers(dict):
+    """global_player_data für den Replay: niemand ist verbunden, Nachrichten an einzelne Spieler gehen ins Leere"""
+
+    def __missing__(self, player):
+        return {'sid': None}
+
+
+def replay(header, events):
+    """Baut ein Spiel aus Kopf und Ereignissen neu auf -> Game; ValueError, sobald es vom Protokoll abweicht"""
+    clock = ReplayClock()
+    scheduler = DeadlineScheduler(clock)  # wird nie abgearbeitet, Timer-Abläufe stehen als Ereignisse im Protokoll
+    socketio = NullSocketIO()
+    if 'snapshot' in header:
+        snapshot = pickle.loads(pickle.dumps(header['snapshot'], pickle.HIGHEST_PROTOCOL))  # das Spiel übernimmt die Container
+        game = Game.from_snapshot(socketio, ReplayPlayers(), snapshot, scheduler=scheduler, seed=header['seed'])
+        game.player_status = dict(header['player_status'])
+        game.revision = header['snapshot']['revision']
+    else:
+        game = Game(socketio, ReplayPlayers(), header['owner'], header['name'], header['public'], header['password'],
+                    scheduler=scheduler, game_id=header['game_id'], seed=header['seed'])
+
+    for index, event in enumerate(events):
+        clock.now = event[0]
+        command = event[2]
+        try:
+            getattr(game, command)(*event[3], **(event[4] if len(event) > 4 else {}))
+        except Exception as e:
+            # der Befehl ist schon im Original abgebrochen, ob der Stand trotzdem stimmt, zeigt die Revision
+            print(f"Ereignis {index} ({command}): {e!r}", flush=True)
+        if game.revision != event[1]:
+            raise ValueError(f"Ereignis {index} ({command}): Revision {game.revision} statt {event[1]}")
+    return game
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Spiele aus einem Ereignisprotokoll (EVENT_LOG_DIR) nachspielen")
+    parser.add_argument('command', choices=['replay'])
+    parser.add_argument('path')
+    parser.add_argument('--repeat', type=int, default=1, help="Replay wiederholen, für die Messung des Durchsatzes")
+    parser.add_argument('--verbose', action='store_true', help="jedes Ereignis ausgeben")
+    args = parser.parse_args()
+
+    for number, (header, events) in enumerate(load(args.path)):
+        kind = "Snapshot" if 'snapshot' in header else "neues Spiel"
+        print(f"Abschnitt {number} ({kind}, Seed {header['seed']}): {len(events)} Ereignisse")
+        if args.verbose:
+            for event in events:
+                print(f"  {event[0]:>9.3f}s r{event[1]:<5} {event[2]}{event[3]}{event[4] if len(event) > 4 else ''}")
+        try:
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                game = replay(header, events)
+            elapsed = time.perf_counter() - start
+        except ValueError as e:
+            print(f"  Abweichung: {e}")
+            continue
+        print(f"  Ergebnis: state={game.state}, Runde {game.current_round}, Punkte {game.scores}")
+        print(f"  {len(events) * args.repeat / elapsed:.0f} Ereignisse/s ({elapsed * 1000 / args.repeat:.2f} ms pro Replay)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,251 @@
+"""Import von Kartensätzen aus CSV oder JSON Lines.
+
+Die Datei wird zeilenweise gelesen, jede Karte geprüft (ingest.validate_card)
+und gegen alle vorhandenen Karten dedupliziert. Angenommene Karten werden als
+neue Segmente an die Kartendatenbank angehängt, ohne sie neu zu erstellen, und
+zusätzlich in packs/<id>.jsonl gespeichert und in packs.json eingetragen,
+damit ein späteres `carddb.py build` denselben Stand erzeugt.
+
+Formate (UTF-8):
+
+    CSV         Kopfzeile type,text[,num_blanks]
+    JSON Lines  {"type": "question", "text": "...", "num_blanks": 1} bzw.
+                {"type": "answer", "text": "..."}
+
+type ist question/frage/q oder answer/antwort/a, num_blanks ist optional.
+
+Aufruf: python importer.py DATEI --pack ID [--name NAME] [--description TEXT] [--tag TAG ...]
+"""
+import csv
+import json
+import os
+import re
+
+import carddb
+from ingest import validate_card, duplicate_key
+
+PACK_ID_PATTERN = re.compile(r'^[a-z0-9][a-z0-9_-]{0,31}$')
+CARD_TYPES = {
+    'question': True, 'frage': True, 'q': True,
+    'answer': False, 'antwort': False, 'a': False,
+}
+MAX_REPORTED_ERRORS = 50  # der Bericht bleibt auch bei vielen fehlerhaften Zeilen klein
+
+
+def detect_format(filename):
+    return 'csv' if filename.lower().endswith('.csv') else 'jsonl'
+
+
+def read_rows(stream, fmt):
+    """Liest Zeilen aus einem Textstream: (Zeilennummer, dict mit type/text/num_blanks oder Fehlermeldung)"""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        if not reader.fieldnames or not {'type', 'text'} <= set(reader.fieldnames):
+            yield 1, "CSV-Kopfzeile muss type und text enthalten"
+            return
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for line_number, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                yield line_number, "Kein gültiges JSON"
+                continue
+            yield line_number, row if isinstance(row, dict) else "Zeile ist kein JSON-Objekt"
+
+
+def parse_card(row):
+    """(True, (ist_Frage, Text, num_blanks)) oder (False, Grund)"""
+    if isinstance(row, str):
+        return False, row
+    card_type = str(row.get('type') or '').strip().lower()
+    if card_type not in CARD_TYPES:
+        return False, f"Unbekannter Typ {card_type!r}"
+    is_question = CARD_TYPES[card_type]
+    success, result = validate_card(is_question, row.get('text'), row.get('num_blanks'))
+    if not success:
+        return False, result
+    text, num_blanks = result
+    return True, (is_question, text, num_blanks)
+
+
+class ImportReport:
+    def __init__(self, pack_id):
+        self.pack_id = pack_id
+        self.imported = {'questions': 0, 'answers': 0}
+        self.duplicates = 0
+        self.near_duplicates = 0
+        self.invalid = 0
+        self.errors = []  # (Zeile, Grund), höchstens MAX_REPORTED_ERRORS
+
+    def reject(self, line_number, reason):
+        self.invalid += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line_number, reason))
+
+    def summary(self):
+        return (f"Kartensatz {self.pack_id}: {self.imported['questions']} Fragen, {self.imported['answers']} Antworten importiert; "
+                f"{self.duplicates} doppelt, {self.near_duplicates} fast doppelt, {self.invalid} ungültig")
+
+    def to_dict(self):
+        return {
+            'pack': self.pack_id,
+            'imported': self.imported,
+            'duplicates': self.duplicates,
+            'near_duplicates': self.near_duplicates,
+            'invalid': self.invalid,
+            'errors': [{'line': line, 'message': message} for line, message in self.errors],
+        }
+
+
+def _existing_keys(db):
+    """Vergleichsschlüssel aller Karten: {ist_Frage: {hash(Schlüssel): hash(Text)}}.
+
+    Es werden nur Hashes gehalten, nicht die Texte (Kollisionen sind bei 64 Bit vernachlässigbar).
+    """
+    seen = {True: {}, False: {}}
+    for segment in db.segments:
+        keys = seen[segment.kind == carddb.KIND_QUESTION]
+        for index in range(segment.count):
+            text = segment.card_text(index)
+            keys.setdefault(hash(duplicate_key(text)), hash(text))
+    return seen
+
+
+def _write_manifest(path, manifest):
+    import tempfile
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.packs-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=4)
+            f.write('\n')
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def import_cards(rows, pack_id, name=None, description=None, tags=None,
+                 db_path=carddb.DEFAULT_PATH, manifest_path=carddb.MANIFEST_PATH):
+    """Importiert rows (aus read_rows) in den Kartensatz pack_id: (True, ImportReport) oder (False, Fehlermeldung).
+
+    Neue Sätze werden angelegt, importierte Sätze können erweitert werden, Sätze aus Python-Quellen nicht.
+    Während des Imports ist die Datenbank exklusiv gesperrt (flock), parallele Importe warten.
+    """
+    import fcntl
+    import shutil
+    import tempfile
+
+    if not isinstance(pack_id, str) or not PACK_ID_PATTERN.match(pack_id):
+        return False, "Ungültige Kartensatz-ID (a-z, 0-9, - und _, höchstens 32 Zeichen)"
+
+    with open(db_path, 'r+b') as db_file:
+        fcntl.flock(db_file, fcntl.LOCK_EX)
+        manifest = carddb.read_manifest(manifest_path)
+        entry = next((meta for meta in manifest if meta['id'] == pack_id), None)
+        if entry is not None and not entry.get('cards'):
+            return False, f"Kartensatz {pack_id} stammt aus Python-Quellen und kann nicht erweitert werden"
+
+        seen = _existing_keys(carddb.CardDatabase(db_path))
+        report = ImportReport(pack_id)
+        writers = {True: carddb.SegmentWriter(carddb.KIND_QUESTION, pack_id),
+                   False: carddb.SegmentWriter(carddb.KIND_ANSWER, pack_id)}
+        sources_directory = os.path.join(os.path.dirname(os.path.abspath(manifest_path)), 'packs')
+        os.makedirs(sources_directory, exist_ok=True)
+        source = tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=sources_directory,
+                                             prefix=f'.{pack_id}-', suffix='.tmp', delete=False)
+        try:
+            with source:
+                for line_number, row in rows:
+                    success, card = parse_card(row)
+                    if not success:
+                        report.reject(line_number, card)
+                        continue
+                    is_question, text, num_blanks = card
+                    keys = seen[is_question]
+                    key = hash(duplicate_key(text))
+                    if key in keys:
+                        if keys[key] == hash(text):
+                            report.duplicates += 1
+                        else:
+                            report.near_duplicates += 1
+                        continue
+                    keys[key] = hash(text)
+                    writers[is_question].add(text, num_blanks)
+                    report.imported['questions' if is_question else 'answers'] += 1
+                    card = {'type': 'question', 'text': text, 'num_blanks': num_blanks} if is_question else {'type': 'answer', 'text': text}
+                    source.write(json.dumps(card, ensure_ascii=False) + '\n')
+
+            if not writers[True].count and not writers[False].count:
+                return True, report
+
+            # erst die Quellen, dann die Datenbank: so ist cards.db danach nicht älter als die Quellen
+            if entry is None:
+                entry = {'id': pack_id, 'name': pack_id, 'description': '', 'tags': [], 'default': False,
+                         'cards': f'packs/{pack_id}.jsonl'}
+                manifest.append(entry)
+            if name:
+                entry['name'] = name
+            if description is not None:
+                entry['description'] = description
+            if tags is not None:
+                entry['tags'] = list(tags)
+            with open(source.name, 'rb') as new_cards, open(os.path.join(sources_directory, f'{pack_id}.jsonl'), 'ab') as cards_file:
+                shutil.copyfileobj(new_cards, cards_file)
+            _write_manifest(manifest_path, manifest)
+            carddb.append_segments(db_file, [carddb.pack_metadata(entry)],
+                                   [writer for writer in writers.values() if writer.count])
+            return True, report
+        finally:
+            os.unlink(source.name)
+            for writer in writers.values():
+                writer.close()
+
+
+def import_file(path, fmt, pack_id, name=None, description=None, tags=None,
+                db_path=carddb.DEFAULT_PATH, manifest_path=carddb.MANIFEST_PATH):
+    """Importiert die Datei path zeilenweise wie import_cards; ist sie nicht UTF-8 kodiert, wird nichts übernommen"""
+    try:
+        with open(path, encoding='utf-8', newline='') as stream:
+            return import_cards(read_rows(stream, fmt), pack_id, name, description, tags, db_path, manifest_path)
+    except UnicodeDecodeError:
+        return False, "Datei ist nicht UTF-8 kodiert"
+
+
+def main():
+    import argparse
+    import sys
+    parser = argparse.ArgumentParser(description="Kartensatz aus CSV oder JSON Lines importieren")
+    parser.add_argument('file', help="CSV- oder JSON-Lines-Datei, - für stdin")
+    parser.add_argument('--pack', required=True, help="ID des Kartensatzes (neu oder bereits importiert)")
+    parser.add_argument('--name')
+    parser.add_argument('--description')
+    parser.add_argument('--tag', action='append', dest='tags')
+    parser.add_argument('--format', choices=('csv', 'jsonl'))
+    parser.add_argument('--db', default=os.environ.get('CARD_DB_PATH', carddb.DEFAULT_PATH))
+    args = parser.parse_args()
+
+    if not carddb.is_current(args.db):
+        carddb.build_from_sources(args.db)
+    fmt = args.format or detect_format(args.file)
+    if args.file == '-':
+        stream = open(sys.stdin.fileno(), encoding='utf-8', newline='', closefd=False)
+    else:
+        stream = open(args.file, encoding='utf-8', newline='')
+    with stream:
+        success, result = import_cards(read_rows(stream, fmt), args.pack, args.name, args.description, args.tags, args.db)
+    if not success:
+        print(result, file=sys.stderr)
+        sys.exit(1)
+    print(result.summary())
+    for line_number, message in result.errors:
+        print(f"Zeile {line_number}: {message}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""Aufbereitung der Kartenquellen vor dem Kompilieren der Kartendatenbank.
+
+Die Quelldateien werden von Hand gepflegt und enthalten doppelte Karten,
+uneinheitliche Leerzeichen und von Hand gezählte Lücken. Jede Karte wird daher
+normalisiert (Unicode NFC, Leerzeichen), doppelte und fast doppelte Karten
+(Unterschied nur in Groß-/Kleinschreibung, Satzzeichen oder Leerzeichen) werden
+entfernt, num_blanks wird aus den Lücken `_____` im Text abgeleitet. Alles, was
+dabei geändert wurde, landet im IngestReport.
+"""
+import re
+import unicodedata
+
+BLANK_PATTERN = re.compile(r'_{2,}')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+MAX_TEXT_LENGTH = 500  # Zeichen pro Karte (längste Standardkarte: gut 400)
+MAX_BLANKS = 5         # Lücken pro Frage; zugleich die kleinste Hand (game.SETTING_LIMITS), jede Frage ist beantwortbar
+
+
+def normalize_text(text):
+    """Unicode NFC, Leerzeichen am Rand entfernt und mehrfache Leerzeichen zusammengefasst"""
+    return WHITESPACE_PATTERN.sub(' ', unicodedata.normalize('NFC', text)).strip()
+
+
+class _PunctuationTable(dict):
+    """Tabelle für str.translate: Satzzeichen (außer _ der Lücken) werden zu Leerzeichen, wird bei Bedarf gefüllt"""
+
+    def __missing__(self, codepoint):
+        char = chr(codepoint)
+        self[codepoint] = value = ' ' if unicodedata.category(char).startswith('P') and char != '_' else codepoint
+        return value
+
+
+_punctuation_to_space = _PunctuationTable()
+
+
+def duplicate_key(text):
+    """Vergleichsschlüssel für fast doppelte Karten: ohne Groß-/Kleinschreibung, Satzzeichen und Leerzeichen-Unterschiede"""
+    text = unicodedata.normalize('NFKC', text).casefold().translate(_punctuation_to_space)
+    return ' '.join(text.split())
+
+
+def count_blanks(text):
+    """Anzahl der Antwortkarten für eine Frage; ohne Lücke wird die Frage mit einer Karte beantwortet"""
+    return max(1, len(BLANK_PATTERN.findall(text)))
+
+
+def validate_card(is_question, text, num_blanks=None):
+    """Prüft eine importierte Karte: (True, (Text, num_blanks)) bzw. (False, Grund).
+
+    num_blanks muss zu den Lücken im Text passen (so viele Karten verlangt das Spiel
+    beim Abgeben), fehlt die Angabe, wird sie abgeleitet. Antworten haben num_blanks None.
+    """
+    if not isinstance(text, str):
+        return False, "Text fehlt"
+    text = normalize_text(text)
+    if not text:
+        return False, "Leerer Text"
+    if len(text) > MAX_TEXT_LENGTH:
+        return False, f"Text länger als {MAX_TEXT_LENGTH} Zeichen"
+    if not is_question:
+        return True, (text, None)
+
+    counted = count_blanks(text)
+    if num_blanks not in (None, ''):
+        try:
+            num_blanks = int(num_blanks)
+        except (TypeError, ValueError):
+            return False, f"Ungültige Lückenzahl {num_blanks!r}"
+        if num_blanks != counted:
+            return False, f"num_blanks {num_blanks} passt nicht zu {counted} Lücke(n) im Text"
+    if counted > MAX_BLANKS:
+        return False, f"Mehr als {MAX_BLANKS} Lücken"
+    return True, (text, counted)
+
+
+class IngestReport:
+    def __init__(self):
+        self.normalized = []      # (Satz, Original, normalisiert)
+        self.empty = []           # (Satz, Art)
+        self.duplicates = []      # (Satz, Text) exakt doppelt nach Normalisierung
+        self.near_duplicates = [] # (Satz, entfernt, behalten)
+        self.blanks_fixed = []    # (Satz, Text, angegeben, gezählt)
+        self.kept = {'questions': 0, 'answers': 0}
+
+    @property
+    def removed(self):
+        return len(self.empty) + len(self.duplicates) + len(self.near_duplicates)
+
+    def summary(self):
+        return (f"{self.kept['questions']} Fragen, {self.kept['answers']} Antworten übernommen; "
+                f"entfernt: {len(self.duplicates)} doppelt, {len(self.near_duplicates)} fast doppelt, {len(self.empty)} leer; "
+                f"{len(self.normalized)} normalisiert, {len(self.blanks_fixed)} Lückenzahlen korrigiert")
+
+    def lines(self):
+        """Ausführlicher Bericht, eine Zeile pro Änderung"""
+        yield self.summary()
+        for pack, kind in self.empty:
+            yield f"[{pack}] leere {kind} entfernt"
+        for pack, text in self.duplicates:
+            yield f"[{pack}] doppelt entfernt: {text!r}"
+        for pack, dropped, kept in self.near_duplicates:
+            yield f"[{pack}] fast doppelt entfernt: {dropped!r} (behalten: {kept!r})"
+        for pack, text, given, counted in self.blanks_fixed:
+            yield f"[{pack}] num_blanks {given} -> {counted}: {text!r}"
+        for pack, original, normalized in self.normalized:
+            yield f"[{pack}] normalisiert: {original!r} -> {normalized!r}"
+
+
+class DeckCleaner:
+    """Bereinigt die Karten aller Sätze; doppelte Karten werden auch über Satzgrenzen hinweg erkannt, die erste gewinnt"""
+
+    def __init__(self, report=None):
+        self.report = report if report is not None else IngestReport()
+        self._seen = {'questions': {}, 'answers': {}}  # Art: {Vergleichsschlüssel: behaltener Text}
+
+    def _accept(self, pack_id, kind, raw_text):
+        text = normalize_text(raw_text)
+        if text != raw_text:
+            self.report.normalized.append((pack_id, raw_text, text))
+        if not text:
+            self.report.empty.append((pack_id, 'Frage' if kind == 'questions' else 'Antwort'))
+            return None
+
+        seen = self._seen[kind]
+        key = duplicate_key(text)
+        if key in seen:
+            if seen[key] == text:
+                self.report.duplicates.append((pack_id, text))
+            else:
+                self.report.near_duplicates.append((pack_id, text, seen[key]))
+            return None
+        seen[key] = text
+        self.report.kept[kind] += 1
+        return text
+
+    def questions(self, pack_id, cards):
+        """[{"card_text", "num_blanks"}] -> [(Text, num_blanks)]"""
+        result = []
+        for card in cards:
+            text = self._accept(pack_id, 'questions', card['card_text'])
+            if text is None:
+                continue
+            num_blanks = count_blanks(text)
+            if card.get('num_blanks') != num_blanks:
+                self.report.blanks_fixed.append((pack_id, text, card.get('num_blanks'), num_blanks))
+            result.append((text, num_blanks))
+        return result
+
+    def answers(self, pack_id, cards):
+        return [text for text in (self._accept(pack_id, 'answers', card) for card in cards) if text is not None]
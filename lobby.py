@@ -0,0 +1,188 @@
+"""Index der öffentlich gelisteten Spiele für die Lobby.
+
+Spiele melden Änderungen über mark_changed() (siehe Game.on_change), refresh()
+wertet nur diese Spiele neu aus und liefert die Lobby-Deltas
+(lobby_game_added, lobby_game_updated, lobby_game_removed). Die Kosten pro
+Änderung hängen damit nicht von der Anzahl aller Spiele ab.
+
+Für query() werden die Einträge zusätzlich nach jedem Sortierschlüssel in
+sortierten Listen gehalten (bisect), eine Seite kostet damit O(log n) plus
+Seitengröße (plus durch Filter übersprungene Einträge).
+"""
+from bisect import bisect_left, insort
+
+QUERY_PAGE_LIMIT = 50  # max. Spiele pro query_public_games Seite
+
+# Sortierschlüssel, die game_id am Ende macht die Schlüssel eindeutig
+SORT_KEYS = {
+    'created': lambda entry: (entry['created'], entry['id']),
+    'name': lambda entry: (entry['name'].casefold(), entry['id']),
+    'fill': lambda entry: (entry['players'] / max(1, entry['max_players']), entry['created'], entry['id']),
+}
+
+
+def public_game_entry(game, pending=False):
+    return {
+        'id': game.game_id,
+        'is_pending': pending,
+        'name': game.settings["gameName"],
+        'players': len(game.active_players),
+        'max_players': game.settings["maxPlayers"],
+        'has_password': bool(game.settings["password"]),
+        'started': game.is_game_started(),
+        'created': game.created_at
+    }
+
+
+def is_publicly_listed(game):
+    if game.is_game_started():
+        return game.settings["publicVisibleDuringGame"]
+    return game.settings["publicVisible"]
+
+
+class PublicGameIndex:
+    def __init__(self, games):
+        self.games = games      # game_id: Game, alle Spiele des Servers
+        self.entries = {}       # game_id: Lobby-Eintrag, so wie er zuletzt an die Lobby gesendet wurde
+        self.changed = set()    # game_ids, die seit dem letzten refresh() geändert wurden
+        self.sorted = {sort: [] for sort in SORT_KEYS}  # sort: sortierte Liste der Schlüssel aller Einträge
+
+    def __len__(self):
+        return len(self.entries)
+
+    def mark_changed(self, game_id):
+        self.changed.add(game_id)
+
+    def has_changes(self):
+        return bool(self.changed)
+
+    def refresh(self):
+        """Übernimmt die vorgemerkten Änderungen und gibt die Lobby-Deltas als [(event, data)] zurück"""
+        events = []
+        for game_id in self.changed:
+            game = self.games.get(game_id)
+            entry, keys = None, None
+            if game is not None and is_publicly_listed(game):
+                try:
+                    entry = public_game_entry(game)
+                    keys = self._keys(entry)
+                except Exception as e:
+                    # ungültiger Eintrag: das Spiel wird nicht gelistet, die Listen bleiben konsistent
+                    print(f"Lobby-Eintrag für Spiel {game_id} ungültig: {e!r}", flush=True)
+                    entry = None
+            old_entry = self.entries.get(game_id)
+
+            if entry is None:
+                if old_entry is not None:
+                    self._unindex(old_entry)
+                    del self.entries[game_id]
+                    events.append(('lobby_game_removed', {'id': game_id}))
+            elif old_entry is None:
+                self.entries[game_id] = entry
+                self._insert(keys)
+                events.append(('lobby_game_added', {'game': entry}))
+            elif old_entry != entry:
+                self._unindex(old_entry)
+                self.entries[game_id] = entry
+                self._insert(keys)
+                events.append(('lobby_game_updated', {'game': entry}))
+
+        self.changed.clear()
+        return events
+
+    def apply(self, events):
+        """Übernimmt die Lobby-Deltas eines anderen Workers (dessen Spiele nicht in self.games liegen)"""
+        for event, data in events:
+            if event == 'lobby_game_removed':
+                self._remove(data['id'])
+            else:
+                entry = data['game']
+                try:
+                    keys = self._keys(entry)
+                except Exception as e:
+                    print(f"Lobby-Eintrag für Spiel {entry.get('id')} eines anderen Workers ungültig: {e!r}", flush=True)
+                    continue
+                self._remove(entry['id'])
+                self.entries[entry['id']] = entry
+                self._insert(keys)
+
+    def remove_where(self, predicate):
+        """Entfernt alle Einträge, für die predicate(entry) gilt, und gibt ihre game_ids zurück"""
+        removed = [game_id for game_id, entry in self.entries.items() if predicate(entry)]
+        for game_id in removed:
+            self._remove(game_id)
+        return removed
+
+    def _remove(self, game_id):
+        entry = self.entries.pop(game_id, None)
+        if entry is not None:
+            self._unindex(entry)
+
+    def list(self):
+        """Alle gelisteten Spiele in der Reihenfolge, in der sie hinzugekommen sind"""
+        return list(self.entries.values())
+
+    def _keys(self, entry):
+        """[(sortierte Liste, Schlüssel)] für alle Sortierungen; alle Schlüssel werden vor dem ersten Einfügen
+        berechnet, ein ungültiger Eintrag (Exception) lässt die Listen also unverändert"""
+        return [(self.sorted[sort], key(entry)) for sort, key in SORT_KEYS.items()]
+
+    def _insert(self, keys):
+        for sorted_keys, key in keys:
+            insort(sorted_keys, key)
+
+    def _unindex(self, entry):
+        for sort, key in SORT_KEYS.items():
+            keys = self.sorted[sort]
+            del keys[bisect_left(keys, key(entry))]
+
+    def query(self, sort='created', descending=False, offset=0, limit=20, prefix='',
+              has_password=None, joinable=None, not_started=None, free_slots=0):
+        """Eine Seite der gelisteten Spiele -> (Einträge, has_more).
+
+        prefix: Spielname beginnt mit prefix (Groß-/Kleinschreibung egal), bei sort='name' über bisect
+        has_password: True/False = nur Spiele mit/ohne Passwort
+        joinable: nur Spiele mit freiem Spielerplatz und ohne Passwort
+        not_started: nur Spiele, die noch nicht laufen
+        free_slots: mindestens so viele freie Spielerplätze
+        """
+        if sort not in SORT_KEYS:
+            raise ValueError(f"Unbekannte Sortierung: {sort}")
+        keys = self.sorted[sort]
+        offset = max(0, offset)
+        limit = max(0, min(limit, QUERY_PAGE_LIMIT))
+        prefix = prefix.casefold()
+
+        lo, hi = 0, len(keys)
+        if prefix and sort == 'name':
+            lo = bisect_left(keys, (prefix,))
+            hi = bisect_left(keys, (prefix + '\U0010ffff',))
+            prefix = ''  # durch den Bereich bereits erfüllt
+
+        def matches(entry):
+            free = entry['max_players'] - entry['players']
+            return ((not prefix or entry['name'].casefold().startswith(prefix))
+                    and (has_password is None or entry['has_password'] == has_password)
+                    and (not joinable or (free > 0 and not entry['has_password']))
+                    and (not not_started or not entry['started'])
+                    and (free_slots <= 0 or free >= free_slots))
+
+        positions = range(hi - 1, lo - 1, -1) if descending else range(lo, hi)
+        if not prefix and has_password is None and not joinable and not not_started and free_slots <= 0:
+            # ohne Filter direkt zur Seite springen
+            page = positions[offset:offset + limit]
+            return [self.entries[keys[i][-1]] for i in page], offset + limit < len(positions)
+
+        page = []
+        skipped = 0
+        for i in positions:
+            entry = self.entries[keys[i][-1]]
+            if not matches(entry):
+                continue
+            if skipped < offset:
+                skipped += 1
+                continue
+            if len(page) == limit:
+                return page, True
+            page.append(entry)
+        return page, False
@@ -0,0 +1,176 @@
+"""Laufzeit-Metriken des Servers im Textformat von Prometheus (GET /metrics).
+
+Erfasst werden:
+
+    - pro Socket.IO-Event: Aufrufe, Fehler und Dauer der Handler (Histogramm)
+    - pro gesendetem Kanal (Event-Name des emit, z.B. 'game_update'): Pakete und Bytes
+    - pro empfangenem Event: Pakete und Bytes
+    - der Timer-Task: Dauer jedes Durchlaufs von scheduler.run_due
+    - pro Art geplanter Callbacks (erstes Element des Scheduler-Schlüssels,
+      z.B. 'timer', 'disconnect', 'lobby'): Dauer und Verspätung gegenüber der Deadline
+
+Die Werte liegen in einfachen Listen und dicts im Prozess, eine Messung
+kostet rund eine Mikrosekunde. Gesendete und empfangene Pakete werden beim
+Kodieren bzw. Dekodieren gezählt (payload.on_sent/on_received), ein emit an
+einen Raum ist also ein Paket, egal wie viele Clients ihn empfangen. Bei
+mehreren Workern liefert jeder Worker unter seinem Port seine eigenen Werte.
+"""
+import bisect
+import functools
+import os
+import time
+
+METRICS_ENABLED = os.environ.get('METRICS', '1') == '1'
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')  # leer = /metrics ohne Authorization-Header
+
+# Obergrenzen der Histogramm-Buckets in Sekunden
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+OTHER_EVENT = '_other'  # empfangene Events ohne Handler, damit Clients keine beliebigen Label erzeugen
+
+
+class Histogram:
+    """Verteilung von Dauern; counts[i] zählt Werte <= BUCKETS[i], der letzte Eintrag alle größeren"""
+    __slots__ = ('counts', 'sum')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+
+
+def packet_size(text):
+    """Größe eines kodierten Pakets in Bytes (UTF-8), ohne Kopie für reine ASCII-Texte"""
+    if isinstance(text, str) and not text.isascii():
+        return len(text.encode('utf-8'))
+    return len(text)
+
+
+class Metrics:
+    """Zähler und Histogramme eines Server-Prozesses"""
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.started = time.time()
+        self.handlers: dict[str, Histogram] = {}        # event: Dauer der Handler
+        self.handler_errors: dict[str, int] = {}        # event: Handler mit Exception
+        self.sent: dict[str, list[int]] = {}            # Kanal: [Pakete, Bytes]
+        self.received: dict[str, list[int]] = {}        # event: [Pakete, Bytes]
+        self.timer_loop = Histogram()                   # Dauer eines Durchlaufs des Timer-Tasks
+        self.scheduled: dict[str, Histogram] = {}       # Art: Dauer der Callbacks
+        self.scheduled_lateness: dict[str, Histogram] = {}  # Art: Verspätung gegenüber der Deadline
+
+    def instrument(self, server):
+        """Misst alle registrierten Handler von server (socketio.Server); nach dem letzten @socketio.on aufrufen"""
+        for namespace_handlers in server.handlers.values():
+            for event, handler in namespace_handlers.items():
+                namespace_handlers[event] = self.timed(event, handler)
+
+    def timed(self, event, handler):
+        histogram = self.handlers.setdefault(event, Histogram())
+        errors = self.handler_errors
+        clock = self.clock
+
+        @functools.wraps(handler)
+        def timed_handler(*args):
+            start = clock()
+            try:
+                return handler(*args)
+            except Exception:
+                errors[event] = errors.get(event, 0) + 1
+                raise
+            finally:
+                histogram.observe(clock() - start)
+        return timed_handler
+
+    def observe_sent(self, channel, text):
+        """payload.on_sent: ein Paket für channel wurde kodiert"""
+        entry = self.sent.get(channel)
+        if entry is None:
+            entry = self.sent[channel] = [0, 0]
+        entry[0] += 1
+        entry[1] += packet_size(text)
+
+    def observe_received(self, event, text):
+        """payload.on_received: ein Paket mit event wurde dekodiert"""
+        if event not in self.handlers:
+            event = OTHER_EVENT
+        entry = self.received.get(event)
+        if entry is None:
+            entry = self.received[event] = [0, 0]
+        entry[0] += 1
+        entry[1] += packet_size(text)
+
+    def observe_scheduled(self, key, lateness, seconds):
+        """DeadlineScheduler.on_callback_done: ein geplanter Callback ist gelaufen"""
+        kind = key[0]
+        histogram = self.scheduled.get(kind)
+        if histogram is None:
+            histogram = self.scheduled[kind] = Histogram()
+            self.scheduled_lateness[kind] = Histogram()
+        histogram.observe(seconds)
+        self.scheduled_lateness[kind].observe(max(0.0, lateness))
+
+    def render(self, gauges=()):
+        """Alle Metriken im Textformat von Prometheus; gauges: [(Name, Beschreibung, Wert)] des Aufrufers"""
+        lines = []
+        histogram_family(lines, 'cae_socketio_handler_seconds', "Dauer der Socket.IO-Handler",
+                         'event', self.handlers)
+        counter_family(lines, 'cae_socketio_handler_errors_total', "Socket.IO-Handler mit Exception",
+                       'event', self.handler_errors)
+        counter_family(lines, 'cae_socketio_sent_packets_total', "Gesendete Pakete pro Kanal",
+                       'channel', {channel: entry[0] for channel, entry in self.sent.items()})
+        counter_family(lines, 'cae_socketio_sent_bytes_total', "Gesendete Bytes pro Kanal (einmal pro Paket)",
+                       'channel', {channel: entry[1] for channel, entry in self.sent.items()})
+        counter_family(lines, 'cae_socketio_received_packets_total', "Empfangene Pakete pro Event",
+                       'event', {event: entry[0] for event, entry in self.received.items()})
+        counter_family(lines, 'cae_socketio_received_bytes_total', "Empfangene Bytes pro Event",
+                       'event', {event: entry[1] for event, entry in self.received.items()})
+        histogram_family(lines, 'cae_timer_task_seconds', "Dauer eines Durchlaufs des Timer-Tasks",
+                         None, {None: self.timer_loop})
+        histogram_family(lines, 'cae_scheduled_callback_seconds', "Dauer geplanter Callbacks",
+                         'kind', self.scheduled)
+        histogram_family(lines, 'cae_scheduled_callback_lateness_seconds',
+                         "Verspätung geplanter Callbacks gegenüber ihrer Deadline", 'kind', self.scheduled_lateness)
+        for name, description, value in [('cae_uptime_seconds', "Sekunden seit dem Start", time.time() - self.started),
+                                         *gauges]:
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def counter_family(lines, name, description, label, values):
+    lines.append(f"# HELP {name} {description}")
+    lines.append(f"# TYPE {name} counter")
+    for key in sorted(values):
+        lines.append(f'{name}{{{label}="{label_value(key)}"}} {values[key]}')
+
+
+def histogram_family(lines, name, description, label, histograms):
+    """histograms: {Labelwert: Histogram}; mit label None eine Reihe ohne Label"""
+    lines.append(f"# HELP {name} {description}")
+    lines.append(f"# TYPE {name} histogram")
+    for key in sorted(histograms, key=str):
+        histogram = histograms[key]
+        prefix = f'{label}="{label_value(key)}",' if label is not None else ''
+        labels = f'{{{prefix[:-1]}}}' if prefix else ''
+        total = 0
+        for bound, count in zip(BUCKETS, histogram.counts):
+            total += count
+            lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {total}')
+        total += histogram.counts[-1]
+        lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {total}')
+        lines.append(f'{name}_sum{labels} {format_value(histogram.sum)}')
+        lines.append(f'{name}_count{labels} {total}')
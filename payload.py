@@ -0,0 +1,67 @@
+"""JSON-Modul für Socket.IO mit Unterstützung für vorab kodierte Nutzdaten.
+
+Socket.IO kodiert jedes emit() als JSON. Für Daten, die an viele Empfänger
+gehen (z.B. das gemeinsame Spielzustands-Delta), kann das Ergebnis einmal mit
+encode() erzeugt und als PreEncoded in beliebig viele emits gegeben werden,
+ohne dass es erneut kodiert wird.
+
+Wird über SocketIO(app, json=payload) aktiviert.
+"""
+import json as _json
+
+_compact = {'separators': (',', ':'), 'ensure_ascii': False}
+
+# Callbacks (Event-Name, kodierter Text) für jedes gesendete bzw. empfangene Socket.IO-Paket, z.B. für Metriken
+on_sent = None
+on_received = None
+
+
+class PreEncoded:
+    """Bereits kodierter JSON-Text, der unverändert in das Paket übernommen wird"""
+    __slots__ = ('text',)
+
+    def __init__(self, text):
+        self.text = text
+
+    def __len__(self):
+        return len(self.text)
+
+
+def encode(obj):
+    return PreEncoded(_json.dumps(obj, **_compact))
+
+
+def merge(*objects):
+    """Fügt JSON-Objekte (dict oder PreEncoded) ohne erneutes Kodieren zu einem PreEncoded zusammen"""
+    members = []
+    for obj in objects:
+        text = _dumps_value(obj, **_compact)
+        if len(text) > 2:
+            members.append(text[1:-1])
+    return PreEncoded('{' + ','.join(members) + '}')
+
+
+def _dumps_value(obj, **kwargs):
+    if isinstance(obj, PreEncoded):
+        return obj.text
+    if isinstance(obj, dict) and any(isinstance(value, PreEncoded) for value in obj.values()):
+        return '{' + ','.join(_json.dumps(str(key)) + ':' + _dumps_value(value, **kwargs) for key, value in obj.items()) + '}'
+    return _json.dumps(obj, **kwargs)
+
+
+def dumps(obj, **kwargs):
+    # Socket.IO übergibt [event, daten...]; PreEncoded darf als Argument oder als Wert eines Argument-Dicts vorkommen
+    if isinstance(obj, list) and any(isinstance(value, (PreEncoded, dict)) for value in obj):
+        text = '[' + ','.join(_dumps_value(value, **kwargs) for value in obj) + ']'
+    else:
+        text = _dumps_value(obj, **kwargs)
+    if on_sent is not None and isinstance(obj, list) and obj and isinstance(obj[0], str):
+        on_sent(obj[0], text)
+    return text
+
+
+def loads(s, *args, **kwargs):
+    obj = _json.loads(s, *args, **kwargs)
+    if on_received is not None and isinstance(obj, list) and obj and isinstance(obj[0], str):
+        on_received(obj[0], s)
+    return obj
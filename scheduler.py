@@ -0,0 +1,106 @@
+import heapq
+import itertools
+import time
+import traceback
+
+
+class DeadlineScheduler:
+    """Min-Heap aller anstehenden Deadlines (Spiel-Timer, Disconnect-Timer, ...).
+
+    Jeder Eintrag ist über einen Schlüssel eindeutig (z.B. ('timer', game_id)).
+    Erneutes Planen mit dem gleichen Schlüssel ersetzt den alten Eintrag,
+    abgebrochene Einträge werden lazy beim Abarbeiten aus dem Heap entfernt.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.on_earlier_deadline = None  # Callback wenn sich die früheste Deadline nach vorne verschiebt
+        self.on_callback_done = None     # Callback(key, Verspätung, Dauer) nach jedem ausgeführten Callback, z.B. für Metriken
+        self._heap = []                  # [deadline, seq, key, callback] (callback None = abgebrochen)
+        self._entries = {}               # key: heap entry
+        self._seq = itertools.count()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def schedule(self, key, deadline, callback):
+        """Plant callback() zur absoluten (monotonen) Zeit deadline"""
+        self.cancel(key)
+        entry = [deadline, next(self._seq), key, callback]
+        self._entries[key] = entry
+        heapq.heappush(self._heap, entry)
+
+        if self._heap[0] is entry and self.on_earlier_deadline:
+            self.on_earlier_deadline()
+        return deadline
+
+    def schedule_in(self, key, seconds, callback):
+        """Plant callback() in seconds Sekunden"""
+        return self.schedule(key, self.clock() + seconds, callback)
+
+    def cancel(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        entry[3] = None
+
+        # Heap kompaktieren falls sich zu viele abgebrochene Einträge angesammelt haben; in place, denn run_due
+        # arbeitet auf derselben Liste weiter, wenn ein Callback Einträge abbricht
+        if len(self._heap) > 64 and len(self._heap) > 2 * len(self._entries):
+            self._heap[:] = [e for e in self._heap if e[3] is not None]
+            heapq.heapify(self._heap)
+        return True
+
+    def is_scheduled(self, key):
+        return key in self._entries
+
+    def deadline(self, key):
+        entry = self._entries.get(key)
+        return entry[0] if entry else None
+
+    def next_deadline(self):
+        heap = self._heap
+        while heap and heap[0][3] is None:
+            heapq.heappop(heap)
+        return heap[0][0] if heap else None
+
+    def time_until_next(self):
+        """Sekunden bis zur nächsten Deadline, None wenn nichts geplant ist"""
+        next_deadline = self.next_deadline()
+        if next_deadline is None:
+            return None
+        return max(0.0, next_deadline - self.clock())
+
+    def run_due(self):
+        """Führt alle fälligen Callbacks aus und gibt deren Anzahl zurück.
+
+        Callbacks, die während des Durchlaufs neu geplant werden, laufen frühestens
+        im nächsten Durchlauf, damit sich ein Callback nicht endlos selbst einplant.
+        """
+        now = self.clock()
+        seq_limit = next(self._seq)
+        heap = self._heap
+        executed = 0
+
+        while heap:
+            entry = heap[0]
+            if entry[3] is not None and (entry[0] > now or entry[1] > seq_limit):
+                break
+            heapq.heappop(heap)
+            deadline, _, key, callback = entry
+            if callback is None:
+                continue
+            del self._entries[key]
+            executed += 1
+            on_callback_done = self.on_callback_done
+            if on_callback_done is not None:
+                start = self.clock()
+            try:
+                callback()
+            except Exception as e:
+                print(f"Fehler in geplantem Callback {key}: {e}", flush=True)
+                traceback.print_exc()
+            if on_callback_done is not None:
+                on_callback_done(key, start - deadline, self.clock() - start)
+
+        return executed
@@ -0,0 +1,105 @@
+"""Snapshots der laufenden Spiele, damit sie einen Neustart des Servers überstehen.
+
+Jedes Spiel hat eine Zeile mit seinem letzten Snapshot (Game.to_snapshot,
+mit pickle kodiert) in einer SQLite-Datei im WAL-Modus. Kodiert wird im
+Event-Loop, damit der Snapshot konsistent ist; geschrieben wird in einem
+eigenen Thread, der die anstehenden Schreibvorgänge zu einer Transaktion
+zusammenfasst.
+
+Wann ein Spiel gespeichert wird, entscheidet app.py: sofort bei einem
+Phasenwechsel (state, Pause) und sonst alle SNAPSHOT_INTERVAL Sekunden, falls
+sich das Spiel geändert hat. Beim Start werden alle Spiele wiederhergestellt
+(Game.from_snapshot).
+"""
+import os
+import pickle
+import queue
+import sqlite3
+import threading
+
+SNAPSHOT_PATH = os.environ.get('SNAPSHOT_PATH', 'snapshots.db')  # leer = keine Snapshots
+SNAPSHOT_INTERVAL = float(os.environ.get('SNAPSHOT_INTERVAL', '5'))  # Sekunden zwischen zwei Snapshots eines geänderten Spiels
+
+
+class SnapshotStore:
+    def __init__(self, path):
+        self.path = path
+        self.written = {}  # game_id: (revision, state, paused) des letzten Snapshots
+        self.queue = queue.Queue()  # (game_id, Daten oder None zum Löschen), None beendet den Thread
+        self.bytes_written = 0
+        with self._connect() as connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS snapshots (game_id TEXT PRIMARY KEY, data BLOB NOT NULL)")
+        self.thread = threading.Thread(target=self._write_loop, name='snapshots', daemon=True)
+        self.thread.start()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def load(self):
+        """Alle gespeicherten Snapshots (für den Start), unlesbare werden übersprungen"""
+        snapshots = []
+        with self._connect() as connection:
+            for game_id, data in connection.execute("SELECT game_id, data FROM snapshots"):
+                try:
+                    snapshots.append(pickle.loads(data))
+                except Exception as e:
+                    print(f"Snapshot von Spiel {game_id} nicht lesbar: {e}", flush=True)
+        return snapshots
+
+    def is_transition(self, game):
+        """Phase oder Pause haben sich seit dem letzten Snapshot geändert"""
+        written = self.written.get(game.game_id)
+        return written is None or written[1:] != (game.state, game.paused)
+
+    def is_stale(self, game):
+        written = self.written.get(game.game_id)
+        return written is None or written[0] != game.revision
+
+    def save(self, game):
+        """Kodiert das Spiel und übergibt es dem Schreib-Thread, gibt die Größe in Bytes zurück"""
+        data = pickle.dumps(game.to_snapshot(), pickle.HIGHEST_PROTOCOL)
+        self.written[game.game_id] = (game.revision, game.state, game.paused)
+        self.queue.put((game.game_id, data))
+        return len(data)
+
+    def delete(self, game_id):
+        self.written.pop(game_id, None)
+        self.queue.put((game_id, None))
+
+    def _write_loop(self):
+        connection = self._connect()
+        while True:
+            items = [self.queue.get()]
+            # alles, was inzwischen angefallen ist, in einer Transaktion schreiben
+            while True:
+                try:
+                    items.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in items
+            latest = dict(item for item in items if item is not None)  # pro Spiel nur der letzte Stand
+            try:
+                with connection:
+                    connection.executemany("INSERT OR REPLACE INTO snapshots (game_id, data) VALUES (?, ?)",
+                                           [(game_id, data) for game_id, data in latest.items() if data is not None])
+                    connection.executemany("DELETE FROM snapshots WHERE game_id = ?",
+                                           [(game_id,) for game_id, data in latest.items() if data is None])
+                self.bytes_written += sum(len(data) for data in latest.values() if data is not None)
+            except sqlite3.Error as e:
+                print(f"Fehler beim Schreiben der Snapshots: {e}", flush=True)
+            for _ in items:
+                self.queue.task_done()
+            if stop:
+                connection.close()
+                return
+
+    def flush(self):
+        """Wartet, bis alle übergebenen Snapshots geschrieben sind"""
+        self.queue.join()
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
@@ -0,0 +1,65 @@
+"""Minimale JSON-Patch (RFC 6902) Deltas zwischen zwei Spielzuständen.
+
+Erzeugt nur die Operationen 'add', 'remove' und 'replace'. Dicts werden
+rekursiv verglichen, Listen werden entweder als Anhang ('/-') oder komplett
+ersetzt. Das Gegenstück zum Anwenden der Deltas liegt in static/js/state-patch.js,
+patch() macht dasselbe in Python (z.B. für simulierte Clients im Lastgenerator).
+"""
+
+
+def escape_pointer(key):
+    return str(key).replace('~', '~0').replace('/', '~1')
+
+
+def unescape_pointer(part):
+    return part.replace('~1', '/').replace('~0', '~')
+
+
+def diff(old, new, path=''):
+    """Liefert die Liste der Patch-Operationen, die old in new überführen"""
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops = []
+        for key in old:
+            if key not in new:
+                ops.append({'op': 'remove', 'path': path + '/' + escape_pointer(key)})
+        for key, value in new.items():
+            key_path = path + '/' + escape_pointer(key)
+            if key not in old:
+                ops.append({'op': 'add', 'path': key_path, 'value': value})
+            elif old[key] != value:
+                ops.extend(diff(old[key], value, key_path))
+        return ops
+
+    if isinstance(old, list) and isinstance(new, list) and len(new) > len(old) and new[:len(old)] == old:
+        # Liste wurde nur erweitert (z.B. Rundenverlauf)
+        return [{'op': 'add', 'path': path + '/-', 'value': value} for value in new[len(old):]]
+
+    if old != new or type(old) is not type(new):
+        return [{'op': 'replace', 'path': path, 'value': new}]
+    return []
+
+
+def patch(state, ops):
+    """Wendet die Operationen von diff() auf state an (in place) und gibt state zurück"""
+    for op in ops:
+        parts = [unescape_pointer(part) for part in op['path'].split('/')[1:]]
+        key = parts.pop()
+
+        target = state
+        for part in parts:
+            target = target[int(part)] if isinstance(target, list) else target[part]
+
+        if isinstance(target, list):
+            if op['op'] == 'add' and key == '-':
+                target.append(op['value'])
+            elif op['op'] == 'remove':
+                del target[int(key)]
+            elif op['op'] == 'add':
+                target.insert(int(key), op['value'])
+            else:
+                target[int(key)] = op['value']
+        elif op['op'] == 'remove':
+            del target[key]
+        else:
+            target[key] = op['value']
+    return state
@@ -0,0 +1,95 @@
+// Kartenkatalog: Spielzustände enthalten nur Karten-IDs, die Texte werden einmal geladen.
+// Die URL enthält den Inhalts-Hash, der Browser cacht den Katalog daher dauerhaft.
+// Nach einem Kartenimport meldet der Server die neue Datei (catalog_changed); taucht vorher schon
+// eine unbekannte ID auf, wird der Katalog ebenfalls neu geladen und bis dahin ein Platzhalter angezeigt.
+
+window.cardCatalog = null;
+window.customCards = { questions: [], answers: [] };  // eigene Karten des aktuellen Spiels (settings.customCards)
+window.onCardCatalogChanged = null;  // wird nach jedem Neuladen des Katalogs aufgerufen (z.B. neu zeichnen)
+
+const UNKNOWN_CARD_TEXT = '…';
+
+let cardCatalogReady = loadCardCatalog(window.CARD_CATALOG_URL);
+let cardCatalogReloading = null;
+let staleCardCatalogUrl = null;  // Katalog, in dem eine ID fehlte; ohne neuere URL wird er nicht erneut geladen
+
+function loadCardCatalog(url, options) {
+    return fetch(url, options)
+        .then(response => {
+            // ein veralteter Dateiname wird auf den aktuellen weitergeleitet
+            window.CARD_CATALOG_URL = response.url || url;
+            return response.json();
+        })
+        .then(catalog => {
+            window.cardCatalog = catalog;
+            return catalog;
+        });
+}
+
+// Lädt den Katalog neu; filename aus catalog_changed, ohne filename wird die bekannte URL beim Server nachgefragt
+function reloadCardCatalog(filename) {
+    if (cardCatalogReloading && !filename) {
+        return cardCatalogReloading;
+    }
+    const url = filename ? window.CARD_CATALOG_URL.replace(/[^/]*$/, filename) : window.CARD_CATALOG_URL;
+    const reloading = loadCardCatalog(url, { cache: 'no-cache' })
+        .then(catalog => {
+            if (window.onCardCatalogChanged) {
+                window.onCardCatalogChanged();
+            }
+            return catalog;
+        })
+        .catch(error => console.error('Kartenkatalog konnte nicht geladen werden', error))
+        .finally(() => {
+            if (cardCatalogReloading === reloading) {
+                cardCatalogReloading = null;
+            }
+        });
+    cardCatalogReloading = reloading;
+    cardCatalogReady = window.cardCatalogReady = reloading;
+    return reloading;
+}
+
+// Eigene Karten eines Spiels haben IDs ab CUSTOM_CARD_OFFSET, die Texte stehen in den Spieleinstellungen
+function setCustomCards(customCards) {
+    window.customCards = customCards || { questions: [], answers: [] };
+}
+
+// Karte aus dem Katalog; eine unbekannte ID stammt aus einem neueren Import -> Katalog nachladen
+function catalogCard(cards, id) {
+    const card = cards[id];
+    if (card === undefined && !cardCatalogReloading && staleCardCatalogUrl !== window.CARD_CATALOG_URL) {
+        staleCardCatalogUrl = window.CARD_CATALOG_URL;
+        reloadCardCatalog();
+    }
+    return card;
+}
+
+// Weiße Karte: ID -> Text
+function whiteCardText(id) {
+    const text = id >= window.CUSTOM_CARD_OFFSET
+        ? window.customCards.answers[id - window.CUSTOM_CARD_OFFSET]
+        : catalogCard(window.cardCatalog.answers, id);
+    return text === undefined ? UNKNOWN_CARD_TEXT : text;
+}
+
+// Schwarze Karte: ID -> { card_text, num_blanks }
+function blackCard(id) {
+    if (id === null || id === undefined) {
+        return { card_text: '', num_blanks: 0 };
+    }
+    const card = id >= window.CUSTOM_CARD_OFFSET
+        ? window.customCards.questions[id - window.CUSTOM_CARD_OFFSET]
+        : catalogCard(window.cardCatalog.questions, id);
+    if (card === undefined) {
+        return { card_text: UNKNOWN_CARD_TEXT, num_blanks: 1 };
+    }
+    const [card_text, num_blanks] = card;
+    return { card_text, num_blanks };
+}
+
+window.cardCatalogReady = cardCatalogReady;
+window.reloadCardCatalog = reloadCardCatalog;
+window.setCustomCards = setCustomCards;
+window.whiteCardText = whiteCardText;
+window.blackCard = blackCard;
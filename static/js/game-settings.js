@@ -13,6 +13,9 @@ const settingsMaxRounds = document.getElementById('settings-max-rounds');
 const settingsAnswerTime = document.getElementById('settings-answer-time');
 const settingsCzarTime = document.getElementById('settings-czar-time');
 const settingsRoundDelay = document.getElementById('settings-round-delay');
+const settingsCardPacks = document.getElementById('settings-card-packs');
+const settingsCustomQuestions = document.getElementById('settings-custom-questions');
+const settingsCustomAnswers = document.getElementById('settings-custom-answers');
 const creatorInfo = document.getElementById('creator-info');
 const startGameBtn = document.getElementById('start-game-btn');
 
@@ -21,6 +24,7 @@ const settingsInputs = document.querySelectorAll('.settings-input');
 
 // Auto-Save Mechanismus für Settings
 let settingsTimeout = null;
+let settingsIsCreator = false;
 
 function autoSaveSettings() {
 
@@ -38,7 +42,11 @@ function autoSaveSettings() {
             timeToChooseWhiteCards: parseInt(settingsAnswerTime.value),
             timeToChooseWinner: parseInt(settingsCzarTime.value),
             timeAfterWinnerChosen: parseInt(settingsRoundDelay.value),
-            
+            cardPacks: selectedCardPacks(),
+            customCards: {
+                questions: textareaLines(settingsCustomQuestions),
+                answers: textareaLines(settingsCustomAnswers),
+            },
         };
         window.socket.emit('update_settings', settingsData);
 
@@ -58,6 +66,8 @@ function initializeSettingsListeners() {
     settingsRoundDelay.addEventListener('input', autoSaveSettings);
     settingsMaxPlayers.addEventListener('input', autoSaveSettings);
     settingsPublicDuringGame.addEventListener('change', autoSaveSettings);
+    settingsCustomQuestions.addEventListener('input', autoSaveSettings);
+    settingsCustomAnswers.addEventListener('input', autoSaveSettings);
     
     // Start Game Button
     startGameBtn.addEventListener('click', () => {
@@ -67,6 +77,50 @@ function initializeSettingsListeners() {
     });
 }
 
+// Kartensätze kommen aus dem Kartenkatalog, je Satz eine Checkbox
+function renderCardPacks(selectedPacks) {
+    const packs = window.cardCatalog ? window.cardCatalog.packs || [] : [];
+    settingsCardPacks.innerHTML = '';
+    packs.forEach(pack => {
+        const group = document.createElement('div');
+        group.className = 'form-group checkbox';
+
+        const input = document.createElement('input');
+        input.type = 'checkbox';
+        input.id = 'settings-pack-' + pack.id;
+        input.className = 'settings-pack';
+        input.value = pack.id;
+        input.checked = selectedPacks.includes(pack.id);
+        input.disabled = !settingsIsCreator;
+        input.addEventListener('change', autoSaveSettings);
+
+        const label = document.createElement('label');
+        label.htmlFor = input.id;
+        label.textContent = `${pack.name} (${pack.questions} Fragen, ${pack.answers} Antworten)`;
+        label.title = [pack.description, pack.tags.join(', ')].filter(Boolean).join(' · ');
+
+        group.appendChild(input);
+        group.appendChild(label);
+        settingsCardPacks.appendChild(group);
+    });
+}
+
+// Eigene Karten: eine Karte pro Zeile, der Server bereinigt und entfernt Doppelte
+function textareaLines(textarea) {
+    return textarea.value.split('\n').map(line => line.trim()).filter(line => line.length > 0);
+}
+
+function setTextareaLines(textarea, lines) {
+    // nicht während der Eingabe überschreiben, sonst springt der Cursor bei jeder Rückmeldung des Servers
+    if (document.activeElement !== textarea) {
+        textarea.value = lines.join('\n');
+    }
+}
+
+function selectedCardPacks() {
+    return Array.from(settingsCardPacks.querySelectorAll('.settings-pack:checked')).map(input => input.value);
+}
+
 // Funktion um Settings-Werte aus einem Game-Objekt zu laden
 function loadGameSettings(game) {
     settingsName.value = game.settings.gameName;
@@ -80,13 +134,22 @@ function loadGameSettings(game) {
     settingsRoundDelay.value = game.settings.timeAfterWinnerChosen || 15;
     settingsMaxPlayers.value = game.settings.maxPlayers || 10;
     settingsPublicDuringGame.checked = game.settings.publicVisibleDuringGame || false;
+    const customCards = game.settings.customCards || { questions: [], answers: [] };
+    setTextareaLines(settingsCustomQuestions, customCards.questions.map(([cardText]) => cardText));
+    setTextareaLines(settingsCustomAnswers, customCards.answers);
+    const cardPacks = game.settings.cardPacks || [];
+    window.cardCatalogReady.then(() => renderCardPacks(cardPacks));
 }
 
 // Funktion um Settings-Inputs basierend auf Creator-Status zu aktivieren/deaktivieren
 function updateSettingsAccess(isCreator) {
+    settingsIsCreator = isCreator;
     settingsInputs.forEach(input => {
         input.disabled = !isCreator;
     });
+    settingsCardPacks.querySelectorAll('.settings-pack').forEach(input => {
+        input.disabled = !isCreator;
+    });
     
     if (isCreator) {
         creatorInfo.classList.add('hidden');
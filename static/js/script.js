@@ -62,12 +62,29 @@ setInterval(() => {
 }, 5000);
 
 const pingDisplay = document.getElementById('ping');
+
+// Abweichung Server-Uhr zu lokaler Uhr in ms (serverZeit = Date.now() + serverTimeOffset)
+window.serverTimeOffset = null;
+var offsetSamples = [];
 socket.on('pong', (data) => {
     const pongTime = Date.now();
     const pingId = data.startTime;
     const latency = pongTime - pingId;
     pingDisplay.textContent = `${latency} ms`;
-    // Hier könntest du die Latenz irgendwo im UI anzeigen, wenn gewünscht
+
+    // Offset aus den letzten Pings mit der geringsten Latenz schätzen
+    offsetSamples.push({ latency: latency, offset: data.serverTime * 1000 - (pongTime - latency / 2) });
+    if (offsetSamples.length > 5) {
+        offsetSamples.shift();
+    }
+    const best = offsetSamples.reduce((a, b) => (b.latency < a.latency ? b : a));
+    const previousOffset = window.serverTimeOffset;
+    window.serverTimeOffset = best.offset;
+
+    // Große Abweichung erkannt -> Timer neu synchronisieren
+    if (previousOffset !== null && Math.abs(previousOffset - best.offset) > 500 && window.currentGameData) {
+        socket.emit('request_timer_sync');
+    }
 });
 
 
@@ -76,8 +93,39 @@ socket.on('disconnect', () => {
     console.log('Verbindung zum Server verloren');
 });
 
+// Mehr-Worker-Betrieb: das Spiel liegt auf einem anderen Worker, dorthin neu verbinden
+var pendingWorkerSwitch = null;
+socket.on('switch_worker', (data) => {
+    console.log('Wechsel zu Worker', data.url);
+    pendingWorkerSwitch = data;
+    socket.io.uri = data.url;
+    socket.disconnect();
+    socket.connect();
+});
+
+// Nach dem Wechsel: Event, das der alte Worker nicht bearbeiten konnte, beim neuen wiederholen
+function replayAfterWorkerSwitch() {
+    if (pendingWorkerSwitch && pendingWorkerSwitch.replay) {
+        const replay = pendingWorkerSwitch.replay;
+        pendingWorkerSwitch = null;
+        socket.emit(replay.event, replay.data);
+    }
+}
+
 socket.on('connect', () => {
     console.log('Verbindung zum Server hergestellt');
+
+    if (pendingWorkerSwitch) {
+        if (pendingWorkerSwitch.replay) {
+            // der alte Worker hat den Namen freigegeben, beim neuen neu anmelden
+            socket.emit('set_username', { username: window.currentUsername });
+        } else {
+            // der Benutzer ist bereits auf diesem Worker angemeldet (z.B. nach dem Neuladen der Seite)
+            pendingWorkerSwitch = null;
+            socket.emit('reconnect_user', { username: window.currentUsername || window.ui.getSavedUsername() });
+        }
+        return;
+    }
     
     // Wenn wir bereits einen Username hatten und in einem Spiel waren,
     // aber der Server neugestartet wurde, laden wir die Seite neu
@@ -125,6 +173,11 @@ socket.on('game_info_link_join_error', (data) => {
     clearUrlParams();
 });
 
+// Nach einem Kartenimport: neuen Kartenkatalog laden
+socket.on('catalog_changed', (data) => {
+    reloadCardCatalog(data.filename);
+});
+
 // Error handling
 socket.on('error', (data) => {
     showNotification(data.message, 'error');
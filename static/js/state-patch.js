@@ -0,0 +1,37 @@
+// Wendet JSON-Patch Deltas (add, remove, replace) vom Server auf den lokalen Spielzustand an
+// Gegenstück zu statediff.py
+
+function unescapePointer(part) {
+    return part.replace(/~1/g, '/').replace(/~0/g, '~');
+}
+
+function applyStatePatch(state, ops) {
+    ops.forEach(op => {
+        const parts = op.path.split('/').slice(1).map(unescapePointer);
+        const key = parts.pop();
+
+        let target = state;
+        parts.forEach(part => {
+            target = target[part];
+        });
+
+        if (Array.isArray(target)) {
+            if (op.op === 'add' && key === '-') {
+                target.push(op.value);
+            } else if (op.op === 'remove') {
+                target.splice(parseInt(key), 1);
+            } else if (op.op === 'add') {
+                target.splice(parseInt(key), 0, op.value);
+            } else {
+                target[parseInt(key)] = op.value;
+            }
+        } else if (op.op === 'remove') {
+            delete target[key];
+        } else {
+            target[key] = op.value;
+        }
+    });
+    return state;
+}
+
+window.applyStatePatch = applyStatePatch;
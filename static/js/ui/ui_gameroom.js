@@ -126,21 +126,87 @@ function showGameScreen(game) {
 }
 
 
-socket.on('settings_updated', (game) => {
+function onSettingsUpdated(game) {
     currentGameCreator = game.creator;
     window.currentGameData = game;
     updateGameRoom(game);
+}
+
+// Delta-Updates: der Server sendet nur Änderungen gegenüber der zuletzt erhaltenen Revision
+socket.on('game_state_delta', (data) => {
+    const game = window.currentGameData;
+    if (!game || game.revision === data.revision) {
+        return;
+    }
+    if (game.revision !== data.base) {
+        // Revision verpasst -> vollständigen Zustand anfordern
+        socket.emit('get_game_state');
+        return;
+    }
+
+    applyStatePatch(game, data.ops);
+    game.revision = data.revision;
+
+    const handler = gameUpdateChannels[data.channel] || onGameStateUpdate;
+    handler(game);
+});
+
+// Eigene Karten, Reaktionen usw.; kommt vor dem gemeinsamen Delta und nur wenn sich etwas geändert hat
+socket.on('game_private_update', (data) => {
+    const game = window.currentGameData;
+    if (!game) {
+        return;
+    }
+    Object.assign(game, data.private);
+
+    // Gemeinsamer Zustand unverändert -> kein Delta folgt, direkt anzeigen
+    if (game.revision === data.revision) {
+        const handler = gameUpdateChannels[data.channel] || onGameStateUpdate;
+        handler(game);
+    }
+});
+
+// Rundenverlauf: kommt vollständig nur beim Beitreten, danach Runde für Runde
+socket.on('round_finished', (data) => {
+    const game = window.currentGameData;
+    if (game && game.history && data.index === game.history.length) {
+        game.history.push(data.entry);
+    }
+    // Bei einer Lücke lädt syncRoundHistory die fehlenden Runden über history_count nach
+});
+
+socket.on('history_page', (data) => {
+    const game = window.currentGameData;
+    historyRequestPending = false;
+    if (!game || !game.history || data.from_round > game.history.length) {
+        return;
+    }
+    game.history.splice(data.from_round, data.entries.length, ...data.entries);
+    syncRoundHistory(game);
+    if (game.state === 'game_ended') {
+        displayRoundHistory(game.history);
+    }
 });
 
+var historyRequestPending = false;
+function syncRoundHistory(game) {
+    if (!game.history) {
+        game.history = [];
+    }
+    if (game.history.length > game.history_count) {
+        // neues Spiel gestartet -> alter Verlauf verworfen
+        game.history.length = game.history_count;
+    } else if (game.history.length < game.history_count && !historyRequestPending) {
+        historyRequestPending = true;
+        socket.emit('get_history', { from_round: game.history.length, limit: game.history_count - game.history.length });
+    }
+}
+
 socket.on('player_joined', (data) => {
     const message = data.is_spectator ? 
         `${data.username} ist als Zuschauer beigetreten` : 
         `${data.username} ist beigetreten`;
     showNotification(message, 'info');
-
-    window.currentGameData.active_players = data.game.active_players
-    window.currentGameData.spectators = data.game.spectators
-    updateLobbyPlayerList(data.game);
 });
 
 socket.on('player_status_changed', (data) => {
@@ -153,6 +219,17 @@ socket.on('player_status_changed', (data) => {
     }
 });
 
+// Gesammelte Status-Änderungen (falls der Server Presence-Digests nutzt)
+socket.on('player_status_digest', (data) => {
+    if(window.currentGameData != null) {
+        for (const [username, status] of Object.entries(data.statuses)) {
+            window.currentGameData.player_status[username] = status;
+        }
+        updateLobbyPlayerList(window.currentGameData);
+        update_scores(window.currentGameData);
+    }
+});
+
 // Spieler kicked from the game
 socket.on('kicked_from_game', (data) => {
     showNotification(data.message, 'error');
@@ -162,11 +239,8 @@ socket.on('kicked_from_game', (data) => {
 
 
 socket.on('player_left', (data) => {
-    // Remove player from statuses
+    // Spielzustand folgt als Delta-Update
     showNotification(`${data.username} hat das Spiel verlassen`, 'info');
-    let game = data.game;
-    window.currentGameData = game;
-    updateGameRoom(game);
 });
 
 
@@ -174,7 +248,7 @@ socket.on('player_left', (data) => {
 socket.on('game_paused', (data) => {
     window.currentGameData.paused = true;
     update_pauseOverlay(true);
-    updateTimerDisplay(data.time_left);
+    syncCountdown(data);
 
     //pauseOverlay.style.display = 'flex';
     //pauseGameBtn.style.display = 'none';
@@ -184,7 +258,7 @@ socket.on('game_paused', (data) => {
 socket.on('game_resumed', (data) => {
     window.currentGameData.paused = false;
     update_pauseOverlay(false);
-    updateTimerDisplay(data.time_left);
+    syncCountdown(data);
     //pauseOverlay.style.display = 'none';
     //pauseGameBtn.style.display = (window.currentGameData.owner == window.currentUsername) ? 'inline-block' : 'none';
     //resumeGameBtn.style.display = 'none';
@@ -222,10 +296,10 @@ function update_pauseOverlay(paused) {
 
 
 // Aktualisiere Spielinformationen (z.B. nach Spielende wenn zurück zur Lobby)
-socket.on('game_state_update', (game) => {
+function onGameStateUpdate(game) {
     window.currentGameData = game;
     updateGameRoom(game);
-});
+}
 
 // Game Room created
 socket.on('game_created', (game) => {
@@ -295,11 +369,65 @@ function updateTimerDisplay(timeLeft, maxTime) {
     // Sonst grün (Standard)
 }
 
-// Timer-Sync vom Server (jede Sekunde)
-socket.on('timer_sync', (data) => {
-    // Aktualisiere Display direkt mit Server-Zeit
-    if (data.time_left !== undefined) {
+// Lokaler Countdown: der Server sendet die Deadline nur bei Phasenwechsel, Pause/Fortsetzen oder auf Anfrage
+var countdownDeadline = null; // lokale Zeit in ms, null = kein laufender Countdown
+var countdownMaxTime = 0;
+var countdownLastShown = null;
+var countdownInterval = null;
+
+function syncCountdown(data) {
+    countdownMaxTime = data.max_time;
+    countdownLastShown = null;
+
+    if (data.paused || data.deadline === null || data.deadline === undefined || data.time_left < 0) {
+        stopCountdown();
         updateTimerDisplay(data.time_left, data.max_time);
+        return;
+    }
+
+    // Ohne Ping-Messung die Serverzeit aus der Nachricht verwenden
+    let offset = window.serverTimeOffset;
+    if (offset === null && data.server_time) {
+        offset = data.server_time * 1000 - Date.now();
+    }
+    countdownDeadline = data.deadline * 1000 - (offset || 0);
+
+    if (!countdownInterval) {
+        countdownInterval = setInterval(tickCountdown, 250);
+    }
+    tickCountdown();
+}
+
+function stopCountdown() {
+    countdownDeadline = null;
+    if (countdownInterval) {
+        clearInterval(countdownInterval);
+        countdownInterval = null;
+    }
+}
+
+function tickCountdown() {
+    if (countdownDeadline === null || !window.currentGameData) {
+        stopCountdown();
+        return;
+    }
+    const timeLeft = Math.max(0, Math.ceil((countdownDeadline - Date.now()) / 1000));
+    if (timeLeft !== countdownLastShown) {
+        countdownLastShown = timeLeft;
+        updateTimerDisplay(timeLeft, countdownMaxTime);
+    }
+}
+
+socket.on('timer_sync', (data) => {
+    if (window.currentGameData && data.time_left !== undefined) {
+        syncCountdown(data);
+    }
+});
+
+// Nach dem Aufwachen eines Hintergrund-Tabs laufen Timer ungenau -> neu synchronisieren
+document.addEventListener('visibilitychange', () => {
+    if (!document.hidden && window.currentGameData && countdownDeadline !== null) {
+        socket.emit('request_timer_sync');
     }
 });
 
@@ -327,7 +455,7 @@ function toggleCardSelection(index, cardEl) {
         cardEl.querySelector('.selection-number')?.remove();
     } else {
         // Select
-        let currentQuestion = window.currentGameData.current_black_card;
+        let currentQuestion = blackCard(window.currentGameData.current_black_card);
         // if already max selected, remove oldest selection
         if (selectedCards.length >= currentQuestion.num_blanks) {
             const oldestIndex = selectedCards.shift();
@@ -356,7 +484,7 @@ function toggleCardSelection(index, cardEl) {
 function updateSelectionUI() {
     selectionCount.textContent = selectedCards.length;
     
-    let currentQuestion = window.currentGameData.current_black_card;
+    let currentQuestion = blackCard(window.currentGameData.current_black_card);
     const isComplete = selectedCards.length === currentQuestion.num_blanks;
     submitAnswersBtn.disabled = !isComplete;
     
@@ -409,6 +537,7 @@ function displayState(game) {
 
 function updateGameState_Lobby(game) {
     displayState(game);
+    stopCountdown();
     // need: gametitle, players, owner, spectators, creator, player-status, settings, game-invite-link
     update_ownerControls(game);
     update_titleLobby(game);
@@ -486,6 +615,7 @@ function updateGameState_CountdownNextRound(game) {
 
 function updateGameState_GameEnded(game) {
     displayState(game);
+    stopCountdown();
     // need: owner, final-scores, winner, player(-status), gamesettings(max punkte, max runden),
     update_ownerControls(game);
     update_titleLobby(game);
@@ -534,14 +664,14 @@ function update_gameEnd(game) {
 function update_resultPhase(game) {
     resultPhase.classList.remove('hidden');
     
-    let questionBlackText = game.current_black_card.card_text;
+    let questionBlackText = blackCard(game.current_black_card).card_text;
     let winning_white_cards = game.winning_white_cards;
     let winningUsername = winning_white_cards.playerName;
     let winningAnswers = winning_white_cards.cards;
 
     // Ersetze jedes "_____" durch die entsprechende Antwort
     winningAnswers.forEach(answer => {
-        questionBlackText = questionBlackText.replace('_____', `<strong class="filled-answer">${answer}</strong>`);
+        questionBlackText = questionBlackText.replace('_____', `<strong class="filled-answer">${whiteCardText(answer)}</strong>`);
     });
     questionText.innerHTML = questionBlackText;
     questionText.classList.add('winner-flip');
@@ -572,7 +702,7 @@ function update_czarSelection(game) {
     let isCzar = (game.czar == window.currentUsername);
     let submitted_options = game.submitted_white_cards;
     let playermapping = game.player_mapping;
-    let currentQuestion = game.current_black_card;
+    let currentQuestion = blackCard(game.current_black_card);
 
     let winner_choosen = game.winner_choosen || false;
     let current_czar_selected_player = game.current_czar_selected_player || null;
@@ -603,7 +733,7 @@ function update_czarSelection(game) {
         let filledText = answerText;
         
         cards.forEach((answer, i) => {
-            filledText = filledText.replace('_____', `<strong class="filled-answer">${escapeHtml(answer)}</strong>`);
+            filledText = filledText.replace('_____', `<strong class="filled-answer">${escapeHtml(whiteCardText(answer))}</strong>`);
         });
         
         optionEl.innerHTML = `<div class="answer-text">${filledText}</div>`;
@@ -681,7 +811,7 @@ function update_czarInfo(game) {
 
 function update_question(game) {
     // die frage im schwarzen kasten aktualisieren
-    let black_card = game.current_black_card;
+    let black_card = blackCard(game.current_black_card);
 
     questionText.innerHTML = black_card["card_text"].replace(/_____/g, '<span class="blank">_____</span>');
     cardsNeeded.textContent = black_card.num_blanks;
@@ -691,9 +821,12 @@ function update_question(game) {
 
 function update_timer(game) {
     // der timer falls existiert aktualisieren oder ausblenden
-    updateTimerDisplay(game.currentTimerSeconds, game.currentTimerTotalSeconds);
-
-
+    syncCountdown({
+        time_left: game.currentTimerSeconds,
+        max_time: game.currentTimerTotalSeconds,
+        deadline: game.timerDeadline,
+        paused: game.paused
+    });
 }
 
 function update_scores(game) {
@@ -748,7 +881,7 @@ function update_gamehands(game) {
     currentHand.forEach((card, index) => {
         const cardEl = document.createElement('div');
         cardEl.className = 'answer-card';
-        cardEl.textContent = card;
+        cardEl.textContent = whiteCardText(card);
         cardEl.dataset.index = index;
         
         cardEl.addEventListener('click', () => toggleCardSelection(index, cardEl));
@@ -785,10 +918,29 @@ function update_joinlink(game) {
 //       Update Game Room
 //
 // ########################################
+// Neu geladener Kartenkatalog (Import, unbekannte ID) -> Karten mit den neuen Texten anzeigen
+window.onCardCatalogChanged = () => {
+    if (window.currentGameData) {
+        updateGameRoom(window.currentGameData);
+    }
+};
+
 // Zeige basierend auf Game-State die richtigen UI-Elemente an
 function updateGameRoom(game) {
+    if (!window.cardCatalog) {
+        // Kartentexte noch nicht geladen -> danach mit dem dann aktuellen Zustand anzeigen
+        cardCatalogReady.then(() => {
+            if (window.currentGameData) {
+                updateGameRoom(window.currentGameData);
+            }
+        });
+        return;
+    }
     let state = game.state; // 'lobby', 'choosing_cards', 'choosing_winner', 'countdown_next_round', 'game_ended'
 
+    setCustomCards(game.settings && game.settings.customCards);
+    syncRoundHistory(game);
+
     if(game.resetted_to_lobby && game.resetted_to_lobby.includes(window.currentUsername)) {
         state = 'lobby';
         window.currentGameData.state = 'lobby';
@@ -813,12 +965,12 @@ function updateGameRoom(game) {
 }
 
 
-socket.on('game_reset_to_lobby', (game) => {
+function onGameResetToLobby(game) {
     // Zurück zur Game-Lobby
     showNotification('Spiel wurde zurückgesetzt', 'info');
     window.currentGameData = game;
     updateGameRoom(game);
-});
+}
 
 
 function updateLobbyPlayerList(game) {
@@ -928,7 +1080,7 @@ function createListObject(name, isCreator, isCurrentPlayer, isSpectator, connect
 
 function displayRoundHistory(history) {
     const container = document.getElementById('round-history-container');
-    if (!container) return;
+    if (!container || !window.cardCatalog) return;
     
     container.innerHTML = '';
     
@@ -956,10 +1108,10 @@ function displayRoundHistory(history) {
         card.className = 'history-card';
         
         // Fülle die Frage mit den gewinnenden Antworten
-        let filledQuestion = round.black_card.card_text;
+        let filledQuestion = blackCard(round.black_card).card_text;
 
         for(let i=0; i<round.winning_cards.length; i++) {
-            filledQuestion = filledQuestion.replace('_____', `<span class="filled-answer">${round.winning_cards[i]}</span>`);
+            filledQuestion = filledQuestion.replace('_____', `<span class="filled-answer">${whiteCardText(round.winning_cards[i])}</span>`);
         }
 
         const czarColors = generatePlayerColor(round.czar || '[AUTOMATIC]');
@@ -1033,9 +1185,8 @@ function forceRole(username) {
 }
 
 socket.on('role_changed', (data) => {
-    window.currentGameData = data.game;
-    updateGameRoom(data.game);
-    
+    // Spielzustand folgt als Delta-Update
+
     // Notification
     if (data.username === window.currentUsername) {
         if (data.forced_by) {
@@ -1048,11 +1199,22 @@ socket.on('role_changed', (data) => {
     }
 });
 
-socket.on('game_started', (game) => {
+function onGameStarted(game) {
     // Update Creator info
     window.currentGameData = game;
     updateGameRoom(game);
-});
+}
+
+// Kanäle für Spielzustands-Updates: als vollständiger Zustand oder als game_state_delta mit channel
+const gameUpdateChannels = {
+    'game_state_update': onGameStateUpdate,
+    'settings_updated': onSettingsUpdated,
+    'game_started': onGameStarted,
+    'game_reset_to_lobby': onGameResetToLobby
+};
+for (const [channel, handler] of Object.entries(gameUpdateChannels)) {
+    socket.on(channel, handler);
+}
 
 socket.on('left_game', () => {
     window.currentGameData = null;
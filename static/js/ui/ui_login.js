@@ -38,6 +38,11 @@ socket.on('username_set', (data) => {
     currentUsernameDisplay.textContent = window.currentUsername;
     usernameError.textContent = '';
 
+    if (pendingWorkerSwitch) {
+        replayAfterWorkerSwitch();
+        return;
+    }
+
     if(!data.hasGame) {   
         // Prüfe ob Join-Link vorhanden ist
         if (joinGameId) {
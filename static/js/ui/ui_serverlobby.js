@@ -8,20 +8,15 @@ const logoutBtn = document.getElementById('logout-btn');
 const currentUsernameDisplay = document.getElementById('current-username');
 const publicGamesDiv = document.getElementById('public-games');
 
+const LOBBY_PAGE_SIZE = 24;
+var lobbyHasMoreGames = false;
+var searchTimeout = null;
+
 const gameSearchInput = document.getElementById('game-search-input');
 gameSearchInput.addEventListener('input', () => {
-    const filter = gameSearchInput.value.toLowerCase();
-    const gameCards = publicGamesDiv.getElementsByClassName('game-card');
-    Array.from(gameCards).forEach(card => {
-        const gameName = card.querySelector('h3').textContent.toLowerCase();
-        if (gameName.includes(filter)) {
-            card.style.display = '';
-        } else {
-            card.style.display = 'none';
-        }
-    });
-
-    displayPublicGames();
+    // Suche läuft auf dem Server (Namensanfang), erst nach einer kurzen Tipp-Pause anfragen
+    clearTimeout(searchTimeout);
+    searchTimeout = setTimeout(() => getGameLobbys(), 250);
 });
 
 
@@ -31,33 +26,34 @@ function showServerLobby() {
     getGameLobbys();
 }
 
-function getGameLobbys() {
-    socket.emit('get_public_games');
+function getGameLobbys(offset = 0) {
+    socket.emit('query_public_games', {
+        sort: 'created',
+        descending: true,   // neueste Spiele zuerst
+        prefix: gameSearchInput.value.trim(),
+        offset: offset,
+        limit: LOBBY_PAGE_SIZE
+    });
 }
 
 var lastSavedGames = [];
 
+function matchesLobbySearch(game) {
+    return game.name.toLowerCase().startsWith(gameSearchInput.value.trim().toLowerCase());
+}
+
 function displayPublicGames(_games) {
     if(_games !== undefined) {
         lastSavedGames = _games;
     }
-    
-    let filteredGames = lastSavedGames;
-    
-    const filter = gameSearchInput.value.toLowerCase();
-    if (filter) {
-        filteredGames = lastSavedGames.filter(game => 
-            (game.name.toLowerCase().includes(filter) || game.is_pending)
-        );
-    }
 
-    if (!filteredGames || filteredGames.length === 0) {
+    if (!lastSavedGames || lastSavedGames.length === 0) {
         publicGamesDiv.innerHTML = '<p class="empty-message">Keine öffentlichen Spiele verfügbar</p>';
         return;
     }
     
     publicGamesDiv.innerHTML = '';
-    filteredGames.forEach(game => {
+    lastSavedGames.forEach(game => {
         let gameStarted = game.started || false;
 
         const card = document.createElement('div');
@@ -77,6 +73,16 @@ function displayPublicGames(_games) {
         });
         publicGamesDiv.appendChild(card);
     });
+
+    if (lobbyHasMoreGames) {
+        const moreBtn = document.createElement('button');
+        moreBtn.className = 'btn-secondary';
+        moreBtn.textContent = 'Weitere Spiele laden';
+        moreBtn.addEventListener('click', () => {
+            getGameLobbys(lastSavedGames.filter(game => !game.is_pending).length);
+        });
+        publicGamesDiv.appendChild(moreBtn);
+    }
 }
 
 
@@ -90,9 +96,44 @@ refreshGamesBtn.addEventListener('click', () => {
 });
 
 window.socket.on('public_games_list', (data) => {
+    lobbyHasMoreGames = false;
     displayPublicGames(data.games);
 });
 
+window.socket.on('public_games_page', (data) => {
+    lobbyHasMoreGames = data.has_more;
+    if (data.offset === 0) {
+        displayPublicGames(data.games);
+    } else {
+        const known = new Set(lastSavedGames.map(game => game.id));
+        displayPublicGames(lastSavedGames.concat(data.games.filter(game => !known.has(game.id))));
+    }
+});
+
+// Lobby-Deltas: der Server sendet nach der vollständigen Liste nur noch geänderte Spiele
+function upsertPublicGame(game) {
+    const index = lastSavedGames.findIndex(g => g.id === game.id);
+    if (index === -1) {
+        if (!matchesLobbySearch(game)) {
+            return;
+        }
+        lastSavedGames.unshift(game);  // neue Spiele stehen bei der Sortierung "neueste zuerst" oben
+    } else {
+        game.is_pending = lastSavedGames[index].is_pending;
+        lastSavedGames[index] = game;
+    }
+    displayPublicGames();
+}
+
+window.socket.on('lobby_game_added', (data) => upsertPublicGame(data.game));
+window.socket.on('lobby_game_updated', (data) => upsertPublicGame(data.game));
+
+window.socket.on('lobby_game_removed', (data) => {
+    // Eigene offene Spiele bleiben sichtbar, auch wenn sie nicht mehr öffentlich sind
+    lastSavedGames = lastSavedGames.filter(game => game.id !== data.id || game.is_pending);
+    displayPublicGames();
+});
+
 // Lobby - Logout-Button
 logoutBtn.addEventListener('click', async () => {
     if (await customConfirm('Möchtest du dich wirklich abmelden?', 'Abmelden')) {
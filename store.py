@@ -0,0 +1,261 @@
+"""Ablage des Serverzustands (users, users_by_sid, games, disconnect_timers).
+
+app.py greift auf den Zustand nur über die Mappings von state_store.mapping()
+zu. Zwei Backends:
+
+    - MemoryStore (Standard): normale dicts im Prozess, ohne Mehraufwand
+    - KeyValueStore: Werte liegen in einem Key-Value-Server und überstehen so
+      einen Neustart des Workers, jedes Mapping hält einen lokalen Cache.
+      Lesen ist nach dem ersten Zugriff ein dict-Zugriff, Schreiben geht
+      sofort an den Server (write-through) und meldet den Schlüssel über den
+      Cluster-Bus, damit andere Prozesse mit demselben Namensraum ihn aus dem
+      Cache werfen.
+
+Jeder Worker schreibt unter seinem eigenen Namensraum (worker0, worker1, ...),
+denn Benutzer und Spiele gehören immer genau einem Worker (siehe cluster.py).
+
+Als Key-Value-Server dienen KeyValueServer an einem Unix-Socket
+(python store.py serve --socket PFAD) oder LocalKeyValue im selben Prozess
+(Tests). Auswahl über STATE_STORE: "memory" oder "socket:PFAD".
+
+Mappings mit local=True (games) bleiben auch im KeyValueStore im Prozess:
+Spiele enthalten Timer und die Socket.IO-Instanz und gehören ohnehin genau
+einem Worker (siehe cluster.py).
+"""
+import os
+import pickle
+from collections.abc import MutableMapping
+
+from cluster import send_frame, read_frame
+
+STATE_STORE = os.environ.get('STATE_STORE', 'memory')
+
+_MISSING = object()  # Schlüssel gibt es auf dem Server nicht; wird nicht gecacht, sonst wüchse der Cache mit jedem unbekannten Namen
+
+
+class MemoryStore:
+    """Zustand in dicts dieses Prozesses"""
+
+    persistent = False
+
+    def mapping(self, name, local=False):
+        return {}
+
+
+class LocalKeyValue:
+    """Key-Value-Server im selben Prozess, Ersatz für KeyValueServer in Tests"""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value):
+        self.data[key] = value
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def keys(self, prefix):
+        return [key for key in self.data if key.startswith(prefix)]
+
+
+class SocketKeyValue:
+    """Client für KeyValueServer; eine Verbindung, Anfrage und Antwort nacheinander"""
+
+    def __init__(self, path, async_mode='threading'):
+        if async_mode == 'eventlet':
+            from eventlet.green import socket, threading
+        else:
+            import socket
+            import threading
+        self._lock = threading.Lock()
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+        self.stream = self.sock.makefile('rb')
+
+    def _call(self, *request):
+        with self._lock:
+            send_frame(self.sock, request)
+            response = read_frame(self.stream)
+        if response is None:
+            raise ConnectionError("Verbindung zum Key-Value-Server verloren")
+        return response[0]
+
+    def get(self, key):
+        return self._call('get', key)
+
+    def set(self, key, value):
+        self._call('set', key, value)
+
+    def delete(self, key):
+        self._call('delete', key)
+
+    def keys(self, prefix):
+        return self._call('keys', prefix)
+
+
+class KeyValueServer:
+    """Key-Value-Server an einem Unix-Socket (Threads), Werte sind bytes"""
+
+    def __init__(self, path):
+        self.path = path
+        self.kv = LocalKeyValue()
+
+    def serve_forever(self):
+        import socket
+        import threading
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.path)
+        os.chmod(self.path, 0o600)
+        server.listen()
+        lock = threading.Lock()
+        print(f"Key-Value-Server an {self.path}", flush=True)
+
+        def serve(connection):
+            stream = connection.makefile('rb')
+            while True:
+                request = read_frame(stream)
+                if request is None:
+                    break
+                with lock:
+                    result = getattr(self.kv, request[0])(*request[1:]) if request[0] in ('get', 'set', 'delete', 'keys') else None
+                send_frame(connection, (result,))
+            connection.close()
+
+        while True:
+            connection, _ = server.accept()
+            threading.Thread(target=serve, args=(connection,), daemon=True).start()
+
+
+class StoredRecord(dict):
+    """Wert eines KeyValueMapping (z.B. users[name]), Änderungen wie users[name]['status'] = ... werden zurückgeschrieben"""
+
+    def __init__(self, mapping, key, value):
+        super().__init__(value)
+        self._mapping = mapping
+        self._key = key
+
+    def __setitem__(self, field, value):
+        super().__setitem__(field, value)
+        self._mapping._write(self._key, self)
+
+    def __delitem__(self, field):
+        super().__delitem__(field)
+        self._mapping._write(self._key, self)
+
+    def __reduce__(self):
+        return dict, (dict(self),)
+
+
+class KeyValueMapping(MutableMapping):
+    """Mapping über den Key-Value-Server mit lokalem Cache"""
+
+    def __init__(self, store, name):
+        self.store = store
+        self.name = name
+        self.prefix = f"{store.namespace}/{name}:"
+        self.cache = {}  # key: Wert, nur vorhandene Schlüssel
+
+    def _wrap(self, key, value):
+        return StoredRecord(self, key, value) if isinstance(value, dict) else value
+
+    def _lookup(self, key):
+        value = self.cache.get(key, _MISSING)
+        if value is _MISSING:
+            data = self.store.kv.get(self.prefix + key)
+            if data is not None:
+                value = self.cache[key] = self._wrap(key, pickle.loads(data))
+        return value
+
+    def _write(self, key, value):
+        self.store.kv.set(self.prefix + key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        self.store.invalidate(self.name, key)
+
+    def __getitem__(self, key):
+        value = self._lookup(key)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self._lookup(key) is not _MISSING
+
+    def get(self, key, default=None):
+        value = self._lookup(key)
+        return default if value is _MISSING else value
+
+    def __setitem__(self, key, value):
+        value = self._wrap(key, value)
+        self.cache[key] = value
+        self._write(key, value)
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self.cache.pop(key, None)
+        self.store.kv.delete(self.prefix + key)
+        self.store.invalidate(self.name, key)
+
+    def __iter__(self):
+        return iter([key[len(self.prefix):] for key in self.store.kv.keys(self.prefix)])
+
+    def __len__(self):
+        return len(self.store.kv.keys(self.prefix))
+
+
+class KeyValueStore:
+    """Zustand in einem Key-Value-Server; bus (cluster.LocalBus/UnixSocketBus) verteilt Cache-Invalidierungen"""
+
+    def __init__(self, kv, bus=None, namespace='worker0'):
+        self.kv = kv
+        self.bus = bus
+        self.namespace = namespace
+        self.mappings = {}  # name: KeyValueMapping
+        self.persistent = True  # Inhalte können von einem früheren Prozess stammen
+        if bus is not None:
+            bus.subscribe('store', self._on_invalidate)
+
+    def mapping(self, name, local=False):
+        if local:
+            return {}
+        self.mappings[name] = KeyValueMapping(self, name)
+        return self.mappings[name]
+
+    def invalidate(self, name, key):
+        if self.bus is not None and self.bus.clustered:
+            self.bus.publish('store', (self.namespace, name, key))
+
+    def _on_invalidate(self, message):
+        namespace, name, key = message
+        mapping = self.mappings.get(name) if namespace == self.namespace else None
+        if mapping is not None:
+            mapping.cache.pop(key, None)
+
+
+def create_store(bus=None, async_mode='threading'):
+    """Backend nach STATE_STORE"""
+    if STATE_STORE == 'memory':
+        return MemoryStore()
+    if STATE_STORE.startswith('socket:'):
+        return KeyValueStore(SocketKeyValue(STATE_STORE[len('socket:'):], async_mode), bus,
+                             namespace=f"worker{bus.worker if bus is not None else 0}")
+    raise ValueError(f"Unbekannter STATE_STORE: {STATE_STORE}")
+
+
+def main():
+    import argparse
+    import tempfile
+
+    parser = argparse.ArgumentParser(description="Key-Value-Server für STATE_STORE=socket:PFAD")
+    parser.add_argument('command', choices=['serve'])
+    parser.add_argument('--socket', default=os.path.join(tempfile.gettempdir(), 'cards-against-everyone-state.sock'))
+    args = parser.parse_args()
+    KeyValueServer(args.socket).serve_forever()
+
+
+if __name__ == '__main__':
+    main()